@@ -0,0 +1,333 @@
+import pandas as pd
+import numpy as np
+import os
+import time
+from pipeline_utils import print_summary, stage, track
+
+# ----------------------------------------------------
+# Vectorized fraud analytics engine for the PaySim log (Fraud.csv)
+# ----------------------------------------------------
+# Fraud-24Jan2024.sql answers each question with its own full pass over dbo.Fraud.
+# This engine loads the log once into compact typed NumPy columns and computes
+# every report from that file in a single fused scan:
+#   - account names (nameOrig) are dictionary-encoded to int32 codes,
+#   - 'type' is categorical (int8 codes),
+#   - each block of rows updates all accumulators at once (np.bincount with weights),
+#     so the per-type, per-step and per-account reports never need a sort or groupby.
+# reference_reports() runs the SQL queries one by one with pandas, as a check.
+
+NUMERIC_COLUMNS = ['amount', 'oldbalanceOrg', 'newbalanceOrig', 'oldbalanceDest', 'newbalanceDest']
+
+
+def _to_cents(values):
+    # CAST(x AS DECIMAL(18, 2)) in SQL Server rounds to 2 decimals
+    return np.round(values, 2)
+
+
+class TransactionLog:
+    """
+    The transaction log as typed NumPy columns.
+
+    Attributes:
+        step (numpy.ndarray): int32 hour of the simulation.
+        type_codes (numpy.ndarray): int8 code into type_names.
+        type_names (numpy.ndarray): Distinct transaction types.
+        amount, oldbalanceOrg, newbalanceOrig, oldbalanceDest, newbalanceDest (numpy.ndarray): float64.
+        orig_codes (numpy.ndarray): int32 code into account_names for nameOrig.
+        account_names (numpy.ndarray): Distinct nameOrig values.
+        is_fraud, is_flagged (numpy.ndarray): bool flags.
+        invalid_numeric_rows (int): Rows where a numeric column did not parse (ISNUMERIC = 0).
+    """
+
+    def __init__(self, columns, type_names, account_names, invalid_numeric_rows=0):
+        self.step = columns['step']
+        self.type_codes = columns['type_codes']
+        self.amount = columns['amount']
+        self.oldbalanceOrg = columns['oldbalanceOrg']
+        self.newbalanceOrig = columns['newbalanceOrig']
+        self.oldbalanceDest = columns['oldbalanceDest']
+        self.newbalanceDest = columns['newbalanceDest']
+        self.orig_codes = columns['orig_codes']
+        self.is_fraud = columns['is_fraud']
+        self.is_flagged = columns['is_flagged']
+        self.type_names = np.asarray(type_names)
+        self.account_names = np.asarray(account_names)
+        self.invalid_numeric_rows = int(invalid_numeric_rows)
+
+    def __len__(self):
+        return len(self.amount)
+
+    @classmethod
+    def from_csv(cls, csv_path, chunksize=1_000_000):
+        """
+        Reads Fraud.csv in chunks into typed columns.
+
+        Args:
+            csv_path (str): The PaySim CSV file.
+            chunksize (int): Rows parsed per chunk.
+
+        Returns:
+            TransactionLog: The loaded log.
+        """
+        parts = {name: [] for name in ['step', 'type', 'nameOrig', 'is_fraud', 'is_flagged'] + NUMERIC_COLUMNS}
+        invalid = 0
+        usecols = ['step', 'type', 'nameOrig', 'isFraud', 'isFlaggedFraud'] + NUMERIC_COLUMNS
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize, usecols=usecols, dtype={'type': 'category', 'nameOrig': str}):
+            bad = np.zeros(len(chunk), dtype=bool)
+            for col in NUMERIC_COLUMNS:
+                values = pd.to_numeric(chunk[col], errors='coerce')
+                bad |= (values.isna() & chunk[col].notna()).to_numpy()
+                parts[col].append(values.to_numpy(dtype=np.float64, na_value=np.nan))
+            invalid += int(bad.sum())
+            parts['step'].append(chunk['step'].to_numpy(dtype=np.int32))
+            parts['type'].append(chunk['type'])
+            parts['nameOrig'].append(chunk['nameOrig'].to_numpy())
+            parts['is_fraud'].append(chunk['isFraud'].to_numpy() == 1)
+            parts['is_flagged'].append(chunk['isFlaggedFraud'].to_numpy() == 1)
+
+        # Encode the dictionary columns once over the whole log, so codes agree across chunks
+        types = pd.Categorical(pd.api.types.union_categoricals(parts['type'], sort_categories=True) if parts['type'] else [])
+        orig_codes, account_names = pd.factorize(np.concatenate(parts['nameOrig']) if parts['nameOrig'] else np.empty(0, dtype=object))
+        columns = {col: np.concatenate(parts[col]) for col in NUMERIC_COLUMNS}
+        columns.update({
+            'step': np.concatenate(parts['step']),
+            'type_codes': types.codes.astype(np.int8),
+            'orig_codes': orig_codes.astype(np.int32),
+            'is_fraud': np.concatenate(parts['is_fraud']),
+            'is_flagged': np.concatenate(parts['is_flagged']),
+        })
+        return cls(columns, np.asarray(types.categories, dtype=str), np.asarray(account_names, dtype=str), invalid)
+
+    def save(self, path):
+        """Saves the columns to an .npz file (uncompressed, so loading is a plain read)."""
+        np.savez(path, step=self.step, type_codes=self.type_codes, amount=self.amount,
+                 oldbalanceOrg=self.oldbalanceOrg, newbalanceOrig=self.newbalanceOrig,
+                 oldbalanceDest=self.oldbalanceDest, newbalanceDest=self.newbalanceDest,
+                 orig_codes=self.orig_codes, is_fraud=self.is_fraud, is_flagged=self.is_flagged,
+                 type_names=self.type_names, account_names=self.account_names,
+                 invalid_numeric_rows=np.int64(self.invalid_numeric_rows))
+
+    @classmethod
+    def load(cls, path):
+        """Loads columns saved with save()."""
+        with np.load(path) as data:
+            columns = {name: data[name] for name in data.files}
+        return cls(columns, columns['type_names'], columns['account_names'], columns['invalid_numeric_rows'])
+
+
+@track()
+def compute_reports(log, block_rows=1_000_000, mismatch_tolerance=0.01):
+    """
+    Computes every report of Fraud-24Jan2024.sql in one pass over the log.
+
+    Args:
+        log (TransactionLog): The loaded log.
+        block_rows (int): Rows processed per block (keeps temporaries cache-sized).
+        mismatch_tolerance (float): Balance difference treated as a mismatch.
+
+    Returns:
+        dict: Report name -> scalar or pandas.DataFrame, named after the SQL aliases.
+    """
+    n_types = len(log.type_names)
+    n_accounts = len(log.account_names)
+    n_steps = int(log.step.max()) + 1 if len(log) else 0
+
+    # Accumulators for every report, filled block by block
+    type_count = np.zeros(n_types, dtype=np.int64)
+    type_amount = np.zeros(n_types)
+    fraud_type_count = np.zeros(n_types, dtype=np.int64)
+    fraud_type_amount = np.zeros(n_types)
+    flagged_type_count = np.zeros(n_types, dtype=np.int64)
+    flagged_type_amount = np.zeros(n_types)
+    fraud_step_count = np.zeros(n_steps, dtype=np.int64)
+    account_outgoing = np.zeros(n_accounts)
+    account_fraud_count = np.zeros(n_accounts, dtype=np.int64)
+    account_fraud_amount = np.zeros(n_accounts)
+    both = missed = false_flags = 0
+    mismatch_rows = []
+
+    for start in range(0, len(log), block_rows):
+        block = slice(start, start + block_rows)
+        codes = log.type_codes[block]
+        amount = log.amount[block]
+        amount_cents = _to_cents(amount)
+        fraud = log.is_fraud[block]
+        flagged = log.is_flagged[block]
+        orig = log.orig_codes[block]
+
+        type_count += np.bincount(codes, minlength=n_types)
+        type_amount += np.bincount(codes, weights=amount, minlength=n_types)
+        fraud_type_count += np.bincount(codes[fraud], minlength=n_types)
+        fraud_type_amount += np.bincount(codes[fraud], weights=amount[fraud], minlength=n_types)
+        flagged_type_count += np.bincount(codes[flagged], minlength=n_types)
+        flagged_type_amount += np.bincount(codes[flagged], weights=amount[flagged], minlength=n_types)
+        fraud_step_count += np.bincount(log.step[block][fraud], minlength=n_steps)
+
+        account_outgoing += np.bincount(orig, weights=amount_cents, minlength=n_accounts)
+        account_fraud_count += np.bincount(orig[fraud], minlength=n_accounts)
+        account_fraud_amount += np.bincount(orig[fraud], weights=amount_cents[fraud], minlength=n_accounts)
+
+        both += int(np.count_nonzero(fraud & flagged))
+        missed += int(np.count_nonzero(fraud & ~flagged))
+        false_flags += int(np.count_nonzero(~fraud & flagged))
+
+        # ABS(old - new - amount) > 0.01 on values rounded like DECIMAL(18, 2)
+        diff = np.abs(_to_cents(log.oldbalanceOrg[block]) - _to_cents(log.newbalanceOrig[block]) - amount_cents)
+        mismatch_rows.append(np.flatnonzero(diff > mismatch_tolerance) + start)
+
+    total = len(log)
+    total_fraud = int(fraud_type_count.sum())
+    types = pd.Index(log.type_names, name='type')
+    reports = {
+        'TotalTransactions': total,
+        'InvalidNumericRows': log.invalid_numeric_rows,
+        'TotalTransactionAmount': float(type_amount.sum()),
+        'AvgTransactionAmountByType': pd.DataFrame(
+            {'AvgTransactionAmount': np.divide(type_amount, type_count, out=np.full(n_types, np.nan), where=type_count > 0)},
+            index=types)[type_count > 0].sort_values('AvgTransactionAmount', ascending=False),
+        'FraudulentTransactions': total_fraud,
+        'TotalFraudAmount': float(fraud_type_amount.sum()),
+        'FraudByType': pd.DataFrame({'FraudulentCount': fraud_type_count, 'FraudulentAmount': fraud_type_amount},
+                                    index=types)[fraud_type_count > 0].sort_values('FraudulentAmount', ascending=False),
+        'FlaggedFraudTransactions': int(flagged_type_count.sum()),
+        'FlaggedByType': pd.DataFrame({'FlaggedCount': flagged_type_count, 'FlaggedAmount': flagged_type_amount},
+                                      index=types)[flagged_type_count > 0].sort_values('FlaggedAmount', ascending=False),
+        'FlaggedVsActual': {'CorrectlyFlaggedFraud': both, 'MissedFraud': missed, 'FalseFlags': false_flags},
+        'FraudRatio': {'FraudulentTransactions': total_fraud, 'NonFraudulentTransactions': total - total_fraud,
+                       'FraudRatio': total_fraud / total if total else float('nan')},
+    }
+
+    # Top-N accounts: argpartition picks the candidates without sorting every account
+    top_outgoing = _top_accounts(account_outgoing, 10)
+    reports['TopOutgoingAccounts'] = pd.DataFrame({'nameOrig': log.account_names[top_outgoing],
+                                                   'TotalOutgoing': account_outgoing[top_outgoing]})
+    top_fraud = _top_accounts(account_fraud_count, 5)
+    top_fraud = top_fraud[account_fraud_count[top_fraud] > 0]
+    reports['TopSuspiciousAccounts'] = pd.DataFrame({'nameOrig': log.account_names[top_fraud],
+                                                     'FraudCount': account_fraud_count[top_fraud],
+                                                     'FraudAmount': account_fraud_amount[top_fraud]})
+
+    mismatches = np.concatenate(mismatch_rows) if mismatch_rows else np.empty(0, dtype=np.int64)
+    reports['MismatchedBalances'] = pd.DataFrame({'nameOrig': log.account_names[log.orig_codes[mismatches]],
+                                                  'oldbalanceOrg': log.oldbalanceOrg[mismatches],
+                                                  'newbalanceOrig': log.newbalanceOrig[mismatches],
+                                                  'amount': log.amount[mismatches]})
+    steps = np.flatnonzero(fraud_step_count)
+    reports['FraudByStep'] = pd.DataFrame({'step': steps, 'FraudCount': fraud_step_count[steps]})
+    return reports
+
+
+def _top_accounts(values, n):
+    """Indices of the n largest values, largest first (ties broken by account code)."""
+    n = min(n, len(values))
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-values, n - 1)[:n]
+    return candidates[np.lexsort((candidates, -values[candidates]))]
+
+
+def reference_reports(csv_path):
+    """
+    Runs the SQL queries one at a time with pandas (one pass per query), as the
+    reference the engine's results are checked against.
+
+    Args:
+        csv_path (str): The PaySim CSV file.
+
+    Returns:
+        dict: Report name -> result, with the same names as compute_reports().
+    """
+    df = pd.read_csv(csv_path)
+    fraud = df[df['isFraud'] == 1]
+    flagged = df[df['isFlaggedFraud'] == 1]
+    cents = df[['amount', 'oldbalanceOrg', 'newbalanceOrig']].round(2)
+    mismatched = df[(cents['oldbalanceOrg'] - cents['newbalanceOrig'] - cents['amount']).abs() > 0.01]
+    return {
+        'TotalTransactions': len(df),
+        'TotalTransactionAmount': df['amount'].sum(),
+        'AvgTransactionAmountByType': df.groupby('type')['amount'].mean().sort_values(ascending=False),
+        'FraudulentTransactions': len(fraud),
+        'TotalFraudAmount': fraud['amount'].sum(),
+        'FraudByType': fraud.groupby('type')['amount'].agg(['count', 'sum']).sort_values('sum', ascending=False),
+        'TopOutgoingAccounts': df['amount'].round(2).groupby(df['nameOrig']).sum().nlargest(10),
+        'MismatchedBalances': len(mismatched),
+        'FlaggedFraudTransactions': len(flagged),
+        'FlaggedByType': flagged.groupby('type')['amount'].agg(['count', 'sum']).sort_values('sum', ascending=False),
+        'FraudByStep': fraud.groupby('step').size(),
+    }
+
+
+def compare_with_reference(reports, reference, rtol=1e-9):
+    """
+    Prints whether each engine report matches the pandas reference.
+
+    Returns:
+        bool: True when every compared report matches.
+    """
+    checks = {
+        'TotalTransactions': (reports['TotalTransactions'], reference['TotalTransactions']),
+        'TotalTransactionAmount': (reports['TotalTransactionAmount'], reference['TotalTransactionAmount']),
+        'AvgTransactionAmountByType': (reports['AvgTransactionAmountByType']['AvgTransactionAmount'].to_numpy(),
+                                       reference['AvgTransactionAmountByType'].to_numpy()),
+        'FraudulentTransactions': (reports['FraudulentTransactions'], reference['FraudulentTransactions']),
+        'TotalFraudAmount': (reports['TotalFraudAmount'], reference['TotalFraudAmount']),
+        'FraudByType': (reports['FraudByType'].to_numpy(), reference['FraudByType'].to_numpy()),
+        'TopOutgoingAccounts': (reports['TopOutgoingAccounts']['TotalOutgoing'].to_numpy(),
+                                reference['TopOutgoingAccounts'].to_numpy()),
+        'MismatchedBalances': (len(reports['MismatchedBalances']), reference['MismatchedBalances']),
+        'FlaggedFraudTransactions': (reports['FlaggedFraudTransactions'], reference['FlaggedFraudTransactions']),
+        'FlaggedByType': (reports['FlaggedByType'].to_numpy(), reference['FlaggedByType'].to_numpy()),
+        'FraudByStep': (reports['FraudByStep']['FraudCount'].to_numpy(), reference['FraudByStep'].to_numpy()),
+    }
+    all_match = True
+    for name, (engine_value, reference_value) in checks.items():
+        engine_value, reference_value = np.asarray(engine_value, dtype=float), np.asarray(reference_value, dtype=float)
+        match = engine_value.shape == reference_value.shape and np.allclose(engine_value, reference_value, rtol=rtol)
+        all_match &= match
+        print(f"  {name:<28} {'OK' if match else 'MISMATCH'}")
+    return all_match
+
+
+# ----------------------------------------------------
+# MAIN EXECUTION
+# ----------------------------------------------------
+if __name__ == "__main__":
+    # Configuration
+    csv_file_path = 'Fraud.csv'
+    columns_cache_path = 'Fraud_columns.npz' # Typed columns saved after the first load; delete to re-read the CSV
+    check_against_reference = False          # Re-run every query with pandas and compare the results
+
+    if not os.path.exists(csv_file_path) and not os.path.exists(columns_cache_path):
+        print(f"Error: File not found at {csv_file_path}")
+        exit()
+
+    try:
+        start = time.perf_counter()
+        with stage('load_transactions') as load_stage:
+            if os.path.exists(columns_cache_path):
+                log = TransactionLog.load(columns_cache_path)
+            else:
+                log = TransactionLog.from_csv(csv_file_path)
+                log.save(columns_cache_path)
+            load_stage.rows_out = len(log)
+        print(f"Loaded {len(log):,} transactions ({len(log.account_names):,} accounts) in {time.perf_counter() - start:.2f}s")
+
+        start = time.perf_counter()
+        reports = compute_reports(log)
+        print(f"Computed all reports in one scan in {time.perf_counter() - start:.2f}s\n")
+
+        for name, value in reports.items():
+            if isinstance(value, pd.DataFrame):
+                print(f"--{name} ({len(value)} rows)")
+                print(value.head(10).to_string(index=name not in ('TopOutgoingAccounts', 'TopSuspiciousAccounts',
+                                                                 'MismatchedBalances', 'FraudByStep')))
+            else:
+                print(f"--{name}: {value}")
+            print()
+
+        if check_against_reference and os.path.exists(csv_file_path):
+            print("Comparing with the query-by-query reference:")
+            compare_with_reference(reports, reference_reports(csv_file_path))
+    except Exception as e:
+        print(f"An error occurred: {e}")
+    print_summary()
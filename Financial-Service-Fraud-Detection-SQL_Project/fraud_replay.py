@@ -0,0 +1,260 @@
+import pandas as pd
+import numpy as np
+import os
+import time
+from collections import deque
+
+# ----------------------------------------------------
+# Streaming step-by-step fraud replay
+# ----------------------------------------------------
+# Replays the transaction log as if it were a live feed, one simulation step
+# (hour) at a time, instead of querying the whole log after the fact:
+#   read_feed()      - reads the local file stand-in for the feed in chunks
+#   group_by_step()  - turns the chunks into complete steps (the file is ordered by step)
+#   AccountWindow    - per-account rolling features in preallocated NumPy arrays
+#   replay()         - updates the features after each step and yields the alerts
+#
+# Rolling features (over the last `window_steps` steps, per nameOrig account):
+#   outgoing   - total amount sent
+#   velocity   - number of transactions
+#   mismatches - transactions where oldbalanceOrg - newbalanceOrig != amount
+# The transactions of each step are kept in a deque so they can be subtracted
+# again when the step falls out of the window.
+
+FEED_COLUMNS = ['step', 'type', 'amount', 'nameOrig', 'oldbalanceOrg', 'newbalanceOrig', 'isFraud']
+
+# An account is alerted when one of its rolling features reaches the threshold
+DEFAULT_THRESHOLDS = {
+    'outgoing': 1_000_000.0,
+    'velocity': 5,
+    'mismatches': 3,
+}
+
+
+def read_feed(csv_path, chunksize=100_000):
+    """Yields the transaction feed in chunks, as a stand-in for a live source."""
+    yield from pd.read_csv(csv_path, chunksize=chunksize, usecols=FEED_COLUMNS, dtype={'nameOrig': str, 'type': str})
+
+
+def group_by_step(chunks):
+    """
+    Regroups feed chunks into complete steps.
+
+    A step can be split across two chunks, so the last step of each chunk is held
+    back until the next chunk shows that it is finished.
+
+    Args:
+        chunks (iterable): DataFrame chunks ordered by 'step'.
+
+    Yields:
+        tuple: (step, pandas.DataFrame with all transactions of that step)
+    """
+    pending = None
+    last_step = None
+    for chunk in chunks:
+        if pending is not None:
+            chunk = pd.concat([pending, chunk], ignore_index=True)
+        steps = chunk['step'].to_numpy()
+        if len(steps) and ((np.diff(steps) < 0).any() or (last_step is not None and steps[0] < last_step)):
+            raise ValueError("The feed must be ordered by step")
+        # Everything before the last step in the chunk is complete
+        boundaries = np.flatnonzero(np.diff(steps)) + 1
+        starts = np.concatenate([[0], boundaries])
+        for begin, end in zip(starts[:-1], boundaries):
+            last_step = int(steps[begin])
+            yield last_step, chunk.iloc[begin:end]
+        pending = chunk.iloc[starts[-1]:] if len(steps) else None
+    if pending is not None and len(pending):
+        yield int(pending['step'].iloc[0]), pending
+
+
+class AccountWindow:
+    """
+    Per-account sliding-window features backed by preallocated NumPy arrays.
+
+    Attributes:
+        outgoing (numpy.ndarray): Rolling total amount sent per account slot.
+        velocity (numpy.ndarray): Rolling transaction count per account slot.
+        mismatches (numpy.ndarray): Rolling balance-mismatch count per account slot.
+        account_names (list): nameOrig stored in each slot.
+    """
+
+    def __init__(self, window_steps=24, capacity=1 << 20, mismatch_tolerance=0.01):
+        self.window_steps = window_steps
+        self.mismatch_tolerance = mismatch_tolerance
+        self.outgoing = np.zeros(capacity, dtype=np.float64)
+        self.velocity = np.zeros(capacity, dtype=np.int32)
+        self.mismatches = np.zeros(capacity, dtype=np.int32)
+        self.account_names = []
+        self._slots = {}        # nameOrig -> slot in the arrays
+        self._history = deque() # (step, slots, amounts, mismatch flags) for each step in the window
+
+    def _grow(self, needed):
+        # Double the arrays when they run out of room, so new accounts stay amortized O(1)
+        capacity = len(self.outgoing)
+        if needed <= capacity:
+            return
+        extra = max(needed, capacity * 2) - capacity
+        self.outgoing = np.concatenate([self.outgoing, np.zeros(extra, dtype=np.float64)])
+        self.velocity = np.concatenate([self.velocity, np.zeros(extra, dtype=np.int32)])
+        self.mismatches = np.concatenate([self.mismatches, np.zeros(extra, dtype=np.int32)])
+
+    def _slots_for(self, names):
+        codes, uniques = pd.factorize(names)
+        slots = np.empty(len(uniques), dtype=np.int64)
+        for i, name in enumerate(uniques.tolist()):
+            slot = self._slots.get(name)
+            if slot is None:
+                slot = self._slots[name] = len(self.account_names)
+                self.account_names.append(name)
+            slots[i] = slot
+        self._grow(len(self.account_names))
+        return slots[codes]
+
+    def _expire(self, step):
+        # Subtract the steps that have fallen out of the window
+        while self._history and self._history[0][0] <= step - self.window_steps:
+            _, slots, amounts, mismatched = self._history.popleft()
+            np.subtract.at(self.outgoing, slots, amounts)
+            np.subtract.at(self.velocity, slots, 1)
+            np.subtract.at(self.mismatches, slots, mismatched)
+
+    def update(self, step, transactions):
+        """
+        Folds one complete step into the window.
+
+        Args:
+            step (int): The step number.
+            transactions (pandas.DataFrame): All transactions of that step.
+
+        Returns:
+            tuple: (distinct account slots touched in this step, dict of feature name ->
+                   the values of those slots just before the step was folded in)
+        """
+        self._expire(step)
+        slots = self._slots_for(transactions['nameOrig'].to_numpy())
+        touched = np.unique(slots)
+        before = {feature: getattr(self, feature)[touched].copy() for feature in ('outgoing', 'velocity', 'mismatches')}
+        amounts = transactions['amount'].to_numpy(dtype=np.float64)
+        old = transactions['oldbalanceOrg'].to_numpy(dtype=np.float64)
+        new = transactions['newbalanceOrig'].to_numpy(dtype=np.float64)
+        mismatched = (np.abs(np.round(old, 2) - np.round(new, 2) - np.round(amounts, 2)) > self.mismatch_tolerance).astype(np.int32)
+
+        np.add.at(self.outgoing, slots, amounts)
+        np.add.at(self.velocity, slots, 1)
+        np.add.at(self.mismatches, slots, mismatched)
+        self._history.append((step, slots, amounts, mismatched))
+        return touched, before
+
+    def features(self, slots):
+        """Returns the current features of the given slots as a DataFrame."""
+        return pd.DataFrame({
+            'nameOrig': [self.account_names[slot] for slot in slots.tolist()],
+            'outgoing': self.outgoing[slots],
+            'velocity': self.velocity[slots],
+            'mismatches': self.mismatches[slots],
+        })
+
+
+def replay(steps, window=None, thresholds=None):
+    """
+    Replays complete steps through the sliding window and yields the alerts of each step.
+
+    An account is alerted in the step where one of its features first reaches a
+    threshold (it can be alerted again after dropping back below it).
+
+    Args:
+        steps (iterable): (step, transactions) pairs, e.g. from group_by_step().
+        window (AccountWindow): The state to update. Defaults to a 24-step window.
+        thresholds (dict): Feature name -> threshold. Defaults to DEFAULT_THRESHOLDS.
+
+    Yields:
+        dict: 'step', 'rows', 'latency_seconds' and 'alerts' (DataFrame with the
+              account features and the 'rules' that fired).
+    """
+    window = window or AccountWindow()
+    thresholds = thresholds or DEFAULT_THRESHOLDS
+    for step, transactions in steps:
+        started = time.perf_counter()
+        touched, before = window.update(step, transactions)
+
+        crossed = np.zeros(len(touched), dtype=bool)
+        rules = [[] for _ in range(len(touched))]
+        for feature, limit in thresholds.items():
+            now = getattr(window, feature)[touched]
+            fired = (now >= limit) & (before[feature] < limit)
+            crossed |= fired
+            for i in np.flatnonzero(fired):
+                rules[i].append(feature)
+
+        alerts = window.features(touched[crossed])
+        alerts.insert(0, 'step', step)
+        alerts['rules'] = [', '.join(r) for r, c in zip(rules, crossed) if c]
+        yield {'step': step, 'rows': len(transactions), 'alerts': alerts,
+               'latency_seconds': time.perf_counter() - started}
+
+
+def run_replay(csv_path, window_steps=24, thresholds=None, chunksize=100_000, max_alerts_printed=20):
+    """
+    Replays a transaction file step by step, printing alerts and a throughput report.
+
+    Args:
+        csv_path (str): The local file standing in for the transaction feed.
+        window_steps (int): Number of steps in the sliding window.
+        thresholds (dict): Feature name -> threshold. Defaults to DEFAULT_THRESHOLDS.
+        chunksize (int): Rows read from the file per chunk.
+        max_alerts_printed (int): Alerts printed in full; the rest are only counted.
+
+    Returns:
+        pandas.DataFrame: Every alert raised during the replay.
+    """
+    window = AccountWindow(window_steps=window_steps)
+    all_alerts = []
+    latencies = []
+    rows = 0
+    printed = 0
+    started = time.perf_counter()
+    for result in replay(group_by_step(read_feed(csv_path, chunksize)), window, thresholds):
+        rows += result['rows']
+        latencies.append(result['latency_seconds'])
+        alerts = result['alerts']
+        if not alerts.empty:
+            all_alerts.append(alerts)
+            for record in alerts.itertuples(index=False):
+                if printed < max_alerts_printed:
+                    print(f"ALERT step {record.step}: {record.nameOrig} ({record.rules}) "
+                          f"outgoing={record.outgoing:,.2f} velocity={record.velocity} mismatches={record.mismatches}")
+                printed += 1
+    elapsed = time.perf_counter() - started
+
+    alerts = pd.concat(all_alerts, ignore_index=True) if all_alerts else pd.DataFrame()
+    latencies = np.array(latencies) * 1000
+    print(f"\nReplayed {rows:,} transactions over {len(latencies)} steps in {elapsed:.2f}s "
+          f"({rows / elapsed if elapsed > 0 else 0:,.0f} transactions/s)")
+    if len(latencies):
+        print(f"Per-step latency: p50={np.percentile(latencies, 50):.2f}ms  p95={np.percentile(latencies, 95):.2f}ms  "
+              f"max={latencies.max():.2f}ms")
+    print(f"Alerts raised: {len(alerts)} ({len(window.account_names):,} accounts tracked)")
+    return alerts
+
+
+# ----------------------------------------------------
+# MAIN EXECUTION
+# ----------------------------------------------------
+if __name__ == "__main__":
+    # Configuration
+    feed_file_path = 'Fraud.csv'       # Local file standing in for the live transaction feed
+    alerts_file_path = 'replay_alerts.csv'
+    window_steps = 24                  # Rolling window length in steps (1 step = 1 hour)
+    thresholds = DEFAULT_THRESHOLDS
+
+    if not os.path.exists(feed_file_path):
+        print(f"Error: File not found at {feed_file_path}")
+        exit()
+
+    try:
+        alerts = run_replay(feed_file_path, window_steps, thresholds)
+        alerts.to_csv(alerts_file_path, index=False)
+        print(f"Alerts saved to {alerts_file_path}")
+    except Exception as e:
+        print(f"An error occurred during the replay: {e}")
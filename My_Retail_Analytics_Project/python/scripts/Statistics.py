@@ -1,15 +1,16 @@
 import pandas as pd
 import numpy as np # Often useful for NaN handling later
+from retail_loader import load_workbook
 
 # Define the path to your Excel file
 # Make sure 'OnlineRetail.xlsx' is in the same directory as this script,
 # or provide the full path to the file.
 file_path = 'OnlineRetail.xlsx'
 
-# Load the Excel file into a pandas DataFrame
+# Load the Excel file into a pandas DataFrame (parsed once, then read from the cache)
 # The header parameter assumes the first row contains column names.
 try:
-    df = pd.read_excel(file_path, header=0)
+    df = load_workbook(file_path, header=0) # Uses the shared parsed-workbook cache
     print(f"Successfully loaded '{file_path}'. Shape: {df.shape}")
     print("\nFirst 5 rows of the DataFrame:")
     print(df.head())
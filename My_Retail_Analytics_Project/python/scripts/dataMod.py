@@ -1,44 +1,269 @@
-import pandas as pd
+import csv
+import json
 import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from itertools import islice
+import pandas as pd
+from openpyxl import load_workbook
+from retail_loader import file_content_hash
+from pipeline_utils import INTERMEDIATE_EXTENSION, TableWriter, read_table, write_table
+
+# Small record of what was exported last time, kept next to the CSV files
+MANIFEST_FILE = '.export_manifest.json'
+# Rows converted and written to an Arrow file at a time
+ARROW_BATCH_ROWS = 50_000
+
+def _is_empty_row(row):
+    return all(value is None for value in row)
+
+def _column_names(header):
+    """Column names from the header row, named and de-duplicated the way pd.read_excel does."""
+    names = []
+    for i, value in enumerate(header):
+        name = f"Unnamed: {i}" if value is None else str(value)
+        base, count = name, 1
+        while name in names:
+            name = f"{base}.{count}"
+            count += 1
+        names.append(name)
+    return names
+
+def _column_kind(types):
+    """
+    The type a column is written with, from the Python types of its cells (as pd.read_excel infers it).
+
+    Numbers with blanks become float, as in pandas; columns mixing kinds of values
+    (e.g. InvoiceNo: 536365 and 'C536379') become text, as in normalize_mixed_columns.
+    """
+    has_blanks = type(None) in types
+    types = types - {type(None)}
+    if not types or (types <= {int, float} and (float in types or has_blanks)):
+        return 'float' # An empty column is all NaN
+    if types == {int}:
+        return 'int'
+    if types == {bool}:
+        return 'boolean' if has_blanks else 'bool'
+    if types == {datetime}:
+        return 'datetime'
+    return 'text'
+
+def _exact_kind(types):
+    """The type a batch column is spilled with: one that keeps every cell, whatever the column's final type."""
+    types = types - {type(None)}
+    if types == {int}:
+        return 'Int64'
+    if types in ({float}, {bool}, {datetime}):
+        return _column_kind(types)
+    return 'text' if types else 'float' # Mixed numbers stay text until the final type is known
+
+def _convert_column(values, kind):
+    if kind == 'text':
+        return pd.Series([None if value is None else str(value) for value in values], dtype='str')
+    if kind == 'datetime':
+        return pd.to_datetime(pd.Series(values, dtype=object))
+    return pd.Series(values, dtype={'float': 'float64', 'int': 'int64', 'Int64': 'Int64', 'bool': bool, 'boolean': 'boolean'}[kind])
+
+def _widen(column, kind):
+    """Converts a spilled column to the final kind of its column."""
+    if kind == 'text':
+        if pd.api.types.is_string_dtype(column):
+            return column
+        return pd.Series([None if pd.isna(value) else str(value) for value in column.astype(object)], dtype='str')
+    if kind == 'datetime':
+        return pd.to_datetime(column)
+    return column.astype({'float': 'float64', 'int': 'int64', 'bool': bool, 'boolean': 'boolean'}[kind])
+
+def _write_sheet_to_arrow(sheet, arrow_path, batch_rows):
+    """
+    Streams one read-only worksheet to an Arrow IPC file in a single pass over the sheet.
+
+    The type of a column is only known once every row has been read (InvoiceNo is a
+    number until the first 'C536379'), so each batch of batch_rows rows is first spilled
+    to its own Arrow file with types that keep its cells exactly. The spilled batches
+    are then converted to the final column types and written out. Only one batch is
+    held in memory at a time.
+    """
+    rows = (row for row in sheet.iter_rows(values_only=True) if not _is_empty_row(row))
+    names = _column_names(next(rows, ()))
+    types = [set() for _ in names]
+    spill_dir = tempfile.mkdtemp(prefix='sheet_', dir=os.path.dirname(os.path.abspath(arrow_path)))
+    try:
+        spilled = []
+        for batch in iter(lambda: list(islice(rows, batch_rows)), []):
+            columns = {}
+            for name, column_types, values in zip(names, types, zip(*batch)):
+                batch_types = set(map(type, values))
+                column_types |= batch_types
+                columns[name] = _convert_column(values, _exact_kind(batch_types))
+            spilled.append(write_table(pd.DataFrame(columns), os.path.join(spill_dir, f'{len(spilled)}.arrow')))
+
+        kinds = [_column_kind(column_types) for column_types in types]
+        with TableWriter(arrow_path) as writer:
+            if not spilled: # A sheet without data rows still gets a file with its columns
+                writer.write(pd.DataFrame({name: _convert_column((), kind) for name, kind in zip(names, kinds)}))
+            for path in spilled:
+                batch = read_table(path)
+                writer.write(pd.DataFrame({name: _widen(batch[name], kind) for name, kind in zip(names, kinds)}))
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+def convert_workbook_to_arrow(excel_path, output_directory):
+    """
+    Streams every sheet of one Excel file to an Arrow IPC file of the columnar store.
+
+    Unlike the CSV export, the column types are kept (dates stay dates, numbers stay
+    numbers), so importToSQL reads the file memory-mapped instead of re-parsing text.
+    Like convert_workbook, the workbook is opened in read-only mode and written in
+    batches of ARROW_BATCH_ROWS rows, so memory does not grow with the sheet. The files
+    are named like the CSV files, with the .arrow extension.
 
-def export_excel_to_csv(excel_files, output_directory="."):
+    Args:
+        excel_path (str): The Excel file to convert.
+        output_directory (str): The directory where the .arrow files will be saved.
+
+    Returns:
+        list: The names of the files written.
+    """
+    base_name = os.path.splitext(os.path.basename(excel_path))[0]
+    written = []
+    workbook = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        for i, sheet in enumerate(workbook.worksheets):
+            arrow_file = f"{base_name}{INTERMEDIATE_EXTENSION}" if i == 0 else f"{base_name}_{sheet.title}{INTERMEDIATE_EXTENSION}"
+            _write_sheet_to_arrow(sheet, os.path.join(output_directory, arrow_file), ARROW_BATCH_ROWS)
+            written.append(arrow_file)
+    finally:
+        workbook.close()
+    return written
+
+def convert_workbook(excel_path, output_directory):
+    """
+    Streams every sheet of one Excel file to CSV.
+
+    The workbook is opened in openpyxl's read-only mode, which reads rows from the
+    file as they are written out instead of loading the whole sheet into memory.
+    The first sheet is saved as '<workbook>.csv' (the same name as before); any
+    other sheets are saved as '<workbook>_<sheet name>.csv'.
+
+    Args:
+        excel_path (str): The Excel file to convert.
+        output_directory (str): The directory where the CSV files will be saved.
+
+    Returns:
+        list: The names of the CSV files written.
+    """
+    base_name = os.path.splitext(os.path.basename(excel_path))[0]
+    written = []
+    workbook = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        for i, sheet in enumerate(workbook.worksheets):
+            csv_file = f"{base_name}.csv" if i == 0 else f"{base_name}_{sheet.title}.csv"
+            with open(os.path.join(output_directory, csv_file), 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                for row in sheet.iter_rows(values_only=True):
+                    # Read-only mode can report padding rows past the data; skip fully empty rows
+                    if all(value is None for value in row):
+                        continue
+                    writer.writerow(['' if value is None else value for value in row])
+            written.append(csv_file)
+    finally:
+        workbook.close()
+    return written
+
+def _load_manifest(output_directory):
+    try:
+        with open(os.path.join(output_directory, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_manifest(output_directory, manifest):
+    # Written under a temporary name and moved into place, so an interrupted run keeps the old manifest
+    path = os.path.join(output_directory, MANIFEST_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+def _is_unchanged(excel_path, entry, output_directory):
+    """Checks a workbook against its manifest entry; returns (unchanged, fingerprint)."""
+    stat = os.stat(excel_path)
+    fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    outputs_exist = entry and all(os.path.exists(os.path.join(output_directory, name)) for name in entry.get('outputs', []))
+    if not outputs_exist or entry.get('size') != stat.st_size:
+        return False, fingerprint
+    if entry.get('mtime_ns') == stat.st_mtime_ns:
+        fingerprint['sha256'] = entry.get('sha256')
+        return True, fingerprint
+    # The file was touched but may not have changed - compare the contents
+    fingerprint['sha256'] = file_content_hash(excel_path)
+    return fingerprint['sha256'] == entry.get('sha256'), fingerprint
+
+def export_excel_to_csv(excel_files, output_directory=".", max_workers=None, force=False, output_format='csv'):
     """
     Reads a list of Excel files and exports each sheet within them to a CSV file.
     The CSV file will have the same name as the Excel file (with a .csv extension).
+    With output_format='arrow' the sheets are written to typed Arrow IPC files instead.
+
+    Workbooks are converted in parallel, one per worker process. Workbooks that have
+    not changed since the last export (same size and mtime, or same content hash)
+    are skipped.
 
     Args:
         excel_files (list): A list of strings, where each string is the name
                             of an Excel file (e.g., ['file1.xlsx', 'file2.xlsx']).
         output_directory (str): The directory where the CSV files will be saved.
                                 Defaults to the current directory.
+        max_workers (int): Number of worker processes. Defaults to the number of CPUs.
+        force (bool): Convert every workbook, even if it has not changed.
+        output_format (str): 'csv' or 'arrow'.
     """
+    converters = {'csv': convert_workbook, 'arrow': convert_workbook_to_arrow}
+    if output_format not in converters:
+        raise ValueError(f"output_format must be one of {list(converters)}, not '{output_format}'.")
     if not os.path.exists(output_directory):
         os.makedirs(output_directory)
         print(f"Created output directory: {output_directory}")
 
+    manifest = _load_manifest(output_directory)
+    manifest_changed = False
+    pending = {}
     for excel_file in excel_files:
-        try:
-            # Construct the full path to the Excel file
-            excel_path = os.path.join(output_directory, excel_file)
-
-            # Read the Excel file into a pandas DataFrame
-            # header=0 means the first row is used as column names
-            df = pd.read_excel(excel_path, header=0)
-
-            # Construct the output CSV file name
-            # Replace .xlsx or .xls with .csv
-            csv_file = os.path.splitext(excel_file)[0] + '.csv'
-            csv_path = os.path.join(output_directory, csv_file)
+        # Construct the full path to the Excel file
+        excel_path = os.path.join(output_directory, excel_file)
+        if not os.path.exists(excel_path):
+            print(f"Error: Excel file '{excel_file}' not found. Please ensure it's in the '{output_directory}' directory.")
+            continue
+        entry = manifest.get(excel_file)
+        unchanged, fingerprint = _is_unchanged(excel_path, entry, output_directory)
+        if unchanged and entry.get('format', 'csv') == output_format and not force:
+            print(f"Skipped '{excel_file}' (unchanged since the last export)")
+            # A touched but identical workbook gets its new mtime, so the next run need not hash it
+            manifest_changed |= any(entry.get(key) != value for key, value in fingerprint.items())
+            entry.update(fingerprint)
+            continue
+        if 'sha256' not in fingerprint:
+            fingerprint['sha256'] = file_content_hash(excel_path)
+        pending[excel_file] = fingerprint
 
-            # Export the DataFrame to a CSV file
-            # index=False prevents pandas from writing the DataFrame index as a column in the CSV
-            df.to_csv(csv_path, index=False)
-            print(f"Successfully exported '{excel_file}' to '{csv_file}'")
+    if pending:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(converters[output_format], os.path.join(output_directory, excel_file), output_directory): excel_file
+                       for excel_file in pending}
+            for future in as_completed(futures):
+                excel_file = futures[future]
+                try:
+                    written = future.result()
+                    manifest[excel_file] = dict(pending[excel_file], outputs=written, format=output_format)
+                    manifest_changed = True
+                    print(f"Successfully exported '{excel_file}' to {', '.join(repr(name) for name in written)}")
+                except Exception as e:
+                    print(f"An error occurred while processing '{excel_file}': {e}")
 
-        except FileNotFoundError:
-            print(f"Error: Excel file '{excel_file}' not found. Please ensure it's in the '{output_directory}' directory.")
-        except Exception as e:
-            print(f"An error occurred while processing '{excel_file}': {e}")
+    if manifest_changed:
+        _save_manifest(output_directory, manifest)
 
 # --- List of your Excel files to convert ---
 # Make sure these Excel files are in the same directory as this Python script,
@@ -54,8 +279,11 @@ excel_files_to_convert = [
 # --- Run the conversion ---
 # By default, CSVs will be saved in the same directory as the script.
 # If your Excel files are in a different folder, update `current_directory` or `excel_files_to_convert`
-current_directory = os.getcwd()
-export_excel_to_csv(excel_files_to_convert, output_directory=current_directory)
+# The __main__ guard is needed because the worker processes import this module.
+if __name__ == "__main__":
+    current_directory = os.getcwd()
+    output_format = 'csv' # 'arrow' writes typed, memory-mappable files that importToSQL reads without parsing
+    export_excel_to_csv(excel_files_to_convert, output_directory=current_directory, output_format=output_format)
 
-print("\nConversion process complete.")
-print("You should now find your CSV files in the same folder as this script.")
+    print("\nConversion process complete.")
+    print(f"You should now find your {output_format.upper()} files in the same folder as this script.")
@@ -0,0 +1,141 @@
+import pandas as pd
+import numpy as np
+
+# =============================================
+# DATE DIMENSION
+# =============================================
+# Generates dim_date for any date range in one vectorized pass, with the same columns
+# and conventions as the hand-made dim_date.csv:
+#   Date                Excel serial day number (40725 = 2011-07-01)
+#   Day of Week Number  Monday = 1 .. Sunday = 7
+#   Week Number         weeks start on Monday, week 1 holds 1 January (Excel WEEKNUM(date, 2))
+#   Year Month Number   yyyymm, e.g. 201107, with the 'Year Month' label '2011 Jul'
+#   Date Key            yyyymmdd, e.g. 20110701
+#
+# date_keys() and month_keys() give fact rows the same integer keys, so joins to
+# dim_date and monthly rollups run on int32 columns. The calendar work is done once
+# per day (a year of data has a few hundred), not once per fact row.
+
+EXCEL_EPOCH = pd.Timestamp('1899-12-30') # Day 0 of Excel serial dates
+
+DIM_DATE_COLUMNS = ['Date', 'Year', 'Month Number', 'Month Name', 'Month Short', 'Quarter',
+                    'Day of Week Number', 'Day of Week Name', 'Day of Week Short', 'Day of Month',
+                    'Week Number', 'Year Month Number', 'Year Month', 'Date Key']
+
+
+def dim_date_rows(dates):
+    """
+    Builds dim_date rows for the given dates.
+
+    Args:
+        dates (array-like): The dates (times of day are ignored).
+
+    Returns:
+        pandas.DataFrame: One dim_date row per date, with DIM_DATE_COLUMNS.
+    """
+    dates = pd.DatetimeIndex(dates).normalize()
+    month_name = dates.month_name()
+    day_name = dates.day_name()
+    weekday = dates.dayofweek # Monday = 0
+    jan1_weekday = (weekday - (dates.dayofyear - 1)) % 7
+    return pd.DataFrame({
+        'Date': (dates - EXCEL_EPOCH).days,
+        'Year': dates.year,
+        'Month Number': dates.month,
+        'Month Name': month_name,
+        'Month Short': month_name.str[:3],
+        'Quarter': 'Q' + dates.quarter.astype(str),
+        'Day of Week Number': weekday + 1,
+        'Day of Week Name': day_name,
+        'Day of Week Short': day_name.str[:3],
+        'Day of Month': dates.day,
+        'Week Number': (dates.dayofyear - 1 + jan1_weekday) // 7 + 1,
+        'Year Month Number': dates.year * 100 + dates.month,
+        'Year Month': dates.year.astype(str) + ' ' + month_name.str[:3],
+        'Date Key': (dates.year * 10000 + dates.month * 100 + dates.day).astype(np.int32),
+    }, columns=DIM_DATE_COLUMNS)
+
+
+def build_dim_date(start, end):
+    """
+    Builds the full date dimension for a range of days.
+
+    Args:
+        start, end (str or datetime): First and last day (inclusive).
+
+    Returns:
+        pandas.DataFrame: One dim_date row per day.
+    """
+    return dim_date_rows(pd.date_range(pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize(), freq='D'))
+
+
+def parse_invoice_dates(values):
+    """
+    Converts InvoiceDate values to datetimes, parsing each distinct value only once.
+
+    Excel serial numbers (as in dim_date 'Date') are converted from the Excel epoch;
+    strings and datetimes go through pd.to_datetime. Unparseable values become NaT.
+
+    Args:
+        values (pandas.Series): The raw InvoiceDate column.
+
+    Returns:
+        pandas.Series: datetime64 values with the same index.
+    """
+    codes, distinct = pd.factorize(values)
+    if pd.api.types.is_numeric_dtype(values):
+        parsed = pd.to_datetime(distinct, unit='D', origin=EXCEL_EPOCH)
+    else:
+        parsed = pd.to_datetime(distinct, errors='coerce')
+    result = parsed.take(codes, allow_fill=True, fill_value=pd.NaT) # Code -1 (missing) becomes NaT
+    return pd.Series(result, index=values.index, name=values.name)
+
+
+def date_keys(dates):
+    """
+    Date Key (yyyymmdd) of each datetime, computed once per day of the covered range.
+
+    Args:
+        dates (array-like): Datetimes without missing values.
+
+    Returns:
+        numpy.ndarray: int32 date keys.
+    """
+    days = np.asarray(dates, dtype='datetime64[ns]').astype('datetime64[D]').astype(np.int64)
+    if len(days) == 0:
+        return np.empty(0, np.int32)
+    # One key per day of the covered range, then an array lookup per row (no sort, no per-row calendar math)
+    first_day = days.min()
+    calendar = pd.DatetimeIndex(np.arange(first_day, days.max() + 1).astype('datetime64[D]'))
+    keys = (calendar.year * 10000 + calendar.month * 100 + calendar.day).to_numpy(np.int32)
+    return keys[days - first_day]
+
+
+def month_keys(date_key):
+    """Year Month Number (yyyymm) of each Date Key."""
+    return (np.asarray(date_key) // 100).astype(np.int32)
+
+
+def month_labels(year_month_numbers):
+    """dim_date 'Year Month' labels ('2011 Jul') for Year Month Number values (201107)."""
+    year_month_numbers = np.asarray(year_month_numbers)
+    return pd.Index(year_month_numbers // 100).astype(str) + ' ' + \
+        pd.to_datetime(year_month_numbers % 100, format='%m').strftime('%b')
+
+
+# =============================================
+# MAIN EXECUTION
+# =============================================
+if __name__ == "__main__":
+    # Configuration
+    start_date = '2010-12-01'
+    end_date = '2011-12-09'
+    output_path = 'dim_date.csv'
+
+    try:
+        dim_date = build_dim_date(start_date, end_date)
+        dim_date.to_csv(output_path, index=False)
+        print(f"Wrote {len(dim_date)} days ({start_date} to {end_date}) to '{output_path}'")
+        print(dim_date.head())
+    except Exception as e:
+        print(f"An error occurred: {e}")
@@ -0,0 +1,154 @@
+import pandas as pd
+import numpy as np
+import os
+import shutil
+import tempfile
+
+# =============================================
+# OUT-OF-CORE DUPLICATE DETECTION
+# =============================================
+# Finds duplicate rows in data that may not fit in memory, and reports which rows
+# they are (not just how many):
+#   1. Every row's key columns are hashed with pandas' vectorized row hash.
+#   2. Rows are split into partitions by hash and each partition is spilled to
+#      disk, so only one partition has to be in memory at a time.
+#   3. Inside a partition, rows whose hash occurs more than once are compared on
+#      their actual key values, so hash collisions never produce false matches.
+#   4. Each group of identical rows is emitted with the row number of its first
+#      occurrence, matching what drop_duplicates(keep='first') keeps.
+#
+# Chunks of one file can be read with different types: read_csv guesses them per chunk,
+# so InvoiceNo may be int64 in one chunk and text in the next (once 'C536379' appears).
+# The row hash of 536365 and '536365' differ, so for chunked input the key columns are
+# compared as text. Read CSVs with dtype=str to compare exactly the text in the file.
+
+HASH_COL = '_row_hash'
+ROW_COL = '_row_id'
+
+
+def _as_chunks(data):
+    # Accept a single DataFrame or any iterable of DataFrame chunks (e.g. read_csv(chunksize=...))
+    return [data] if isinstance(data, pd.DataFrame) else data
+
+
+def _text_keys(keys):
+    """The key columns as text (missing values stay missing), so every chunk hashes alike."""
+    return keys.astype({col: str for col in keys.columns if not pd.api.types.is_string_dtype(keys[col])})
+
+
+def find_duplicates(data, subset=None, n_partitions=64, spill_dir=None):
+    """
+    Finds groups of duplicate rows, optionally on a subset of key columns.
+
+    Args:
+        data (pandas.DataFrame or iterable): The rows to check, as one DataFrame or as
+                                             an iterable of chunks (row numbers continue
+                                             across chunks; key columns are compared as text).
+        subset (list): Key columns to compare, e.g. ['InvoiceNo', 'StockCode', 'Quantity'].
+                       Defaults to all columns.
+        n_partitions (int): Number of hash partitions. More partitions means less memory
+                            per partition when resolving duplicates.
+        spill_dir (str): Directory for the partition files. A DataFrame input is kept in
+                         memory when this is None; chunked input always spills, to a
+                         temporary directory if none is given.
+
+    Returns:
+        pandas.DataFrame: One row per member of a duplicate group, with columns
+                          'group_id', 'row_id' (0-based position in the input) and
+                          'first_row_id' (the first occurrence of that group). Rows
+                          where row_id != first_row_id are the duplicates to drop.
+    """
+    chunked = not isinstance(data, pd.DataFrame)
+    in_memory = not chunked and spill_dir is None
+    cleanup_dir = None
+    if not in_memory and spill_dir is None:
+        spill_dir = cleanup_dir = tempfile.mkdtemp(prefix='duplicates_')
+    elif spill_dir is not None:
+        os.makedirs(spill_dir, exist_ok=True)
+
+    partitions = {p: [] for p in range(n_partitions)}
+    try:
+        # --- Pass 1: hash every row and spill it to its partition ---
+        offset = 0
+        key_cols = subset
+        for chunk_no, chunk in enumerate(_as_chunks(data)):
+            if key_cols is None:
+                key_cols = list(chunk.columns)
+            keys = chunk[key_cols].reset_index(drop=True)
+            if chunked:
+                keys = _text_keys(keys)
+            hashes = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+            part = (hashes % np.uint64(n_partitions)).astype(np.int64)
+
+            keys[HASH_COL] = hashes
+            keys[ROW_COL] = np.arange(offset, offset + len(keys), dtype=np.int64)
+            offset += len(keys)
+
+            # Sort once by partition, then slice each partition's rows out of the chunk
+            order = np.argsort(part, kind='stable')
+            bounds = np.searchsorted(part[order], np.arange(n_partitions + 1))
+            for p in range(n_partitions):
+                if bounds[p] == bounds[p + 1]:
+                    continue
+                piece = keys.iloc[order[bounds[p]:bounds[p + 1]]]
+                if in_memory:
+                    partitions[p].append(piece)
+                else:
+                    path = os.path.join(spill_dir, f'part{p:04d}_{chunk_no:06d}.pkl')
+                    piece.to_pickle(path)
+                    partitions[p].append(path)
+
+        # --- Pass 2: resolve each partition exactly ---
+        groups = []
+        next_group_id = 0
+        for p in range(n_partitions):
+            if not partitions[p]:
+                continue
+            pieces = partitions[p] if in_memory else [pd.read_pickle(path) for path in partitions[p]]
+            rows = pd.concat(pieces, ignore_index=True)
+            # Only rows whose hash is shared can be duplicates
+            rows = rows[rows[HASH_COL].duplicated(keep=False)]
+            if rows.empty:
+                continue
+            # Compare the real key values (hash collisions fall into different groups)
+            group_no = rows.groupby(key_cols, dropna=False, sort=False).ngroup().to_numpy()
+            sizes = np.bincount(group_no)
+            is_dup = sizes[group_no] > 1
+            if not is_dup.any():
+                continue
+            found = pd.DataFrame({'group_no': group_no[is_dup], 'row_id': rows[ROW_COL].to_numpy()[is_dup]})
+            found['first_row_id'] = found.groupby('group_no')['row_id'].transform('min')
+            found['group_id'] = found['group_no'].rank(method='dense').astype(np.int64) - 1 + next_group_id
+            next_group_id = int(found['group_id'].max()) + 1
+            groups.append(found[['group_id', 'row_id', 'first_row_id']])
+    finally:
+        if cleanup_dir is not None:
+            shutil.rmtree(cleanup_dir, ignore_errors=True)
+
+    if not groups:
+        return pd.DataFrame({'group_id': [], 'row_id': [], 'first_row_id': []}, dtype=np.int64)
+    result = pd.concat(groups, ignore_index=True).sort_values(['first_row_id', 'row_id'], ignore_index=True)
+    # Number the groups in order of first occurrence, so the output is stable
+    result['group_id'] = result['first_row_id'].rank(method='dense').astype(np.int64) - 1
+    return result
+
+
+def drop_duplicate_rows(df, subset=None, n_partitions=64):
+    """
+    Cleaning stage: removes duplicate rows, keeping the first occurrence of each group.
+
+    Gives the same rows as df.drop_duplicates(subset=subset, keep='first').
+
+    Args:
+        df (pandas.DataFrame): The data to clean.
+        subset (list): Key columns to compare. Defaults to all columns.
+        n_partitions (int): Number of hash partitions.
+
+    Returns:
+        tuple: (the de-duplicated DataFrame, the duplicate groups from find_duplicates)
+    """
+    groups = find_duplicates(df, subset=subset, n_partitions=n_partitions)
+    to_drop = groups.loc[groups['row_id'] != groups['first_row_id'], 'row_id'].to_numpy()
+    keep = np.ones(len(df), dtype=bool)
+    keep[to_drop] = False
+    return df[keep], groups
@@ -0,0 +1,320 @@
+import pandas as pd
+import numpy as np
+import os
+from sales_cube import prepare_fact_rows
+from dim_date import date_keys, dim_date_rows
+
+# =============================================
+# DICTIONARY-ENCODED FACT TABLE
+# =============================================
+# Keeps fact_sales as plain numpy arrays of int32 surrogate keys and numeric measures
+# instead of a frame of text and datetime columns:
+#   product_key, country_key, customer_key - keys from dim_product / dim_country / dim_customer
+#   date_key                               - dim_date 'Date Key' (yyyymmdd, e.g. 20110701)
+#   invoice_key                            - key of InvoiceNo (dictionary kept with the facts)
+#   time_seconds                           - time of day of InvoiceDate
+#   quantity, unit_price, total_price      - the measures
+#
+# The dictionaries are the existing dim CSVs: each gets a key column ('Product Key',
+# 'Country Key', 'Customer Key'; dim_date already has 'Date Key'), numbered in file
+# order the first time. Values not yet in a dim are appended with the next free keys,
+# so keys already handed out never change and previously saved facts stay valid.
+# Dates missing from dim_date get their dim_date rows generated (see dim_date.py).
+#
+# Group-bys and joins then run on integers: a revenue per product is one bincount
+# over product_key, and a dim attribute is looked up by key.
+
+DIM_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'processed')
+
+# Dimension name -> (CSV file, natural key column, surrogate key column)
+DIMENSIONS = {
+    'product': ('dim_product.csv', 'StockCode', 'Product Key'),
+    'country': ('dim_country.csv', 'Country', 'Country Key'),
+    'customer': ('dim_customer.csv', 'CustomerID', 'Customer Key'),
+}
+DIM_DATE_FILE = 'dim_date.csv'
+
+FACT_COLUMNS = {
+    'invoice_key': np.int32, 'product_key': np.int32, 'customer_key': np.int32,
+    'country_key': np.int32, 'date_key': np.int32, 'time_seconds': np.int32,
+    'quantity': np.int32, 'unit_price': np.float64, 'total_price': np.float64,
+}
+
+
+class DimensionKeys:
+    """
+    Dictionary from a dimension's natural key to an int32 surrogate key.
+
+    Args:
+        frame (pandas.DataFrame): The dimension table (e.g. dim_product.csv).
+        natural_col (str): Column holding the natural key (e.g. 'StockCode'); values must be unique.
+        key_col (str): Surrogate key column; added (numbered 1..n in row order) if missing.
+    """
+
+    def __init__(self, frame, natural_col, key_col):
+        if key_col not in frame.columns:
+            frame = frame.assign(**{key_col: np.arange(1, len(frame) + 1)})
+        self.frame = frame.reset_index(drop=True)
+        self.natural_col = natural_col
+        self.key_col = key_col
+        self.added = 0 # Values appended since the dimension was loaded
+        self._index = pd.Index(self.frame[natural_col])
+        self._keys = self.frame[key_col].to_numpy(np.int32)
+        if not self._index.is_unique:
+            raise ValueError(f"'{natural_col}' has duplicate values; it cannot be used as a dictionary key.")
+
+    @classmethod
+    def load(cls, path, natural_col, key_col):
+        """Reads a dimension CSV."""
+        return cls(pd.read_csv(path), natural_col, key_col)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def encode(self, values, attributes=None):
+        """
+        Maps natural key values to surrogate keys, appending unknown values to the dimension.
+
+        Args:
+            values (array-like): Natural key values, one per fact row.
+            attributes (pandas.DataFrame): Optional rows with natural_col and other dim columns
+                                           (e.g. Description) used to fill in appended rows.
+
+        Returns:
+            numpy.ndarray: int32 surrogate keys.
+        """
+        positions = self._index.get_indexer(values)
+        missing = positions < 0
+        if missing.any():
+            new_values = pd.unique(np.asarray(values)[missing])
+            start = int(self._keys.max()) + 1 if len(self._keys) else 1
+            if start + len(new_values) > np.iinfo(np.int32).max:
+                raise OverflowError(f"'{self.key_col}' ran out of int32 keys.")
+            new_rows = pd.DataFrame({self.natural_col: new_values})
+            if attributes is not None:
+                first = attributes.drop_duplicates(self.natural_col).set_index(self.natural_col)
+                for col in first.columns.intersection(self.frame.columns):
+                    new_rows[col] = first[col].reindex(new_values).to_numpy()
+            new_rows[self.key_col] = np.arange(start, start + len(new_values))
+            self.frame = pd.concat([self.frame, new_rows.reindex(columns=self.frame.columns)], ignore_index=True)
+            self._index = self._index.append(pd.Index(new_values))
+            self._keys = np.concatenate([self._keys, new_rows[self.key_col].to_numpy(np.int32)])
+            self.added += len(new_values)
+            positions = self._index.get_indexer(values)
+        return self._keys[positions]
+
+    def lookup(self, keys, column=None):
+        """Returns a dimension column (default: the natural key) for each surrogate key."""
+        column = column or self.natural_col
+        return self.frame.set_index(self.key_col)[column].reindex(keys).to_numpy()
+
+    def save(self, path):
+        """Writes the dimension (with its key column) back to CSV."""
+        tmp_path = path + '.partial'
+        self.frame.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+
+class SurrogateKeys:
+    """
+    The dim dictionaries of the star schema: product, country, customer and dim_date.
+
+    Attributes:
+        dims (dict): Dimension name -> DimensionKeys, see DIMENSIONS.
+        dim_date (pandas.DataFrame): dim_date.csv, extended with any new dates.
+    """
+
+    def __init__(self, dims, dim_date):
+        self.dims = dims
+        self.dim_date = dim_date
+        self.dates_added = 0
+
+    @classmethod
+    def load(cls, dim_dir=DIM_DIR):
+        """Reads dim_product, dim_country, dim_customer and dim_date from dim_dir."""
+        dims = {name: DimensionKeys.load(os.path.join(dim_dir, file_name), natural_col, key_col)
+                for name, (file_name, natural_col, key_col) in DIMENSIONS.items()}
+        return cls(dims, pd.read_csv(os.path.join(dim_dir, DIM_DATE_FILE)))
+
+    def encode_dates(self, dates):
+        """Returns the Date Key of each date, adding missing dates to dim_date."""
+        keys = date_keys(dates)
+        missing = np.setdiff1d(np.unique(keys), self.dim_date['Date Key'].to_numpy())
+        if len(missing):
+            rows = dim_date_rows(pd.to_datetime(missing.astype(str), format='%Y%m%d'))
+            self.dim_date = pd.concat([self.dim_date, rows[self.dim_date.columns]], ignore_index=True)
+            self.dates_added += len(missing)
+        return keys
+
+    def save(self, dim_dir=DIM_DIR):
+        """Writes every dimension back to dim_dir (existing keys are unchanged)."""
+        for name, (file_name, _, _) in DIMENSIONS.items():
+            self.dims[name].save(os.path.join(dim_dir, file_name))
+        tmp_path = os.path.join(dim_dir, DIM_DATE_FILE + '.partial')
+        self.dim_date.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, os.path.join(dim_dir, DIM_DATE_FILE))
+
+    def report(self):
+        """Number of values appended to each dimension since loading."""
+        added = {name: dim.added for name, dim in self.dims.items()}
+        added['date'] = self.dates_added
+        return added
+
+
+class EncodedFactTable:
+    """
+    fact_sales as int32 key arrays and numeric measure arrays (see FACT_COLUMNS).
+
+    Args:
+        keys (SurrogateKeys): The dim dictionaries used to encode new rows.
+
+    Attributes:
+        invoices (DimensionKeys): InvoiceNo -> 'Invoice Key' dictionary, saved with the facts.
+    """
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.invoices = DimensionKeys(pd.DataFrame({'InvoiceNo': pd.Series(dtype=str)}), 'InvoiceNo', 'Invoice Key')
+        self._columns = {name: np.empty(0, dtype) for name, dtype in FACT_COLUMNS.items()}
+        self._pending = []
+
+    def append(self, batch):
+        """
+        Encodes fact_sales rows and appends them.
+
+        Args:
+            batch (pandas.DataFrame): fact_sales rows (see sales_cube.prepare_fact_rows).
+
+        Returns:
+            EncodedFactTable: self, so calls can be chained.
+        """
+        batch = prepare_fact_rows(batch)
+        dims = self.keys.dims
+        invoice_date = batch['InvoiceDate']
+        quantity = batch['Quantity'] if 'Quantity' in batch.columns else pd.Series(0, index=batch.index)
+        unit_price = batch['UnitPrice'] if 'UnitPrice' in batch.columns else pd.Series(np.nan, index=batch.index)
+        self._pending.append({
+            'invoice_key': self.invoices.encode(batch['InvoiceNo']),
+            'product_key': dims['product'].encode(batch['StockCode'], attributes=batch),
+            'customer_key': dims['customer'].encode(batch['CustomerID'], attributes=batch),
+            'country_key': dims['country'].encode(batch['Country'], attributes=batch),
+            'date_key': self.keys.encode_dates(invoice_date),
+            'time_seconds': (invoice_date - invoice_date.dt.normalize()).dt.total_seconds().to_numpy(np.int32),
+            'quantity': quantity.to_numpy(np.int32),
+            'unit_price': unit_price.to_numpy(np.float64),
+            'total_price': batch['TotalPrice'].to_numpy(np.float64),
+        })
+        return self
+
+    def append_csv(self, fact_path, chunksize=100_000):
+        """Encodes a fact_sales CSV in chunks, so the text columns are never all in memory."""
+        for chunk in pd.read_csv(fact_path, chunksize=chunksize):
+            self.append(chunk)
+        return self
+
+    def __getitem__(self, name):
+        if self._pending:
+            # Batches are joined once, on first access, instead of on every append
+            self._columns = {col: np.concatenate([self._columns[col]] + [part[col] for part in self._pending])
+                             for col in FACT_COLUMNS}
+            self._pending = []
+        return self._columns[name]
+
+    def __len__(self):
+        return len(self['invoice_key'])
+
+    @property
+    def nbytes(self):
+        """Memory used by the fact arrays."""
+        return sum(self[name].nbytes for name in FACT_COLUMNS)
+
+    def sum_by(self, key, measure='total_price'):
+        """
+        Sums a measure per key value (GROUP BY on an integer key).
+
+        Args:
+            key (str): Key column, e.g. 'product_key' or 'date_key'.
+            measure (str): Measure column.
+
+        Returns:
+            pandas.Series: Sum of the measure per key value, indexed by key.
+        """
+        values, inverse = np.unique(self[key], return_inverse=True)
+        return pd.Series(np.bincount(inverse, weights=self[measure], minlength=len(values)), index=values)
+
+    def distinct_count(self, key):
+        """COUNT(DISTINCT key)."""
+        return len(np.unique(self[key]))
+
+    def to_frame(self):
+        """Decodes the facts back to a frame with the natural keys (for exports and checks)."""
+        dims = self.keys.dims
+        date_key = self['date_key']
+        invoice_date = pd.to_datetime(date_key.astype(str), format='%Y%m%d') + pd.to_timedelta(self['time_seconds'], unit='s')
+        return pd.DataFrame({
+            'InvoiceNo': self.invoices.lookup(self['invoice_key']),
+            'StockCode': dims['product'].lookup(self['product_key']),
+            'Quantity': self['quantity'],
+            'InvoiceDate': invoice_date,
+            'UnitPrice': self['unit_price'],
+            'CustomerID': dims['customer'].lookup(self['customer_key']),
+            'Country': dims['country'].lookup(self['country_key']),
+            'TotalPrice': self['total_price'],
+        })
+
+    def save(self, path):
+        """Saves the fact arrays and the invoice dictionary to a .npz file (the dims are saved with SurrogateKeys.save)."""
+        np.savez(path, invoice_numbers=self.invoices.frame['InvoiceNo'].to_numpy(str),
+                 **{name: self[name] for name in FACT_COLUMNS})
+
+    @classmethod
+    def load(cls, path, keys):
+        """Loads facts saved with save(); keys must be the (saved) dims they were encoded with."""
+        table = cls(keys)
+        with np.load(path) as data:
+            invoice_numbers = data['invoice_numbers']
+            table.invoices = DimensionKeys(pd.DataFrame({'InvoiceNo': invoice_numbers,
+                                                         'Invoice Key': np.arange(1, len(invoice_numbers) + 1)}),
+                                           'InvoiceNo', 'Invoice Key')
+            table._columns = {name: data[name] for name in FACT_COLUMNS}
+        return table
+
+
+# =============================================
+# MAIN EXECUTION
+# =============================================
+if __name__ == "__main__":
+    # Configuration
+    fact_path = 'fact_sales.csv'
+    dim_dir = DIM_DIR
+    encoded_path = 'fact_sales_encoded.npz'
+    chunk_size = 100_000
+
+    if not os.path.exists(fact_path):
+        print(f"Error: File not found at {fact_path}")
+        exit()
+
+    try:
+        keys = SurrogateKeys.load(dim_dir)
+        facts = EncodedFactTable(keys).append_csv(fact_path, chunk_size)
+        print(f"Encoded {len(facts):,} fact rows into {facts.nbytes / 1024**2:.1f} MB of arrays")
+        print("Values added to the dims:", keys.report())
+        keys.save(dim_dir)
+        facts.save(encoded_path)
+        print(f"Saved '{encoded_path}' and the dims in '{dim_dir}'")
+
+        # The star schema queries on integer keys
+        print(f"\nTotal sales: {facts['total_price'].sum():,.2f}")
+        print(f"Average order value: {facts['total_price'].sum() / facts.distinct_count('invoice_key'):,.2f}")
+
+        top_products = facts.sum_by('product_key').nlargest(10)
+        print("\nTop 10 Products by Revenue:")
+        print(pd.DataFrame({'Description': keys.dims['product'].lookup(top_products.index, 'Description'),
+                            'Revenue': top_products.to_numpy()}))
+
+        monthly = facts.sum_by('date_key').groupby(lambda key: key // 100).sum()
+        labels = keys.dim_date.drop_duplicates('Year Month Number').set_index('Year Month Number')['Year Month']
+        print("\nMonthly Revenue Trend:")
+        print(pd.Series(monthly.to_numpy(), index=labels.reindex(monthly.index).to_numpy(), name='monthly_revenue'))
+    except Exception as e:
+        print(f"An error occurred: {e}")
@@ -1,12 +1,20 @@
 import pandas as pd
-from sqlalchemy import create_engine
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine, text
+from sqlalchemy.types import BigInteger, DateTime, Float, Integer, String, Unicode
+from pipeline_utils import is_intermediate, iter_frames
 
 # Database connection parameters
 server = 'UGWANE'
 database = 'OnlineRetailStarSchema'
 conn_str = f"mssql+pyodbc://{server}/{database}?driver=ODBC+Driver+17+for+SQL+Server"
+# For local testing, a SQLite (or DuckDB, with duckdb-engine installed) file works as a stand-in:
+# conn_str = "sqlite:///OnlineRetailStarSchema.db"
 
 # CSV file paths (update these with your actual paths)
+# .arrow files written by dataMod.py (output_format='arrow') can be listed instead; they are
+# memory-mapped and keep their column types, so nothing is re-parsed
 csv_files = {
     'dim_country': 'dim_country.csv',
     'dim_customer': 'dim_customer.csv',
@@ -15,6 +23,30 @@ csv_files = {
     'fact_sales': 'fact_sales.csv'
 }
 
+# Bulk-load settings
+bulk_mode = True          # Chunked, batched, concurrent loading (False = original one-shot to_sql)
+use_staging = True        # Load into a staging table and swap it in inside one transaction
+chunk_size = 50_000       # Rows read from the CSV and inserted per chunk
+max_workers = 4           # Dimension tables loaded at the same time (also the connection pool size)
+
+# Explicit column types, so every chunk creates/matches the same table definition
+# instead of letting pandas guess the types from whatever the first chunk contains
+table_dtypes = {
+    'dim_country': {'Country': Unicode(100)},
+    'dim_customer': {'CustomerID': Integer()},
+    'dim_date': {
+        'Date': Integer(), 'Year': Integer(), 'Month Number': Integer(), 'Month Name': String(20),
+        'Month Short': String(3), 'Quarter': String(2), 'Day of Week Number': Integer(),
+        'Day of Week Name': String(20), 'Day of Week Short': String(3), 'Day of Month': Integer(),
+        'Week Number': Integer(), 'Year Month Number': Integer(), 'Year Month': String(8), 'Date Key': Integer()
+    },
+    'dim_product': {'Description': Unicode(255), 'StockCode': BigInteger()},
+    'fact_sales': {
+        'InvoiceNo': String(20), 'StockCode': BigInteger(), 'Quantity': Integer(), 'InvoiceDate': DateTime(),
+        'UnitPrice': Float(), 'CustomerID': Integer(), 'Country': Unicode(100), 'TotalPrice': Float()
+    }
+}
+
 def import_csv_to_sql(csv_path, table_name, engine):
     """Import a CSV file to SQL Server table"""
     try:
@@ -28,15 +60,133 @@ def import_csv_to_sql(csv_path, table_name, engine):
     except Exception as e:
         print(f"Error importing {table_name}: {str(e)}")
 
+def read_chunks(path, chunksize, parse_dates=None):
+    """
+    Yields a CSV or .arrow file in chunks of at most chunksize rows.
+
+    CSV files are parsed chunk by chunk. Arrow IPC files from the columnar store are
+    memory-mapped and sliced record batch by record batch; their columns already have
+    the types they were written with.
+    """
+    if is_intermediate(path):
+        for batch in iter_frames(path):
+            for start in range(0, len(batch), chunksize):
+                yield batch.iloc[start:start + chunksize]
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize, parse_dates=parse_dates or False)
+
+def create_bulk_engine(connection_string, pool_size=max_workers):
+    """
+    Creates an engine set up for bulk inserts.
+
+    On SQL Server, pyodbc's fast_executemany sends each batch of rows in one round
+    trip instead of one INSERT per row. SQLite gets a longer lock timeout so the
+    concurrent dimension loads wait for each other instead of failing.
+    """
+    if connection_string.startswith('mssql+pyodbc'):
+        return create_engine(connection_string, fast_executemany=True, pool_size=pool_size)
+    if connection_string.startswith('sqlite'):
+        return create_engine(connection_string, connect_args={'timeout': 60})
+    return create_engine(connection_string, pool_size=pool_size)
+
+def bulk_import_csv_to_sql(csv_path, table_name, engine, chunksize=chunk_size, staging=use_staging):
+    """
+    Streams a CSV (or .arrow) file into a table in chunks using batched inserts.
+
+    Args:
+        csv_path (str): The CSV or .arrow file to load.
+        table_name (str): The target table. It is created if it does not exist.
+        engine (sqlalchemy.engine.Engine): Engine from create_bulk_engine().
+        chunksize (int): Rows read and inserted per chunk.
+        staging (bool): Load into '<table>_staging' first and move the rows into the
+                        target table in the same transaction, so a failed load leaves
+                        the target table untouched.
+
+    Returns:
+        dict: Table name, rows loaded, seconds taken and rows per second.
+    """
+    dtype = table_dtypes.get(table_name)
+    parse_dates = [col for col, col_type in (dtype or {}).items() if isinstance(col_type, DateTime)]
+    load_table = f"{table_name}_staging" if staging else table_name
+    start = time.perf_counter()
+    rows = 0
+    columns = None
+
+    # With staging, everything below runs in one transaction that is rolled back on any error
+    with (engine.begin() if staging else engine.connect()) as conn:
+        for i, chunk in enumerate(read_chunks(csv_path, chunksize, parse_dates)):
+            if staging and i == 0:
+                # Create the target table (if needed) with the explicit types, then a fresh staging table
+                chunk.head(0).to_sql(table_name, conn, if_exists='append', index=False, dtype=dtype)
+                chunk.to_sql(load_table, conn, if_exists='replace', index=False, dtype=dtype)
+            else:
+                chunk.to_sql(load_table, conn, if_exists='append', index=False, dtype=dtype)
+            rows += len(chunk)
+            columns = list(chunk.columns)
+
+            if not staging:
+                # Without staging each chunk is committed on its own
+                conn.commit()
+
+        if staging and rows:
+            column_list = ', '.join(f'"{col}"' for col in columns)
+            conn.execute(text(f'INSERT INTO "{table_name}" ({column_list}) SELECT {column_list} FROM "{load_table}"'))
+            conn.execute(text(f'DROP TABLE "{load_table}"'))
+
+    seconds = time.perf_counter() - start
+    stats = {'table': table_name, 'rows': rows, 'seconds': round(seconds, 3),
+             'rows_per_second': round(rows / seconds) if seconds > 0 else None}
+    print(f"Successfully imported {rows} rows to {table_name} in {seconds:.2f}s ({stats['rows_per_second']} rows/s)")
+    return stats
+
+def bulk_import_all(files, engine, workers=max_workers):
+    """
+    Loads the dimension tables concurrently, then the fact table.
+
+    Args:
+        files (dict): Table name -> CSV path.
+        engine (sqlalchemy.engine.Engine): Engine from create_bulk_engine().
+        workers (int): Number of dimension tables loaded at the same time.
+
+    Returns:
+        list: The stats dict of every table that loaded successfully.
+    """
+    dimension_tables = {name: path for name, path in files.items() if not name.startswith('fact_')}
+    fact_tables = {name: path for name, path in files.items() if name.startswith('fact_')}
+    results = []
+
+    def load(table_name, csv_path):
+        try:
+            results.append(bulk_import_csv_to_sql(csv_path, table_name, engine))
+        except Exception as e:
+            print(f"Error importing {table_name}: {str(e)}")
+
+    # Dimension tables are independent of each other, so they share the connection pool
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for table_name, csv_path in dimension_tables.items():
+            executor.submit(load, table_name, csv_path)
+
+    # Fact tables reference the dimensions, so they are loaded once those are in
+    for table_name, csv_path in fact_tables.items():
+        load(table_name, csv_path)
+
+    print("\nLoad summary (rows/s per table):")
+    for stats in results:
+        print(f"  {stats['table']:<15} {stats['rows']:>10} rows  {stats['rows_per_second']} rows/s")
+    return results
+
 def main():
     try:
         # Create SQLAlchemy engine
-        engine = create_engine(conn_str)
+        engine = create_bulk_engine(conn_str) if bulk_mode else create_engine(conn_str)
         print("Connected to SQL Server successfully")
         
         # Import each CSV file
-        for table_name, csv_path in csv_files.items():
-            import_csv_to_sql(csv_path, table_name, engine)
+        if bulk_mode:
+            bulk_import_all(csv_files, engine)
+        else:
+            for table_name, csv_path in csv_files.items():
+                import_csv_to_sql(csv_path, table_name, engine)
             
     except Exception as e:
         print(f"Database connection error: {str(e)}")
@@ -0,0 +1,173 @@
+import pandas as pd
+import numpy as np
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dim_date import date_keys, month_keys
+from pipeline_utils import track
+
+# =============================================
+# PARTITIONED MULTI-CORE AGGREGATION
+# =============================================
+# Computes the aggregates behind analyze_sales, analyze_products and the RFM state in
+# a process pool:
+#   1. The cleaned rows are reduced to integer/float columns (Description, CustomerID and
+#      InvoiceNo become integer codes), sorted by partition (month, or customer hash) and
+#      written as .npy files. Workers memory-map those files and read their row range, so
+#      no DataFrame is pickled to a worker.
+#   2. Each worker computes partials for its partition: revenue per product code and per
+#      day (bincount), and one entry per (customer, invoice) order with its revenue and
+#      latest InvoiceDate - the distinct set behind the RFM Frequency.
+#   3. The partials are merged exactly: bincounts are added, and orders that appear in
+#      several partitions are combined (sum of revenue, max of date), so the order set is
+#      the same however the rows were partitioned.
+#
+# The order table has one row per (CustomerID, InvoiceNo), so it can be folded into an
+# RFMState in place of the invoice lines with the same result (last purchase, distinct
+# orders, total spend) and a fraction of the rows.
+#
+# Sums are added in a different order than a single-threaded groupby, so totals can differ
+# in the last floating-point digit.
+
+PARTITION_BY = ('month', 'customer')
+MIN_ROWS_PER_WORKER = 50_000 # Smaller inputs are aggregated in-process; the pool would cost more than it saves
+
+# Column name -> dtype of the memory-mapped column files
+STORE_COLUMNS = {
+    'product': np.int32, 'customer': np.int32, 'invoice': np.int32,
+    'day': np.int32, 'invoice_date': np.int64, 'total': np.float64,
+}
+
+
+def _write_column_store(df, store_dir, partition_by, n_partitions):
+    """Encodes the columns, sorts rows by partition and writes one .npy file per column."""
+    product_codes, products = pd.factorize(df['Description']) # NaN descriptions get code -1
+    customer_codes, customers = pd.factorize(df['CustomerID'])
+    invoice_codes, invoices = pd.factorize(df['InvoiceNo'].astype(str))
+    invoice_date = df['InvoiceDate'].to_numpy(dtype='datetime64[ns]')
+    day = invoice_date.astype('datetime64[D]').astype(np.int64)
+    first_day = int(day.min())
+
+    if partition_by == 'month':
+        partition = month_keys(date_keys(invoice_date))
+    else:
+        partition = customer_codes % n_partitions
+    order = np.argsort(partition, kind='stable')
+    partition = partition[order]
+    bounds = np.flatnonzero(np.diff(partition)) + 1
+    starts = np.concatenate([[0], bounds])
+    stops = np.concatenate([bounds, [len(partition)]])
+
+    columns = {
+        'product': product_codes, 'customer': customer_codes, 'invoice': invoice_codes,
+        'day': day - first_day, 'invoice_date': invoice_date.view(np.int64),
+        'total': df['TotalPrice'].to_numpy(np.float64),
+    }
+    for name, values in columns.items():
+        np.save(os.path.join(store_dir, f'{name}.npy'), np.asarray(values, dtype=STORE_COLUMNS[name])[order])
+
+    dictionaries = {
+        'products': pd.Index(products), 'customers': pd.Index(customers), 'invoices': pd.Index(invoices),
+        'first_day': first_day, 'n_days': int(day.max()) - first_day + 1,
+    }
+    return list(zip(starts.tolist(), stops.tolist())), dictionaries
+
+
+def _aggregate_partition(store_dir, start, stop, n_products, n_days, n_invoices):
+    """Partials for rows [start, stop) of the column store (runs in a worker process)."""
+    cols = {name: np.load(os.path.join(store_dir, f'{name}.npy'), mmap_mode='r')[start:stop] for name in STORE_COLUMNS}
+    total = np.asarray(cols['total'])
+    product = np.asarray(cols['product'])
+    has_product = product >= 0
+    product_revenue = np.bincount(product[has_product], weights=total[has_product], minlength=n_products)
+    daily_revenue = np.bincount(cols['day'], weights=total, minlength=n_days)
+
+    # One entry per distinct (customer, invoice) in the partition
+    order_key = np.asarray(cols['customer'], dtype=np.int64) * n_invoices + cols['invoice']
+    orders, inverse = np.unique(order_key, return_inverse=True)
+    order_revenue = np.bincount(inverse, weights=total, minlength=len(orders))
+    order_last = np.full(len(orders), np.iinfo(np.int64).min, dtype=np.int64)
+    np.maximum.at(order_last, inverse, cols['invoice_date'])
+    return product_revenue, daily_revenue, orders, order_revenue, order_last
+
+
+def _merge_orders(order_parts):
+    orders = np.concatenate([part[0] for part in order_parts])
+    revenue = np.concatenate([part[1] for part in order_parts])
+    last = np.concatenate([part[2] for part in order_parts])
+    merged, inverse = np.unique(orders, return_inverse=True)
+    merged_last = np.full(len(merged), np.iinfo(np.int64).min, dtype=np.int64)
+    np.maximum.at(merged_last, inverse, last)
+    return merged, np.bincount(inverse, weights=revenue, minlength=len(merged)), merged_last
+
+
+@track()
+def parallel_aggregates(df, max_workers=None, partition_by='month', n_partitions=None, store_dir=None):
+    """
+    Aggregates the cleaned retail rows across worker processes.
+
+    Args:
+        df (pandas.DataFrame): Output of load_and_clean_data.
+        max_workers (int): Worker processes. Defaults to the number of CPUs; 1 runs in-process.
+        partition_by (str): 'month' (calendar month of InvoiceDate) or 'customer' (hash of CustomerID).
+        n_partitions (int): Number of customer-hash partitions. Defaults to 4 per worker.
+        store_dir (str): Directory for the memory-mapped column files. A temporary
+                         directory (removed afterwards) is used when this is None.
+
+    Returns:
+        dict:
+            'product_revenue' - TotalPrice per Description (as groupby('Description').sum()),
+            'daily_sales'     - TotalPrice per day over the full date range (as resample('D').sum()),
+            'monthly_sales'   - TotalPrice per InvoiceYearMonth (yyyymm),
+            'orders'          - one row per (CustomerID, InvoiceNo) with the latest InvoiceDate
+                                and the summed TotalPrice, for RFMState.update.
+    """
+    if partition_by not in PARTITION_BY:
+        raise ValueError(f"partition_by must be one of {PARTITION_BY}, not '{partition_by}'.")
+    if df.empty:
+        raise ValueError("No rows to aggregate.")
+    max_workers = max_workers or os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(df) // MIN_ROWS_PER_WORKER))
+    n_partitions = n_partitions or 4 * max_workers
+
+    cleanup_dir = None
+    if store_dir is None:
+        store_dir = cleanup_dir = tempfile.mkdtemp(prefix='retail_columns_')
+    else:
+        os.makedirs(store_dir, exist_ok=True)
+    try:
+        partitions, dicts = _write_column_store(df, store_dir, partition_by, n_partitions)
+        sizes = (len(dicts['products']), dicts['n_days'], len(dicts['invoices']))
+        if max_workers == 1:
+            partials = [_aggregate_partition(store_dir, start, stop, *sizes) for start, stop in partitions]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(_aggregate_partition, store_dir, start, stop, *sizes) for start, stop in partitions]
+                partials = [future.result() for future in futures]
+    finally:
+        if cleanup_dir:
+            shutil.rmtree(cleanup_dir, ignore_errors=True)
+
+    # --- Exact merge of the partials ---
+    product_revenue = np.sum([part[0] for part in partials], axis=0)
+    daily_revenue = np.sum([part[1] for part in partials], axis=0)
+    orders, order_revenue, order_last = _merge_orders([part[2:] for part in partials])
+
+    days = pd.date_range(pd.Timestamp(dicts['first_day'], unit='D'), periods=dicts['n_days'], freq='D', name='InvoiceDate')
+    daily_sales = pd.Series(daily_revenue, index=days, name='TotalPrice')
+    monthly_sales = daily_sales.groupby(month_keys(date_keys(days))).sum()
+    monthly_sales.index.name = 'InvoiceYearMonth'
+
+    n_invoices = len(dicts['invoices'])
+    return {
+        'product_revenue': pd.Series(product_revenue, index=dicts['products'].rename('Description'), name='TotalPrice').sort_index(),
+        'daily_sales': daily_sales,
+        'monthly_sales': monthly_sales,
+        'orders': pd.DataFrame({
+            'CustomerID': dicts['customers'].take(orders // n_invoices).to_numpy(),
+            'InvoiceNo': dicts['invoices'].take(orders % n_invoices).to_numpy(),
+            'InvoiceDate': order_last.view('datetime64[ns]'),
+            'TotalPrice': order_revenue,
+        }),
+    }
@@ -1,11 +1,18 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.cluster import KMeans
 import warnings
 import os
+import json
 from datetime import datetime
+from retail_loader import file_content_hash, load_workbook
+from rfm_state import RFMState
+from segmentation_model import SegmentationModel, load_or_fit_model, update_segment_file
+from duplicate_engine import drop_duplicate_rows
+from retail_charts import render_charts, show_chart, PLOTS_DIR
+from dim_date import parse_invoice_dates, date_keys, month_keys, month_labels
+from parallel_aggregation import parallel_aggregates
+from pipeline_utils import print_summary, track
 
 # =============================================
 # 1. INITIAL SETUP & CONFIGURATION
@@ -17,22 +24,23 @@ pd.set_option('display.max_columns', None)
 # =============================================
 # 2. DATA LOADING & CLEANING
 # =============================================
-def load_and_clean_data(file_path):
-    """Load and clean the retail data"""
+@track()
+def load_and_clean_data(file_path, duplicate_keys=None):
+    """Load and clean the retail data
+
+    duplicate_keys: optional list of key columns (e.g. ['InvoiceNo', 'StockCode', 'Quantity']);
+    when set, rows repeating those keys are dropped, keeping the first occurrence.
+    """
     try:
         print(f"\n{'='*50}\nLoading data from: {file_path}\n{'='*50}")
-        df = pd.read_excel(file_path, header=0)
+        df = load_workbook(file_path, header=0) # Parsed once, then served from the cache
         print(f"Initial shape: {df.shape}")
         
-        # Convert InvoiceDate to datetime objects, specifically handling Excel's serial date format
-        if pd.api.types.is_numeric_dtype(df['InvoiceDate']):
-            # If InvoiceDate is numerical (Excel serial date number), convert it
-            df['InvoiceDate'] = pd.to_datetime(df['InvoiceDate'], unit='D', origin='1899-12-30')
-            print("Converted InvoiceDate from Excel serial number.")
-        else:
-            # If InvoiceDate is read as a string or actual datetime object (which it often is directly from read_excel)
-            df['InvoiceDate'] = pd.to_datetime(df['InvoiceDate'], errors='coerce')
-            print("Converted InvoiceDate from string/datetime.")
+        # Convert InvoiceDate to datetime objects, specifically handling Excel's serial date format.
+        # Invoices share timestamps, so each distinct value is converted once and mapped back to the rows
+        excel_serial = pd.api.types.is_numeric_dtype(df['InvoiceDate'])
+        df['InvoiceDate'] = parse_invoice_dates(df['InvoiceDate'])
+        print("Converted InvoiceDate from Excel serial number." if excel_serial else "Converted InvoiceDate from string/datetime.")
 
         date_nan_count = df['InvoiceDate'].isna().sum()
         df.dropna(subset=['InvoiceDate'], inplace=True)
@@ -51,10 +59,19 @@ def load_and_clean_data(file_path):
         original_qty_price_rows = len(df)
         df = df[(df['Quantity'] > 0) & (df['UnitPrice'] > 0)]
         print(f"Removed {original_qty_price_rows - len(df)} rows with Quantity <= 0 or UnitPrice <= 0.")
+
+        # Optional duplicate removal on the chosen key columns
+        if duplicate_keys:
+            df, duplicate_groups = drop_duplicate_rows(df, subset=duplicate_keys)
+            print(f"Removed {len(duplicate_groups) - duplicate_groups['group_id'].nunique()} duplicate rows "
+                  f"({duplicate_groups['group_id'].nunique()} groups) on {', '.join(duplicate_keys)}.")
         
         # Create derived columns
         df['TotalPrice'] = df['Quantity'] * df['UnitPrice']
-        df['InvoiceYearMonth'] = df['InvoiceDate'].dt.to_period('M')
+        # Integer dim_date keys: DateKey (yyyymmdd) joins to dim_date 'Date Key',
+        # InvoiceYearMonth (yyyymm) to 'Year Month Number' and drives the monthly rollups
+        df['DateKey'] = date_keys(df['InvoiceDate'])
+        df['InvoiceYearMonth'] = month_keys(df['DateKey'])
         
         print(f"\nCleaned shape: {df.shape}")
         print("\nSample data after cleaning and date fix:")
@@ -68,54 +85,69 @@ def load_and_clean_data(file_path):
 # =============================================
 # 3. SALES ANALYSIS
 # =============================================
-def analyze_sales(df):
-    """Perform sales trend analysis"""
+@track()
+def analyze_sales(df, charts=None, aggregates=None):
+    """Perform sales trend analysis.
+
+    Charts are shown on screen, or, when a charts dict is passed (headless mode), their
+    input data is added to it for render_charts() to save in parallel. With aggregates
+    from parallel_aggregates(), the daily and monthly totals are taken from there.
+    """
     print(f"\n{'='*50}\nSales Analysis\n{'='*50}")
     
     # Daily sales trend
-    daily_sales = df.set_index('InvoiceDate')['TotalPrice'].resample('D').sum()
+    if aggregates is not None:
+        daily_sales = aggregates['daily_sales']
+    else:
+        daily_sales = df.set_index('InvoiceDate')['TotalPrice'].resample('D').sum()
     
-    plt.figure(figsize=(15, 7))
-    daily_sales.plot(title='Daily Sales Trend', label='Daily Sales', alpha=0.8)
-    daily_sales.rolling(window=30).mean().plot(label='30-Day Moving Avg', color='red', linewidth=2)
-    plt.legend()
-    plt.ylabel('Total Sales')
-    plt.xlabel('Date')
-    plt.grid(True)
-    plt.tight_layout()
-    plt.show()
+    if charts is not None:
+        charts['daily_trend'] = daily_sales
+    else:
+        show_chart('daily_trend', daily_sales)
     
     # Monthly sales
-    monthly_sales = df.groupby('InvoiceYearMonth')['TotalPrice'].sum()
+    if aggregates is not None:
+        monthly_sales = aggregates['monthly_sales'].copy()
+    else:
+        monthly_sales = df.groupby('InvoiceYearMonth')['TotalPrice'].sum()
+    monthly_sales.index = month_labels(monthly_sales.index).rename('Year Month') # dim_date label, e.g. '2011 Jul'
     print("\nMonthly Sales:")
     print(monthly_sales)
 
 # =============================================
 # 4. RFM ANALYSIS & CUSTOMER SEGMENTATION
 # =============================================
-def perform_rfm_analysis(df):
-    """Perform RFM analysis and customer segmentation"""
+@track()
+def perform_rfm_analysis(df, rfm_state=None, model_path=None, charts=None):
+    """Perform RFM analysis and customer segmentation.
+
+    If an RFMState is passed it must already contain df's invoices (see update_rfm_state);
+    otherwise a fresh state is built from df. With a model_path, the saved segmentation
+    model is reused (or fitted and saved on the first run) so segment IDs stay stable.
+    The segment chart goes to the charts dict in headless mode (see analyze_sales).
+    """
     print(f"\n{'='*50}\nRFM Customer Segmentation\n{'='*50}")
     
-    # Define a snapshot date for Recency calculation - typically one day after the last invoice date in the dataset
-    snapshot_date = df['InvoiceDate'].max() + pd.Timedelta(days=1)
+    if rfm_state is None:
+        rfm_state = RFMState()
+        rfm_state.update(df)
     
-    rfm = df.groupby('CustomerID').agg(
-        Recency=('InvoiceDate', lambda x: (snapshot_date - x.max()).days), # Days since last purchase
-        Frequency=('InvoiceNo', 'nunique'), # Number of unique orders
-        Monetary=('TotalPrice', 'sum') # Total money spent
-    ).reset_index()
+    # Recency is measured from a snapshot date one day after the last invoice date in the state,
+    # computed for all customers with one vectorized subtraction
+    rfm = rfm_state.to_frame() # CustomerID, Recency (days), Frequency (unique orders), Monetary (total spent)
     
     # Drop rows where Monetary is 0 or NaN, as these customers won't be useful for RFM analysis
     rfm.dropna(subset=['Monetary'], inplace=True)
     rfm = rfm[rfm['Monetary'] > 0]
 
     if len(rfm) > 0: # Ensure there's data for KMeans
-        # KMeans clustering
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore", category=UserWarning)
-            kmeans = KMeans(n_clusters=4, random_state=42, n_init='auto')
-            rfm['Segment'] = kmeans.fit_predict(rfm[['Recency', 'Frequency', 'Monetary']])
+        # KMeans clustering on scaled RFM values; segment IDs are ordered by average Monetary value
+        if model_path is not None:
+            model, _ = load_or_fit_model(model_path, rfm)
+        else:
+            model = SegmentationModel(n_clusters=4, random_state=42).fit(rfm)
+        rfm['Segment'] = model.predict(rfm)
         
         # Segment analysis
         segment_stats = rfm.groupby('Segment').agg(
@@ -128,41 +160,72 @@ def perform_rfm_analysis(df):
         print("\nCustomer Segments:")
         print(segment_stats)
         
-        # Visualize segments
-        plt.figure(figsize=(12, 8))
-        sns.scatterplot(data=rfm, x='Frequency', y='Monetary', hue='Segment', palette='viridis', s=80, alpha=0.7)
-        plt.title('Customer Segments by Frequency vs Monetary Value')
-        plt.xlabel('Frequency (Number of Orders)')
-        plt.ylabel('Monetary Value (Total Spent)')
-        plt.grid(True)
-        plt.tight_layout()
-        plt.show()
+        # Visualize segments (drawn as a hexbin for very large customer counts)
+        segment_points = rfm[['Frequency', 'Monetary', 'Segment']]
+        if charts is not None:
+            charts['segment_scatter'] = segment_points
+        else:
+            show_chart('segment_scatter', segment_points)
 
         return rfm # Return the rfm DataFrame
     else:
         print("No valid customer data for RFM segmentation after cleaning.")
         return None # Return None if no valid data
 
+def rfm_source(file_path, duplicate_keys=None):
+    """Identify the input of the RFM state: the workbook's content hash and the cleaning options"""
+    return json.dumps({'sha256': file_content_hash(file_path), 'duplicate_keys': duplicate_keys})
+
+@track()
+def update_rfm_state(df, state_path, source):
+    """Load the persisted RFM state, or rebuild it from df when it was built from another input.
+
+    Returns the state, the customers that are new or changed since the saved state and
+    the customers that are no longer in the data (both empty when the input is unchanged).
+    """
+    previous = RFMState.load(state_path)
+    if previous.source == source:
+        print(f"RFM state '{state_path}' is up to date with the input.")
+        return previous, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    rfm_state = RFMState(source=source)
+    rfm_state.update(df)
+    changed, removed = rfm_state.changes_since(previous)
+    rfm_state.save(state_path)
+    print(f"RFM state '{state_path}' rebuilt: {len(changed)} customers new or changed, {len(removed)} removed.")
+    return rfm_state, changed, removed
+
+@track()
+def score_changed_customers(rfm_state, changed_ids, removed_ids, model_path, segments_path):
+    """Assign segments to new or changed customers only, using the saved model (no refit)"""
+    rfm_changed = rfm_state.to_frame(customer_ids=changed_ids)
+    kept = rfm_changed['Monetary'] > 0 # Same filter as the full analysis
+    removed_ids = np.union1d(removed_ids, rfm_changed.loc[~kept, 'CustomerID'].to_numpy())
+    rfm_changed = rfm_changed[kept]
+    if len(rfm_changed) or len(removed_ids):
+        update_segment_file(segments_path, SegmentationModel.load(model_path), rfm_changed, removed_ids)
+    print(f"Re-scored {len(rfm_changed)} new or changed customers into '{segments_path}', removed {len(removed_ids)}")
+
 # =============================================
 # 5. PRODUCT ANALYSIS
 # =============================================
-def analyze_products(df):
-    """Analyze product performance"""
+@track()
+def analyze_products(df, charts=None, aggregates=None):
+    """Analyze product performance (charts and aggregates are used as in analyze_sales)"""
     print(f"\n{'='*50}\nProduct Analysis\n{'='*50}")
     
     # Top products
-    top_products = df.groupby('Description')['TotalPrice'].sum().nlargest(10)
-    
-    if not top_products.empty:
-        plt.figure(figsize=(12, 6))
-        top_products.sort_values().plot(kind='barh', color='skyblue')
-        plt.title('Top 10 Products by Revenue')
-        plt.xlabel('Total Revenue')
-        plt.ylabel('Product Description')
-        plt.tight_layout()
-        plt.show()
+    if aggregates is not None:
+        product_revenue = aggregates['product_revenue']
     else:
+        product_revenue = df.groupby('Description')['TotalPrice'].sum()
+    top_products = product_revenue.nlargest(10)
+    
+    if top_products.empty:
         print("No product sales data to plot.")
+    elif charts is not None:
+        charts['top_products'] = top_products
+    else:
+        show_chart('top_products', top_products)
     
     # StockCode analysis
     if 'StockCode' in df.columns:
@@ -175,6 +238,21 @@ def analyze_products(df):
 if __name__ == "__main__":
     # Configuration
     file_path = 'OnlineRetail.xlsx'
+    rfm_state_path = 'rfm_state.npz' # Per-customer RFM state of the last run, rebuilt when the workbook or duplicate_keys change
+    model_path = 'segmentation_model.joblib' # Saved scaler + KMeans + segment ordering; delete it to refit
+    output_rfm_path = 'customer_segments.csv'
+    # Nightly mode only re-scores customers with new invoices instead of the whole history.
+    # Customers without new invoices keep their segment until the next full run.
+    nightly_scoring = False
+    duplicate_keys = None # e.g. ['InvoiceNo', 'StockCode', 'Quantity'] to drop repeated invoice lines
+    # Headless mode saves the charts to plots_dir (rendered in parallel, non-interactive backend)
+    # instead of opening windows; charts whose input data did not change are not redrawn.
+    headless_charts = False
+    plots_dir = PLOTS_DIR
+    # Parallel mode computes the sales, product and RFM aggregates in a process pool
+    # (partitioned by month) instead of single-threaded groupbys over the whole frame
+    parallel_aggregation = False
+    parallel_workers = None # None = one worker per CPU
     
     # Check file exists
     if not os.path.exists(file_path):
@@ -185,22 +263,34 @@ if __name__ == "__main__":
     start_time = datetime.now()
     print(f"\nAnalysis started at: {start_time}")
     
-    retail_data = load_and_clean_data(file_path)
+    retail_data = load_and_clean_data(file_path, duplicate_keys)
     
     if retail_data is not None and not retail_data.empty:
-        # Perform RFM analysis and capture the returned rfm DataFrame
-        rfm_segments_df = perform_rfm_analysis(retail_data)
-        analyze_sales(retail_data) # Call sales analysis after RFM as it uses retail_data
-        analyze_products(retail_data) # Call product analysis
-
-        # --- Export RFM Segments to CSV ---
-        # Make sure rfm_segments_df DataFrame exists and has 'CustomerID' and 'Segment'
-        if rfm_segments_df is not None and 'CustomerID' in rfm_segments_df.columns and 'Segment' in rfm_segments_df.columns:
-            output_rfm_path = 'customer_segments.csv'
-            rfm_segments_df[['CustomerID', 'Segment']].to_csv(output_rfm_path, index=False)
-            print(f"\nExported customer segments to '{output_rfm_path}'")
+        charts = {} if headless_charts else None
+        aggregates = parallel_aggregates(retail_data, parallel_workers) if parallel_aggregation else None
+        # The parallel order table (one row per customer and invoice) builds the state like the invoice lines would
+        rfm_state, changed_ids, removed_ids = update_rfm_state(aggregates['orders'] if aggregates else retail_data,
+                                                               rfm_state_path, rfm_source(file_path, duplicate_keys))
+
+        if nightly_scoring and os.path.exists(model_path) and os.path.exists(output_rfm_path):
+            score_changed_customers(rfm_state, changed_ids, removed_ids, model_path, output_rfm_path)
         else:
-            print("\nRFM DataFrame or required columns not found for export.")
+            # Perform RFM analysis and capture the returned rfm DataFrame
+            rfm_segments_df = perform_rfm_analysis(retail_data, rfm_state, model_path, charts)
+
+            # --- Export RFM Segments to CSV ---
+            # Make sure rfm_segments_df DataFrame exists and has 'CustomerID' and 'Segment'
+            if rfm_segments_df is not None and 'CustomerID' in rfm_segments_df.columns and 'Segment' in rfm_segments_df.columns:
+                rfm_segments_df[['CustomerID', 'Segment']].to_csv(output_rfm_path, index=False)
+                print(f"\nExported customer segments to '{output_rfm_path}'")
+            else:
+                print("\nRFM DataFrame or required columns not found for export.")
+
+        analyze_sales(retail_data, charts, aggregates) # Call sales analysis after RFM as it uses retail_data
+        analyze_products(retail_data, charts, aggregates) # Call product analysis
+
+        if charts:
+            render_charts(charts, plots_dir)
 
     else:
         print("Data is empty or not loaded correctly. Cannot proceed with analysis.")
@@ -208,4 +298,5 @@ if __name__ == "__main__":
     end_time = datetime.now()
     print(f"\nAnalysis completed at: {end_time}")
     print(f"Total runtime: {end_time - start_time}")
+    print_summary() # Time, CPU, memory and rows of each stage
 
@@ -0,0 +1,191 @@
+import pandas as pd
+import numpy as np
+import matplotlib.pyplot as plt
+import seaborn as sns
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# =============================================
+# RETAIL ANALYSIS CHARTS
+# =============================================
+# The three retail_analysis charts, drawn from their (small) input aggregates:
+#   daily_trend      - daily sales with the 30-day moving average
+#   segment_scatter  - customers by Frequency vs Monetary, coloured by segment
+#   top_products     - top 10 products by revenue
+#
+# The same drawing code serves the interactive run (plt.show) and the headless run,
+# where render_charts() saves every chart to python/plots in a process pool with the
+# non-interactive Agg backend. Large inputs are reduced before drawing so render time
+# stays bounded: long series are min/max decimated, and large scatters become a
+# hexbin density plot with the segment centres on top. A manifest of input hashes
+# next to the images lets unchanged charts be skipped.
+
+PLOTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'plots')
+MANIFEST_FILE = '.chart_manifest.json'
+CHART_VERSION = 1         # Bump when the drawing code changes, so every chart is redrawn
+MAX_SERIES_POINTS = 4000  # Longer series are decimated to about this many points
+MAX_SCATTER_POINTS = 20_000 # Larger scatters are drawn as a hexbin
+
+# Chart name -> image file in PLOTS_DIR
+CHART_FILES = {
+    'daily_trend': 'daily_sales_trend.png',
+    'segment_scatter': 'customer_segments_scatterplot.png',
+    'top_products': 'top_products_revenue_plot.png',
+}
+
+plt.style.use('ggplot') # Same look as retail_analysis, also in spawned worker processes
+
+
+def decimate_series(series, max_points=MAX_SERIES_POINTS):
+    """
+    Reduces a long series to about max_points points, keeping the minimum and maximum
+    of every bucket so spikes and dips stay visible.
+
+    Args:
+        series (pandas.Series): The series to reduce.
+        max_points (int): Approximate number of points to keep.
+
+    Returns:
+        pandas.Series: The series itself if it is short enough, else the decimated series.
+    """
+    if len(series) <= max_points:
+        return series
+    buckets = np.arange(len(series)) * (max_points // 2) // len(series)
+    values = series.to_numpy()
+    keep = set()
+    for bucket_rows in np.split(np.arange(len(series)), np.flatnonzero(np.diff(buckets)) + 1):
+        bucket_values = values[bucket_rows]
+        if np.isnan(bucket_values).all():
+            continue
+        keep.add(bucket_rows[np.nanargmin(bucket_values)])
+        keep.add(bucket_rows[np.nanargmax(bucket_values)])
+    return series.iloc[sorted(keep)]
+
+
+def plot_daily_trend(daily_sales):
+    """Draws daily sales with the 30-day moving average (computed on the full series)."""
+    moving_average = daily_sales.rolling(window=30).mean()
+    fig = plt.figure(figsize=(15, 7))
+    decimate_series(daily_sales).plot(title='Daily Sales Trend', label='Daily Sales', alpha=0.8)
+    decimate_series(moving_average).plot(label='30-Day Moving Avg', color='red', linewidth=2)
+    plt.legend()
+    plt.ylabel('Total Sales')
+    plt.xlabel('Date')
+    plt.grid(True)
+    plt.tight_layout()
+    return fig
+
+
+def plot_segment_scatter(rfm, max_points=MAX_SCATTER_POINTS):
+    """Draws customers by Frequency vs Monetary; large inputs become a hexbin with segment centres."""
+    fig = plt.figure(figsize=(12, 8))
+    if len(rfm) <= max_points:
+        sns.scatterplot(data=rfm, x='Frequency', y='Monetary', hue='Segment', palette='viridis', s=80, alpha=0.7)
+    else:
+        # One hexagon per area instead of one marker per customer; log colour scale for the dense corner
+        plt.hexbin(rfm['Frequency'], rfm['Monetary'], gridsize=80, bins='log', cmap='Greys', mincnt=1)
+        plt.colorbar(label='Customers (log scale)')
+        centres = rfm.groupby('Segment')[['Frequency', 'Monetary']].median().reset_index()
+        sns.scatterplot(data=centres, x='Frequency', y='Monetary', hue='Segment', palette='viridis',
+                        s=250, marker='X', edgecolor='black')
+    plt.title('Customer Segments by Frequency vs Monetary Value')
+    plt.xlabel('Frequency (Number of Orders)')
+    plt.ylabel('Monetary Value (Total Spent)')
+    plt.grid(True)
+    plt.tight_layout()
+    return fig
+
+
+def plot_top_products(top_products):
+    """Draws the top products by revenue as horizontal bars."""
+    fig = plt.figure(figsize=(12, 6))
+    top_products.sort_values().plot(kind='barh', color='skyblue')
+    plt.title('Top 10 Products by Revenue')
+    plt.xlabel('Total Revenue')
+    plt.ylabel('Product Description')
+    plt.tight_layout()
+    return fig
+
+
+CHART_FUNCTIONS = {
+    'daily_trend': plot_daily_trend,
+    'segment_scatter': plot_segment_scatter,
+    'top_products': plot_top_products,
+}
+
+
+def show_chart(name, data):
+    """Draws a chart and shows it in a window (the interactive mode)."""
+    CHART_FUNCTIONS[name](data)
+    plt.show()
+
+
+def chart_input_hash(name, data):
+    """Hash of a chart's input data (values, index and column names) and the drawing code version."""
+    digest = hashlib.sha256(f'{name}:{CHART_VERSION}'.encode())
+    digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    columns = data.columns if isinstance(data, pd.DataFrame) else [data.name]
+    digest.update(repr(list(columns)).encode())
+    return digest.hexdigest()
+
+
+def _render_job(name, data, path):
+    # Runs in a worker process: draw with the non-interactive backend and save
+    plt.switch_backend('Agg')
+    fig = CHART_FUNCTIONS[name](data)
+    fig.savefig(path, dpi=100)
+    plt.close(fig)
+    return path
+
+
+def render_charts(charts, plots_dir=PLOTS_DIR, max_workers=None, force=False):
+    """
+    Saves charts to image files in parallel, skipping charts whose input has not changed.
+
+    Args:
+        charts (dict): Chart name (a key of CHART_FILES) -> its input data.
+        plots_dir (str): Directory for the images and the manifest.
+        max_workers (int): Worker processes. Defaults to one per chart.
+        force (bool): Redraw every chart, even if its input has not changed.
+
+    Returns:
+        dict: Chart name -> 'rendered', 'unchanged' or the error message.
+    """
+    os.makedirs(plots_dir, exist_ok=True)
+    manifest_path = os.path.join(plots_dir, MANIFEST_FILE)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    status = {}
+    pending = {}
+    for name, data in charts.items():
+        path = os.path.join(plots_dir, CHART_FILES[name])
+        input_hash = chart_input_hash(name, data)
+        if not force and manifest.get(name) == input_hash and os.path.exists(path):
+            status[name] = 'unchanged'
+            print(f"Skipped chart '{name}' (input unchanged): {path}")
+            continue
+        pending[name] = (data, path, input_hash)
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=max_workers or len(pending)) as executor:
+            futures = {executor.submit(_render_job, name, data, path): name for name, (data, path, _) in pending.items()}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    path = future.result()
+                    manifest[name] = pending[name][2]
+                    status[name] = 'rendered'
+                    print(f"Rendered chart '{name}': {path}")
+                except Exception as e:
+                    status[name] = str(e)
+                    print(f"An error occurred while rendering '{name}': {e}")
+
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return status
@@ -0,0 +1,181 @@
+import pandas as pd
+import hashlib
+import json
+import os
+import time
+
+# =============================================
+# SHARED WORKBOOK LOADER WITH A PARSED-DATA CACHE
+# =============================================
+# Parsing OnlineRetail.xlsx with openpyxl is by far the slowest step of every
+# retail script. This module parses a workbook once and stores the result in a
+# typed columnar cache file (Parquet when pyarrow is installed, a pandas pickle
+# otherwise). Later runs load the cache directly as long as the workbook has
+# not changed.
+#
+# The cache is keyed by the workbook's absolute path, size, modification time
+# and content hash, plus the read_excel options used. Editing or replacing the
+# workbook changes the key, so the next run re-parses it automatically.
+
+CACHE_DIR_NAME = '.cache'
+HASH_BLOCK_SIZE = 1024 * 1024  # Read the workbook in 1 MB blocks when hashing
+
+try:
+    import pyarrow  # noqa: F401 - only needed to decide the cache format
+    CACHE_FORMAT = 'parquet'
+except ImportError:
+    CACHE_FORMAT = 'pickle'
+
+
+def file_content_hash(file_path):
+    """
+    Computes the SHA-256 hash of a file's contents, reading it in blocks.
+
+    Args:
+        file_path (str): The path to the file.
+
+    Returns:
+        str: The hexadecimal SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def workbook_cache_key(file_path, read_kwargs=None):
+    """
+    Builds the cache key for a workbook from its path, size, mtime and content hash.
+
+    Args:
+        file_path (str): The path to the Excel workbook.
+        read_kwargs (dict): Extra options passed to pd.read_excel. They are part of
+                            the key because they change the parsed result.
+
+    Returns:
+        dict: The key fields, plus a short 'id' used to name the cache file.
+    """
+    stat = os.stat(file_path)
+    key = {
+        'path': os.path.abspath(file_path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': file_content_hash(file_path),
+        'read_kwargs': {k: repr(v) for k, v in sorted((read_kwargs or {}).items())},
+    }
+    key['id'] = hashlib.sha256(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+    return key
+
+
+def normalize_mixed_columns(df):
+    """
+    Converts object columns holding a mix of numbers and strings to strings.
+
+    openpyxl returns columns like InvoiceNo and StockCode as a mix of int and str
+    (e.g. 536365 and 'C536379'), which a columnar file cannot store. Every non-missing
+    value is converted with str(), the same conversion the cleaning scripts apply
+    themselves, and missing values are kept as NaN. This runs on fresh parses too,
+    so a cold run and a cached run return identical frames. dataMod.py's streaming
+    Arrow conversion gives mixed columns the same text values.
+
+    Args:
+        df (pandas.DataFrame): A parsed sheet; its columns are converted in place.
+
+    Returns:
+        pandas.DataFrame: The same frame.
+    """
+    for col in df.columns:
+        if df[col].dtype == 'object':
+            inferred = pd.api.types.infer_dtype(df[col], skipna=True)
+            if inferred in ('mixed', 'mixed-integer'):
+                not_null = df[col].notna()
+                df.loc[not_null, col] = df.loc[not_null, col].astype(str)
+    return df
+
+
+def _cache_paths(file_path, key, cache_dir):
+    base_name = os.path.splitext(os.path.basename(file_path))[0]
+    extension = '.parquet' if CACHE_FORMAT == 'parquet' else '.pkl'
+    data_path = os.path.join(cache_dir, f"{base_name}.{key['id']}{extension}")
+    meta_path = os.path.join(cache_dir, f"{base_name}.{key['id']}.json")
+    return data_path, meta_path
+
+
+def _remove_stale_entries(file_path, key, cache_dir):
+    # Only one cache entry per workbook is kept; older ones belong to earlier versions of the file
+    for name in os.listdir(cache_dir):
+        if not name.endswith('.json') or key['id'] in name:
+            continue
+        meta_path = os.path.join(cache_dir, name)
+        try:
+            with open(meta_path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            continue
+        # Entries for other workbooks, or for the same workbook read with other options, are kept
+        if entry.get('path') != key['path'] or entry.get('read_kwargs') != key['read_kwargs']:
+            continue
+        for stale in (meta_path[:-len('.json')] + '.parquet', meta_path[:-len('.json')] + '.pkl', meta_path):
+            if os.path.exists(stale):
+                os.remove(stale)
+
+
+def load_workbook(file_path, cache_dir=None, use_cache=True, **read_kwargs):
+    """
+    Loads an Excel workbook into a DataFrame, using the parsed-data cache when possible.
+
+    Args:
+        file_path (str): The path to the Excel workbook (e.g. 'OnlineRetail.xlsx').
+        cache_dir (str): Where cache files are stored. Defaults to a '.cache'
+                         folder next to the workbook.
+        use_cache (bool): Set to False to always parse the workbook and skip the cache.
+        **read_kwargs: Extra options passed to pd.read_excel (e.g. header=0).
+
+    Returns:
+        pandas.DataFrame: The workbook contents.
+
+    Raises:
+        FileNotFoundError: If the workbook does not exist.
+    """
+    if not use_cache:
+        return normalize_mixed_columns(pd.read_excel(file_path, **read_kwargs))
+
+    start = time.perf_counter()
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(file_path)), CACHE_DIR_NAME)
+    key = workbook_cache_key(file_path, read_kwargs)
+    data_path, meta_path = _cache_paths(file_path, key, cache_dir)
+
+    if os.path.exists(data_path) and os.path.exists(meta_path):
+        try:
+            if CACHE_FORMAT == 'parquet':
+                df = pd.read_parquet(data_path)
+            else:
+                df = pd.read_pickle(data_path)
+            print(f"Loaded '{file_path}' from cache in {time.perf_counter() - start:.2f}s")
+            return df
+        except Exception as e:
+            # A corrupt or unreadable cache file is not fatal - fall back to parsing
+            print(f"Warning: could not read cache file '{data_path}' ({e}). Re-parsing workbook.")
+
+    df = normalize_mixed_columns(pd.read_excel(file_path, **read_kwargs))
+    parse_seconds = time.perf_counter() - start
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        _remove_stale_entries(file_path, key, cache_dir)
+        # Write to a temporary name first so an interrupted run never leaves a half-written cache
+        tmp_path = data_path + '.tmp'
+        if CACHE_FORMAT == 'parquet':
+            df.to_parquet(tmp_path, index=False)
+        else:
+            df.to_pickle(tmp_path)
+        os.replace(tmp_path, data_path)
+        with open(meta_path, 'w') as f:
+            json.dump(key, f, indent=2)
+        print(f"Parsed '{file_path}' in {parse_seconds:.2f}s and cached it to '{data_path}'")
+    except Exception as e:
+        print(f"Warning: could not write cache file for '{file_path}' ({e}). Continuing without cache.")
+
+    return df
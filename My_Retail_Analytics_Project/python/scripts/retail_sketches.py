@@ -0,0 +1,189 @@
+import pandas as pd
+import numpy as np
+import os
+import pickle
+from pipeline_utils import GroupedHyperLogLog, HyperLogLog, SpaceSaving, TDigest, print_summary, track
+from retail_loader import load_workbook
+
+# =============================================
+# APPROXIMATE STREAMING MODE (SKETCHES)
+# =============================================
+# The exact analyses keep state that grows with the data: RFM Frequency is a nunique of
+# InvoiceNo per customer, the top products need a groupby over every Description, and the
+# star-schema AOV needs COUNT(DISTINCT InvoiceNo). This mode reads the data chunk by chunk
+# and keeps fixed-size sketches instead (see pipeline_utils/sketches.py):
+#   invoices           HyperLogLog of InvoiceNo                  -> distinct orders, AOV
+#   customer_invoices  HyperLogLog of InvoiceNo per CustomerID   -> RFM Frequency
+#   products           Space-Saving of Description by TotalPrice -> top products
+#   line_spend         t-digest of TotalPrice per invoice line   -> spend quantiles
+#
+# Every estimate is reported with its error bound. Sketches of different files, partitions
+# or days merge into the sketch of all of them, so a daily run can save its sketches and a
+# weekly report can merge them.
+
+SPEND_QUANTILES = [0.5, 0.9, 0.99]
+
+
+def clean_chunk(chunk):
+    """The row filters of load_and_clean_data, applied to one chunk of raw rows."""
+    chunk = chunk[chunk['CustomerID'].notna() & (chunk['Quantity'] > 0) & (chunk['UnitPrice'] > 0)].copy()
+    chunk['CustomerID'] = chunk['CustomerID'].astype(np.int64)
+    chunk['InvoiceNo'] = chunk['InvoiceNo'].astype(str)
+    chunk['TotalPrice'] = chunk['Quantity'] * chunk['UnitPrice']
+    return chunk
+
+
+class RetailSketches:
+    """
+    Bounded-memory sketches of the retail analyses.
+
+    Args:
+        p (int): HyperLogLog precision for the distinct invoice count.
+        customer_p (int): HyperLogLog precision per customer (memory is 2**customer_p bytes per customer).
+        top_k (int): Space-Saving counters for the products.
+        compression (float): t-digest compression for the spend quantiles.
+    """
+
+    def __init__(self, p=14, customer_p=8, top_k=200, compression=200):
+        self.invoices = HyperLogLog(p)
+        self.customer_invoices = GroupedHyperLogLog(customer_p)
+        self.products = SpaceSaving(top_k)
+        self.line_spend = TDigest(compression)
+        self.revenue = 0.0
+        self.rows = 0
+
+    def update(self, chunk):
+        """
+        Folds a chunk of cleaned rows (see clean_chunk) into the sketches.
+
+        Returns:
+            RetailSketches: self, so calls can be chained.
+        """
+        self.invoices.update(chunk['InvoiceNo'])
+        self.customer_invoices.update(chunk['CustomerID'], chunk['InvoiceNo'])
+        self.products.update(chunk['Description'].fillna(''), chunk['TotalPrice'])
+        self.line_spend.update(chunk['TotalPrice'])
+        self.revenue += float(chunk['TotalPrice'].sum())
+        self.rows += len(chunk)
+        return self
+
+    def merge(self, other):
+        """Folds in the sketches of other data (another file, partition or day)."""
+        self.invoices.merge(other.invoices)
+        self.customer_invoices.merge(other.customer_invoices)
+        self.products.merge(other.products)
+        self.line_spend.merge(other.line_spend)
+        self.revenue += other.revenue
+        self.rows += other.rows
+        return self
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            pickle.dump(self, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the sketches."""
+        return (self.invoices.registers.nbytes + self.customer_invoices.registers.nbytes
+                + self.products.counters.memory_usage(deep=True).sum()
+                + self.line_spend.means.nbytes + self.line_spend.weights.nbytes)
+
+    def report(self, n_top=10, quantiles=SPEND_QUANTILES):
+        """
+        The approximate analysis results with their error bounds.
+
+        Returns:
+            dict: distinct_invoices, aov (each with a 95% range), customer_frequency
+                  (estimated orders per customer), top_products and spend_quantiles tables.
+        """
+        invoices = self.invoices.estimate()
+        margin = 2 * self.invoices.relative_error # ~95% of HyperLogLog estimates fall within 2 standard errors
+        low, high = invoices * (1 - margin), invoices * (1 + margin)
+        quantile_table = pd.DataFrame({
+            'quantile': quantiles,
+            'line_spend': self.line_spend.quantile(quantiles),
+            'rank_error': self.line_spend.rank_error(quantiles),
+        })
+        return {
+            'distinct_invoices': {'estimate': invoices, 'low': low, 'high': high},
+            'aov': {'estimate': self.revenue / invoices, 'low': self.revenue / high, 'high': self.revenue / low},
+            'customer_frequency': self.customer_invoices.estimates().round().astype(np.int64).rename('Frequency'),
+            'customer_frequency_error': self.customer_invoices.relative_error,
+            'top_products': self.products.top(n_top),
+            'spend_quantiles': quantile_table,
+        }
+
+
+@track()
+def build_sketches(chunks, sketches=None):
+    """
+    Runs the streaming mode over an iterable of raw row chunks.
+
+    Args:
+        chunks (iterable): pandas.DataFrame chunks of raw retail rows.
+        sketches (RetailSketches): Existing sketches to add to. A new set is created when None.
+
+    Returns:
+        RetailSketches: The updated sketches.
+    """
+    sketches = sketches or RetailSketches()
+    for chunk in chunks:
+        sketches.update(clean_chunk(chunk))
+    return sketches
+
+
+def read_chunks(file_path, chunk_size):
+    """Yields chunks of a CSV (read incrementally) or of a workbook (parsed once through the cache)."""
+    if file_path.lower().endswith('.csv'):
+        yield from pd.read_csv(file_path, chunksize=chunk_size, dtype={'InvoiceNo': str, 'StockCode': str})
+    else:
+        df = load_workbook(file_path)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+
+
+def print_report(report, sketches):
+    print(f"\n{'='*50}\nApproximate Retail Analysis ({sketches.rows:,} rows, {sketches.nbytes / 1024:,.0f} KB of sketches)\n{'='*50}")
+    distinct = report['distinct_invoices']
+    print(f"Distinct invoices: ~{distinct['estimate']:,.0f} (95% range {distinct['low']:,.0f} - {distinct['high']:,.0f})")
+    aov = report['aov']
+    print(f"Average order value: ~{aov['estimate']:,.2f} (95% range {aov['low']:,.2f} - {aov['high']:,.2f})")
+    frequency = report['customer_frequency']
+    print(f"\nRFM Frequency for {len(frequency):,} customers (standard error ~{report['customer_frequency_error']:.1%}; small counts are near exact):")
+    print(frequency.describe())
+    print("\nTop Products by Revenue (true revenue lies between lower_bound and estimate):")
+    print(report['top_products'])
+    print("\nInvoice line spend quantiles:")
+    print(report['spend_quantiles'])
+
+
+# =============================================
+# MAIN EXECUTION
+# =============================================
+if __name__ == "__main__":
+    # Configuration
+    file_path = 'OnlineRetail.xlsx'
+    chunk_size = 100_000
+    sketch_path = 'retail_sketches.pkl' # This run's sketches, for merging with other runs later
+    merge_paths = [] # Sketches saved by earlier runs (e.g. previous days) to merge into the report
+
+    if not os.path.exists(file_path):
+        print(f"Error: File not found at {file_path}")
+        exit()
+
+    try:
+        sketches = build_sketches(read_chunks(file_path, chunk_size))
+        sketches.save(sketch_path)
+        print(f"Saved this run's sketches to '{sketch_path}'")
+        for path in merge_paths:
+            sketches.merge(RetailSketches.load(path))
+            print(f"Merged sketches from '{path}'")
+        print_report(sketches.report(), sketches)
+    except Exception as e:
+        print(f"An error occurred: {e}")
+    print_summary()
@@ -0,0 +1,220 @@
+import pandas as pd
+import numpy as np
+import os
+
+# =============================================
+# INCREMENTAL RFM STATE STORE
+# =============================================
+# Keeps the per-customer inputs of the RFM analysis - last purchase date, number
+# of distinct orders and total spend - in compact NumPy arrays, one slot per
+# CustomerID. A new batch of invoices only touches the customers in that batch,
+# so updating the state costs O(batch) instead of re-grouping the full history.
+#
+# Every row of a batch adds to the customer's spend and last purchase date, so each
+# invoice line must be fed exactly once: the state cannot tell a repeated line from a
+# new one. An invoice is counted once in Frequency however many batches its lines
+# arrive in.
+#
+# A saved state records the input it was built from (source), so a caller can tell
+# whether it still matches the data and rebuild it when it does not.
+
+NS_PER_DAY = 86_400 * 10**9
+
+
+class RFMState:
+    """
+    Per-customer RFM accumulators backed by NumPy arrays.
+
+    Attributes:
+        customer_ids (numpy.ndarray): CustomerID stored in each slot.
+        last_purchase (numpy.ndarray): Latest InvoiceDate per slot, as int64 nanoseconds.
+        order_count (numpy.ndarray): Number of distinct invoices per slot.
+        monetary (numpy.ndarray): Sum of TotalPrice per slot.
+        source (str): What the state was built from (e.g. a hash of the input file), or None.
+    """
+
+    def __init__(self, capacity=1024, source=None):
+        self.source = source
+        self._size = 0
+        self.customer_ids = np.zeros(capacity, dtype=np.int64)
+        self.last_purchase = np.full(capacity, np.iinfo(np.int64).min, dtype=np.int64)
+        self.order_count = np.zeros(capacity, dtype=np.int32)
+        self.monetary = np.zeros(capacity, dtype=np.float64)
+        self._slots = {}          # CustomerID -> slot in the arrays
+        self._seen_orders = set() # (CustomerID, InvoiceNo) pairs already counted in Frequency
+
+    def __len__(self):
+        return self._size
+
+    def _grow(self, needed):
+        # Double the arrays when they run out of room, so appends stay amortized O(1)
+        capacity = len(self.customer_ids)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        extra = new_capacity - capacity
+        self.customer_ids = np.concatenate([self.customer_ids, np.zeros(extra, dtype=np.int64)])
+        self.last_purchase = np.concatenate([self.last_purchase, np.full(extra, np.iinfo(np.int64).min, dtype=np.int64)])
+        self.order_count = np.concatenate([self.order_count, np.zeros(extra, dtype=np.int32)])
+        self.monetary = np.concatenate([self.monetary, np.zeros(extra, dtype=np.float64)])
+
+    def _slots_for(self, customer_ids):
+        """Returns the slot of each CustomerID, adding slots for customers not seen before."""
+        slots = np.empty(len(customer_ids), dtype=np.int64)
+        new_ids = []
+        for i, customer_id in enumerate(customer_ids.tolist()):
+            slot = self._slots.get(customer_id)
+            if slot is None:
+                slot = self._size + len(new_ids)
+                self._slots[customer_id] = slot
+                new_ids.append(customer_id)
+            slots[i] = slot
+        if new_ids:
+            self._grow(self._size + len(new_ids))
+            self.customer_ids[self._size:self._size + len(new_ids)] = new_ids
+            self._size += len(new_ids)
+        return slots
+
+    def update(self, batch):
+        """
+        Folds a batch of cleaned invoice lines into the state.
+
+        Every row is added to Monetary and Recency; Frequency only grows for the
+        (CustomerID, InvoiceNo) pairs not seen in an earlier batch.
+
+        Args:
+            batch (pandas.DataFrame): Cleaned rows with 'CustomerID', 'InvoiceNo',
+                                      'InvoiceDate' and 'TotalPrice' columns, none of
+                                      them fed to the state before.
+
+        Returns:
+            numpy.ndarray: The CustomerIDs whose state changed in this batch.
+        """
+        if batch.empty:
+            return np.empty(0, dtype=np.int64)
+
+        customers = batch['CustomerID'].to_numpy(dtype=np.int64)
+        invoices = batch['InvoiceNo'].astype(str).to_numpy()
+
+        # Work out which (customer, invoice) pairs are new - only those add to Frequency
+        _, order_keys = pd.factorize(pd.MultiIndex.from_arrays([customers, invoices]))
+        new_order = np.fromiter((key not in self._seen_orders for key in order_keys), dtype=bool, count=len(order_keys))
+        self._seen_orders.update(key for key, new in zip(order_keys, new_order) if new)
+
+        dates = batch['InvoiceDate'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        totals = batch['TotalPrice'].to_numpy(dtype=np.float64)
+
+        # Map each distinct customer in the batch to its slot, then scatter the updates
+        customer_codes, batch_customers = pd.factorize(customers)
+        slots = self._slots_for(np.asarray(batch_customers))
+        row_slots = slots[customer_codes]
+        np.maximum.at(self.last_purchase, row_slots, dates)
+        np.add.at(self.monetary, row_slots, totals)
+
+        new_order_customers = np.array([key[0] for key in order_keys[new_order]], dtype=np.int64)
+        order_slots = slots[pd.Index(batch_customers).get_indexer(new_order_customers)]
+        np.add.at(self.order_count, order_slots, 1)
+
+        return np.asarray(batch_customers, dtype=np.int64)
+
+    def to_frame(self, snapshot_date=None, customer_ids=None):
+        """
+        Builds the RFM frame (CustomerID, Recency, Frequency, Monetary) from the state.
+
+        Args:
+            snapshot_date (pandas.Timestamp): Date Recency is measured from. Defaults to
+                                              one day after the latest purchase in the state.
+            customer_ids (array-like): Only build rows for these customers (e.g. the ones
+                                       returned by update()). Defaults to all customers.
+
+        Returns:
+            pandas.DataFrame: One row per customer, sorted by CustomerID.
+        """
+        n = self._size
+        last = self.last_purchase[:n]
+        if snapshot_date is None:
+            snapshot_ns = (last.max() if n else 0) + NS_PER_DAY
+        else:
+            snapshot_ns = pd.Timestamp(snapshot_date).as_unit('ns').value
+
+        if customer_ids is None:
+            slots = np.arange(n)
+        else:
+            slots = np.array([self._slots[customer_id] for customer_id in np.asarray(customer_ids).tolist()
+                              if customer_id in self._slots], dtype=np.int64)
+
+        # Days since last purchase, for every customer at once
+        recency = (snapshot_ns - last[slots]) // NS_PER_DAY
+
+        rfm = pd.DataFrame({
+            'CustomerID': self.customer_ids[slots],
+            'Recency': recency,
+            'Frequency': self.order_count[slots].astype(np.int64),
+            'Monetary': self.monetary[slots],
+        })
+        return rfm.sort_values('CustomerID', ignore_index=True)
+
+    def changes_since(self, previous):
+        """
+        Compares the state with an earlier one, e.g. before it was rebuilt from new input.
+
+        Args:
+            previous (RFMState): The earlier state.
+
+        Returns:
+            tuple: (CustomerIDs that are new or whose last purchase, order count or spend
+                    differ, CustomerIDs that are only in previous), as int64 arrays.
+        """
+        columns = ['last_purchase', 'order_count', 'monetary']
+        current = pd.DataFrame({name: getattr(self, name)[:self._size] for name in columns},
+                               index=self.customer_ids[:self._size])
+        before = pd.DataFrame({name: getattr(previous, name)[:len(previous)] for name in columns},
+                              index=previous.customer_ids[:len(previous)]).reindex(current.index)
+        differs = ((current['last_purchase'] != before['last_purchase'])
+                   | (current['order_count'] != before['order_count'])
+                   | ~np.isclose(current['monetary'], before['monetary']))
+        removed = np.setdiff1d(previous.customer_ids[:len(previous)], current.index.to_numpy())
+        return current.index.to_numpy()[differs.to_numpy()].astype(np.int64), removed.astype(np.int64)
+
+    def save(self, path):
+        """Saves the state to a compressed .npz file."""
+        n = self._size
+        seen = list(self._seen_orders)
+        np.savez_compressed(
+            path,
+            customer_ids=self.customer_ids[:n],
+            last_purchase=self.last_purchase[:n],
+            order_count=self.order_count[:n],
+            monetary=self.monetary[:n],
+            seen_customers=np.array([key[0] for key in seen], dtype=np.int64),
+            seen_invoices=np.array([key[1] for key in seen], dtype=str),
+            source=np.array('' if self.source is None else self.source),
+        )
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a state saved with save(), or returns an empty state if the file does not exist.
+
+        Args:
+            path (str): The .npz file.
+
+        Returns:
+            RFMState: The loaded state.
+        """
+        state = cls()
+        if not os.path.exists(path):
+            return state
+        with np.load(path) as data:
+            n = len(data['customer_ids'])
+            state._grow(n)
+            state._size = n
+            state.customer_ids[:n] = data['customer_ids']
+            state.last_purchase[:n] = data['last_purchase']
+            state.order_count[:n] = data['order_count']
+            state.monetary[:n] = data['monetary']
+            state._slots = {customer_id: slot for slot, customer_id in enumerate(data['customer_ids'].tolist())}
+            state._seen_orders = set(zip(data['seen_customers'].tolist(), data['seen_invoices'].tolist()))
+            if 'source' in data.files: # States saved before the source was recorded have none
+                state.source = str(data['source']) or None
+        return state
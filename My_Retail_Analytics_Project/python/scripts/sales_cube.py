@@ -0,0 +1,291 @@
+import pandas as pd
+import numpy as np
+import json
+import os
+from dim_date import parse_invoice_dates, date_keys, month_keys
+
+# =============================================
+# INCREMENTALLY MAINTAINED SALES CUBE
+# =============================================
+# Pre-aggregates fact_sales into small tables so the dashboard queries in
+# OnlineRetailStarSchema.sql read a few kilobytes instead of scanning the fact table:
+#   daily     - revenue per day (rolling 3-month revenue)
+#   monthly   - revenue per dim_date 'Year Month' (monthly trend)
+#   product   - revenue per StockCode (top products)
+#   customer  - revenue, orders and last purchase per CustomerID (CLV, repeat customers, RFM, churn)
+#   country   - revenue per Country
+#   invoices  - one row per InvoiceNo with its customer and revenue
+#
+# The invoices table is what keeps distinct counts exact: an invoice whose lines
+# arrive in two different batches is still one order, because a customer's order
+# count only goes up the first time an InvoiceNo is seen.
+#
+# New fact rows are folded in with update(); update_from_csv() remembers how many
+# rows of fact_sales.csv it has already read and only reads the rows appended since.
+
+CUBE_TABLES = ['daily', 'monthly', 'product', 'customer', 'country', 'invoices']
+META_FILE = 'cube_meta.json'
+
+
+def _empty_tables():
+    return {
+        'daily': pd.DataFrame({'Date': pd.Series(dtype='datetime64[ns]'), 'Revenue': pd.Series(dtype=float)}).set_index('Date'),
+        'monthly': pd.DataFrame({'Year Month Number': pd.Series(dtype=np.int64), 'Year Month': pd.Series(dtype=str),
+                                 'Revenue': pd.Series(dtype=float)}).set_index('Year Month Number'),
+        'product': pd.DataFrame({'StockCode': pd.Series(dtype=np.int64), 'Revenue': pd.Series(dtype=float)}).set_index('StockCode'),
+        'customer': pd.DataFrame({'CustomerID': pd.Series(dtype=np.int64), 'Revenue': pd.Series(dtype=float),
+                                  'Orders': pd.Series(dtype=np.int64),
+                                  'LastPurchase': pd.Series(dtype='datetime64[ns]')}).set_index('CustomerID'),
+        'country': pd.DataFrame({'Country': pd.Series(dtype=str), 'Revenue': pd.Series(dtype=float)}).set_index('Country'),
+        'invoices': pd.DataFrame({'InvoiceNo': pd.Series(dtype=str), 'CustomerID': pd.Series(dtype=np.int64),
+                                  'Revenue': pd.Series(dtype=float)}).set_index('InvoiceNo'),
+    }
+
+
+def prepare_fact_rows(batch):
+    """
+    Normalizes a batch of fact_sales rows before it is folded into the cube.
+
+    InvoiceDate may be an Excel serial number (as in dim_date 'Date') or a date;
+    TotalPrice is derived from Quantity * UnitPrice when it is missing.
+
+    Args:
+        batch (pandas.DataFrame): Rows with InvoiceNo, StockCode, InvoiceDate,
+                                  CustomerID, Country and TotalPrice (or Quantity and UnitPrice).
+
+    Returns:
+        pandas.DataFrame: The batch with typed columns.
+    """
+    batch = batch.copy()
+    batch['InvoiceDate'] = parse_invoice_dates(batch['InvoiceDate'])
+    if 'TotalPrice' not in batch.columns:
+        batch['TotalPrice'] = batch['Quantity'] * batch['UnitPrice']
+    batch['InvoiceNo'] = batch['InvoiceNo'].astype(str)
+    batch['Country'] = batch['Country'].astype(str)
+    batch = batch.dropna(subset=['InvoiceDate', 'CustomerID', 'StockCode'])
+    batch['CustomerID'] = batch['CustomerID'].astype(np.int64)
+    batch['StockCode'] = batch['StockCode'].astype(np.int64)
+    batch['InvoiceDate'] = batch['InvoiceDate'].astype('datetime64[ns]')
+    return batch
+
+
+class SalesCube:
+    """
+    Materialized aggregates of fact_sales that can be updated with new rows.
+
+    Attributes:
+        tables (dict): Table name -> pandas.DataFrame, see CUBE_TABLES.
+        rows_seen (int): Number of fact rows folded into the cube so far.
+    """
+
+    def __init__(self):
+        self.tables = _empty_tables()
+        self.rows_seen = 0
+
+    def update(self, batch):
+        """
+        Folds newly appended fact rows into every aggregate.
+
+        Args:
+            batch (pandas.DataFrame): New fact_sales rows (see prepare_fact_rows).
+
+        Returns:
+            SalesCube: self, so calls can be chained.
+        """
+        self.rows_seen += len(batch)
+        batch = prepare_fact_rows(batch)
+        if batch.empty:
+            return self
+        t = self.tables
+
+        # Additive measures: aggregate the batch, then add it onto the stored totals
+        daily = batch.groupby(batch['InvoiceDate'].dt.normalize().rename('Date'))['TotalPrice'].sum().rename('Revenue')
+        t['daily'] = t['daily']['Revenue'].add(daily, fill_value=0).to_frame().sort_index()
+
+        month_key = pd.Series(month_keys(date_keys(batch['InvoiceDate'])), index=batch.index)
+        monthly = batch.groupby(month_key.rename('Year Month Number')).agg(
+            Revenue=('TotalPrice', 'sum'), first_date=('InvoiceDate', 'min'))
+        monthly['Year Month'] = monthly['first_date'].dt.strftime('%Y %b') # Same label as dim_date 'Year Month'
+        revenue = t['monthly']['Revenue'].add(monthly['Revenue'], fill_value=0)
+        labels = t['monthly']['Year Month'].combine_first(monthly['Year Month'])
+        t['monthly'] = pd.DataFrame({'Year Month': labels, 'Revenue': revenue}).sort_index()
+
+        product = batch.groupby('StockCode')['TotalPrice'].sum().rename('Revenue')
+        t['product'] = t['product']['Revenue'].add(product, fill_value=0).to_frame()
+
+        country = batch.groupby('Country')['TotalPrice'].sum().rename('Revenue')
+        t['country'] = t['country']['Revenue'].add(country, fill_value=0).to_frame()
+
+        # Invoices: only InvoiceNo values not seen before count as new orders
+        invoices = batch.groupby('InvoiceNo').agg(CustomerID=('CustomerID', 'first'), Revenue=('TotalPrice', 'sum'))
+        is_new = ~invoices.index.isin(t['invoices'].index)
+        new_orders = invoices[is_new].groupby('CustomerID').size()
+        stored = t['invoices']
+        invoice_revenue = stored['Revenue'].add(invoices['Revenue'], fill_value=0)
+        t['invoices'] = pd.DataFrame({'CustomerID': stored['CustomerID'].combine_first(invoices['CustomerID']).astype(np.int64),
+                                      'Revenue': invoice_revenue})
+
+        customer = batch.groupby('CustomerID').agg(Revenue=('TotalPrice', 'sum'), LastPurchase=('InvoiceDate', 'max'))
+        stored = t['customer']
+        merged = pd.DataFrame({
+            'Revenue': stored['Revenue'].add(customer['Revenue'], fill_value=0),
+            'Orders': stored['Orders'].add(new_orders, fill_value=0),
+            'LastPurchase': pd.concat([stored['LastPurchase'], customer['LastPurchase']]).groupby(level=0).max(),
+        })
+        merged['Orders'] = merged['Orders'].fillna(0).astype(np.int64)
+        merged.index.name = 'CustomerID'
+        t['customer'] = merged.sort_index()
+        return self
+
+    def update_from_csv(self, fact_path, chunksize=100_000):
+        """
+        Reads only the rows of a fact_sales CSV appended since the last update.
+
+        Args:
+            fact_path (str): The fact_sales CSV file.
+            chunksize (int): Rows read per chunk.
+
+        Returns:
+            int: Number of new rows folded into the cube.
+        """
+        already_read = self.rows_seen
+        reader = pd.read_csv(fact_path, chunksize=chunksize, skiprows=range(1, already_read + 1),
+                             dtype={'InvoiceNo': str, 'Country': str})
+        for chunk in reader:
+            self.update(chunk)
+        return self.rows_seen - already_read
+
+    def save(self, cube_dir):
+        """
+        Publishes every aggregate as a small CSV table in cube_dir ('cube_<name>.csv').
+
+        Args:
+            cube_dir (str): Directory for the tables; created if missing.
+        """
+        os.makedirs(cube_dir, exist_ok=True)
+        for name in CUBE_TABLES:
+            self.tables[name].to_csv(os.path.join(cube_dir, f'cube_{name}.csv'))
+        with open(os.path.join(cube_dir, META_FILE), 'w') as f:
+            json.dump({'rows_seen': self.rows_seen}, f, indent=2)
+
+    @classmethod
+    def load(cls, cube_dir):
+        """
+        Loads a cube published with save(), or returns an empty cube if there is none.
+
+        Args:
+            cube_dir (str): Directory holding the cube tables.
+
+        Returns:
+            SalesCube: The loaded cube.
+        """
+        cube = cls()
+        meta_path = os.path.join(cube_dir, META_FILE)
+        if not os.path.exists(meta_path):
+            return cube
+        with open(meta_path) as f:
+            cube.rows_seen = json.load(f)['rows_seen']
+        empty = _empty_tables()
+        for name in CUBE_TABLES:
+            table = pd.read_csv(os.path.join(cube_dir, f'cube_{name}.csv'), index_col=0,
+                                dtype={'InvoiceNo': str, 'Country': str, 'Year Month': str})
+            # Restore the column and index types of the empty table
+            for col, dtype in empty[name].dtypes.items():
+                table[col] = table[col].astype(dtype)
+            table.index = table.index.astype(empty[name].index.dtype)
+            table.index.name = empty[name].index.name
+            cube.tables[name] = table
+        return cube
+
+    # =============================================
+    # DASHBOARD QUERIES (mirror OnlineRetailStarSchema.sql)
+    # =============================================
+    def total_sales(self):
+        """--Total Sales"""
+        return float(self.tables['country']['Revenue'].sum())
+
+    def top_products(self, dim_product, n=10):
+        """--Top 10 Products by Revenue (grouped by description, as in the SQL)"""
+        descriptions = dim_product.drop_duplicates('StockCode').set_index('StockCode')['Description']
+        product = self.tables['product'].join(descriptions, how='inner')
+        return product.groupby('Description')['Revenue'].sum().nlargest(n).rename('revenue')
+
+    def monthly_revenue_trend(self):
+        """--Monthly Revenue Trend, in calendar order"""
+        return self.tables['monthly'].set_index('Year Month')['Revenue'].rename('monthly_revenue')
+
+    def average_order_value(self):
+        """--Average Order Value: SUM(TotalPrice) / COUNT(DISTINCT invoiceno)"""
+        orders = len(self.tables['invoices'])
+        return self.total_sales() / orders if orders else float('nan')
+
+    def customer_lifetime_value(self, n=10):
+        """--Customer Lifetime Value (top n customers)"""
+        return self.tables['customer']['Revenue'].nlargest(n).rename('customer_lifetime_value')
+
+    def repeat_vs_one_time(self):
+        """--Repeat vs One-time Customers"""
+        customer_type = np.where(self.tables['customer']['Orders'] > 1, 'Repeat Customer', 'One-time Customer')
+        return pd.Series(customer_type).value_counts().rename('count_customers')
+
+    def rolling_3_month_revenue(self, days=90):
+        """
+        --Rolling 3-Month Revenue
+
+        The SQL window runs over individual fact rows; here it is the revenue of the
+        last `days` calendar days (including days without sales) for each sales day.
+        """
+        daily = self.tables['daily']['Revenue']
+        if daily.empty:
+            return daily.rename('rolling_3_month_revenue')
+        calendar = daily.asfreq('D', fill_value=0)
+        rolling = calendar.rolling(days, min_periods=1).sum()
+        return rolling.loc[daily.index].rename('rolling_3_month_revenue')
+
+    def rfm(self):
+        """--RFM Segmentation (recency in days from the latest invoice date)"""
+        customer = self.tables['customer']
+        today = customer['LastPurchase'].max()
+        return pd.DataFrame({'recency': (today.normalize() - customer['LastPurchase'].dt.normalize()).dt.days,
+                             'frequency': customer['Orders'], 'monetary': customer['Revenue']})
+
+    def inactive_customers(self, months=6):
+        """--Inactive Customers (Churn Candidates): no purchase in the last `months` months"""
+        customer = self.tables['customer']
+        cutoff = customer['LastPurchase'].max() - pd.DateOffset(months=months)
+        return customer.index[customer['LastPurchase'] < cutoff]
+
+
+# =============================================
+# MAIN EXECUTION
+# =============================================
+if __name__ == "__main__":
+    # Configuration
+    fact_sales_path = 'fact_sales.csv'
+    dim_product_path = 'dim_product.csv'
+    cube_directory = 'sales_cube' # Published aggregate tables; delete it to rebuild from scratch
+
+    if not os.path.exists(fact_sales_path):
+        print(f"Error: File not found at {fact_sales_path}")
+        exit()
+
+    try:
+        cube = SalesCube.load(cube_directory)
+        new_rows = cube.update_from_csv(fact_sales_path)
+        cube.save(cube_directory)
+        print(f"Folded {new_rows} new fact rows into the cube ({cube.rows_seen} rows in total).")
+
+        print(f"\nTotal sales: {cube.total_sales():,.2f}")
+        print(f"Average order value: {cube.average_order_value():,.2f}")
+        if os.path.exists(dim_product_path):
+            print("\nTop 10 products by revenue:")
+            print(cube.top_products(pd.read_csv(dim_product_path)))
+        print("\nMonthly revenue trend:")
+        print(cube.monthly_revenue_trend())
+        print("\nTop 10 customers by lifetime value:")
+        print(cube.customer_lifetime_value())
+        print("\nRepeat vs one-time customers:")
+        print(cube.repeat_vs_one_time())
+        print(f"\nInactive customers (6+ months): {len(cube.inactive_customers())}")
+    except Exception as e:
+        print(f"Error building the sales cube: {e}")
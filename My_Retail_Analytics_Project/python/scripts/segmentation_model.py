@@ -0,0 +1,185 @@
+import pandas as pd
+import numpy as np
+import joblib
+import os
+import warnings
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.preprocessing import StandardScaler
+
+# =============================================
+# PERSISTED CUSTOMER SEGMENTATION MODEL
+# =============================================
+# Fitting KMeans on every run makes the segment IDs change from run to run, so
+# customer_segments.csv and the Power BI model drift apart. This module fits the
+# model once, saves it together with its scaler and a stable label mapping, and
+# then scores new or changed customers without refitting.
+#
+# Segment IDs are ordered by the average Monetary value of each cluster centre:
+# Segment 0 is the lowest-spending group and the highest ID is the most valuable
+# group (e.g. the "Champions" segment), whatever order KMeans found them in.
+
+RFM_FEATURES = ['Recency', 'Frequency', 'Monetary']
+
+
+class SegmentationModel:
+    """
+    StandardScaler + KMeans segmentation over RFM values with stable segment IDs.
+
+    Attributes:
+        n_clusters (int): Number of segments.
+        scaler (StandardScaler): Scaler fitted on the RFM values.
+        kmeans (KMeans or MiniBatchKMeans): The fitted clustering model.
+        label_map (numpy.ndarray): Maps a raw KMeans label to its ordered segment ID.
+    """
+
+    def __init__(self, n_clusters=4, random_state=42):
+        self.n_clusters = n_clusters
+        self.random_state = random_state
+        self.scaler = None
+        self.kmeans = None
+        self.label_map = None
+
+    def _build_label_map(self):
+        # Order clusters by the Monetary value of their centre, in original units
+        centres = self.scaler.inverse_transform(self.kmeans.cluster_centers_)
+        order = np.argsort(centres[:, RFM_FEATURES.index('Monetary')], kind='stable')
+        self.label_map = np.empty(self.n_clusters, dtype=np.int64)
+        self.label_map[order] = np.arange(self.n_clusters)
+
+    def fit(self, rfm, mini_batch=False, batch_size=4096):
+        """
+        Fits the scaler and the clustering model on an RFM frame.
+
+        Args:
+            rfm (pandas.DataFrame): Frame with 'Recency', 'Frequency' and 'Monetary' columns.
+            mini_batch (bool): Use MiniBatchKMeans, which is much faster on very large
+                               customer bases at a small cost in cluster quality.
+            batch_size (int): Mini-batch size when mini_batch is True.
+
+        Returns:
+            SegmentationModel: self, so calls can be chained.
+        """
+        values = rfm[RFM_FEATURES].to_numpy(dtype=np.float64)
+        self.scaler = StandardScaler().fit(values)
+        scaled = self.scaler.transform(values)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=UserWarning)
+            if mini_batch:
+                self.kmeans = MiniBatchKMeans(n_clusters=self.n_clusters, random_state=self.random_state,
+                                              batch_size=batch_size, n_init='auto')
+            else:
+                self.kmeans = KMeans(n_clusters=self.n_clusters, random_state=self.random_state, n_init='auto')
+            self.kmeans.fit(scaled)
+        self._build_label_map()
+        return self
+
+    def fit_stream(self, make_chunks):
+        """
+        Fits the model on RFM data that does not fit in memory, one chunk at a time.
+
+        The data is read twice: the first pass fits the scaler, the second pass feeds
+        the scaled chunks to MiniBatchKMeans.partial_fit.
+
+        Args:
+            make_chunks (callable): Returns a fresh iterator of RFM frames each time it is called.
+
+        Returns:
+            SegmentationModel: self, so calls can be chained.
+        """
+        self.scaler = StandardScaler()
+        for chunk in make_chunks():
+            self.scaler.partial_fit(chunk[RFM_FEATURES].to_numpy(dtype=np.float64))
+
+        self.kmeans = MiniBatchKMeans(n_clusters=self.n_clusters, random_state=self.random_state, n_init=3)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=UserWarning)
+            for chunk in make_chunks():
+                # partial_fit needs at least n_clusters rows the first time it is called
+                if len(chunk) >= self.n_clusters or hasattr(self.kmeans, 'cluster_centers_'):
+                    self.kmeans.partial_fit(self.scaler.transform(chunk[RFM_FEATURES].to_numpy(dtype=np.float64)))
+        self._build_label_map()
+        return self
+
+    def predict(self, rfm):
+        """
+        Assigns segments to customers without refitting.
+
+        Args:
+            rfm (pandas.DataFrame): Frame with 'Recency', 'Frequency' and 'Monetary' columns.
+
+        Returns:
+            numpy.ndarray: The ordered segment ID of each row.
+        """
+        if self.kmeans is None:
+            raise ValueError("The segmentation model has not been fitted yet.")
+        if rfm.empty:
+            return np.empty(0, dtype=np.int64)
+        scaled = self.scaler.transform(rfm[RFM_FEATURES].to_numpy(dtype=np.float64))
+        return self.label_map[self.kmeans.predict(scaled)]
+
+    def save(self, path):
+        """Saves the fitted scaler, clustering model and label mapping with joblib."""
+        joblib.dump({
+            'n_clusters': self.n_clusters,
+            'random_state': self.random_state,
+            'scaler': self.scaler,
+            'kmeans': self.kmeans,
+            'label_map': self.label_map,
+        }, path)
+
+    @classmethod
+    def load(cls, path):
+        """Loads a model saved with save()."""
+        saved = joblib.load(path)
+        model = cls(n_clusters=saved['n_clusters'], random_state=saved['random_state'])
+        model.scaler = saved['scaler']
+        model.kmeans = saved['kmeans']
+        model.label_map = saved['label_map']
+        return model
+
+
+def load_or_fit_model(model_path, rfm, refit=False, mini_batch=False):
+    """
+    Loads the saved segmentation model, or fits and saves a new one.
+
+    Args:
+        model_path (str): Where the model is stored (e.g. 'segmentation_model.joblib').
+        rfm (pandas.DataFrame): RFM frame used if a new model has to be fitted.
+        refit (bool): Fit a new model even if one is saved. Segment IDs keep their
+                      Monetary ordering, but customers may move between segments.
+        mini_batch (bool): Fit with MiniBatchKMeans instead of KMeans.
+
+    Returns:
+        tuple: (SegmentationModel, True if the model was fitted in this call)
+    """
+    if os.path.exists(model_path) and not refit:
+        print(f"Loaded segmentation model from '{model_path}'")
+        return SegmentationModel.load(model_path), False
+
+    model = SegmentationModel().fit(rfm, mini_batch=mini_batch)
+    model.save(model_path)
+    print(f"Fitted a new segmentation model on {len(rfm)} customers and saved it to '{model_path}'")
+    return model, True
+
+
+def update_segment_file(segments_path, model, rfm_changed, removed_ids=()):
+    """
+    Re-scores only the given customers and merges them into an existing segments CSV.
+
+    Args:
+        segments_path (str): The existing 'customer_segments.csv' (CustomerID, Segment).
+        model (SegmentationModel): The fitted model.
+        rfm_changed (pandas.DataFrame): RFM rows of the new or changed customers.
+        removed_ids (array-like): Customers to drop from the file (no longer in the data).
+
+    Returns:
+        pandas.DataFrame: The merged CustomerID/Segment table that was saved.
+    """
+    segments = pd.read_csv(segments_path).set_index('CustomerID')['Segment']
+    segments = segments.drop(np.asarray(removed_ids, dtype=np.int64), errors='ignore')
+    changed = pd.Series(model.predict(rfm_changed), index=rfm_changed['CustomerID'].to_numpy())
+    # Changed customers get their new segment, new customers are added, the rest keep theirs
+    segments = changed.combine_first(segments).astype(np.int64)
+    segments = segments.rename_axis('CustomerID').rename('Segment').reset_index()
+    segments.to_csv(segments_path, index=False)
+    return segments
@@ -1,63 +1,208 @@
 import pandas as pd
 import re
 import numpy as np # Import numpy for NaN
+import hashlib
+import json
+from retail_loader import load_workbook
+import os
+from pipeline_utils import export_table, print_summary, track, write_table
 
-def clean_stockcodes(input_file, output_file):
+# =============================================
+# STOCKCODE NORMALIZATION RULES
+# =============================================
+# A raw StockCode is normalized in three steps:
+#   1. trailing letters are stripped ('545614G' -> '545614'),
+#   2. exclusion rules drop non-product codes; a rule matches the raw code or the stripped code,
+#   3. what is left is converted to a number; codes that are still not numeric are dropped.
+#
+# The retail data has ~540k rows but only a few thousand distinct codes, so the steps run
+# once per distinct code and the result is applied to the rows with an integer code lookup.
+# The raw -> clean mapping can be saved to CSV; later runs then only normalize codes they
+# have never seen. Mapping rows record the rule set they were computed with and are
+# recomputed when the rules change.
+
+# Rule name -> codes that are not products. Add rules here (or pass your own) to drop new
+# fee or adjustment codes; the drop report shows how many codes and rows each rule removed.
+DEFAULT_EXCLUSION_RULES = {
+    'non_product_codes': ['POST', 'D', 'M', 'CRUK', 'DOT', 'ADJUST',
+                          'S', 'B', 'C', 'PADS', 'A', 'P', 'R', 'K', 'C2',
+                          'AMAZONFEE', 'BANK CHARGES', 'DCGS'],
+}
+NOT_NUMERIC_RULE = 'not_numeric' # Codes (including missing ones) that are not a number after the rules
+MAPPING_COLUMNS = ['RawStockCode', 'StockCode', 'DroppedBy', 'RuleSet']
+
+
+def rule_set_id(exclusion_rules):
+    """Short fingerprint of a rule set, stored with each mapping row."""
+    return hashlib.sha256(json.dumps(exclusion_rules, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def normalize_stockcodes(raw_codes, exclusion_rules=DEFAULT_EXCLUSION_RULES):
+    """
+    Normalizes distinct raw StockCodes.
+
+    Args:
+        raw_codes (array-like): Distinct raw codes, as strings.
+        exclusion_rules (dict): Rule name -> list of non-product codes.
+
+    Returns:
+        pandas.DataFrame: RawStockCode, StockCode (NaN when dropped) and DroppedBy
+                          (the rule that dropped the code, '' when it was kept).
+    """
+    raw = pd.Series(raw_codes, dtype=object).astype(str)
+    stripped = raw.str.replace(r'[A-Za-z]+$', '', regex=True)
+    dropped_by = pd.Series('', index=raw.index, dtype=object)
+    for rule, codes in exclusion_rules.items():
+        dropped_by[(dropped_by == '') & (raw.isin(codes) | stripped.isin(codes))] = rule
+    numeric = pd.to_numeric(stripped.where(dropped_by == ''), errors='coerce').astype(float)
+    dropped_by[(dropped_by == '') & numeric.isna()] = NOT_NUMERIC_RULE
+    return pd.DataFrame({'RawStockCode': raw.to_numpy(), 'StockCode': numeric.to_numpy(), 'DroppedBy': dropped_by.to_numpy()})
+
+
+class StockCodeMapping:
+    """
+    Memoized raw -> clean StockCode mapping.
+
+    Args:
+        exclusion_rules (dict): Rule name -> list of non-product codes (default: DEFAULT_EXCLUSION_RULES).
+        table (pandas.DataFrame): Previously saved mapping rows (see MAPPING_COLUMNS).
+
+    Attributes:
+        new_codes (int): Distinct codes normalized by this object (not found in the saved mapping).
+    """
+
+    def __init__(self, exclusion_rules=None, table=None):
+        self.exclusion_rules = exclusion_rules or DEFAULT_EXCLUSION_RULES
+        self.rule_set = rule_set_id(self.exclusion_rules)
+        if table is None:
+            table = pd.DataFrame(columns=MAPPING_COLUMNS)
+        # Rows computed with a different rule set are dropped and recomputed on demand
+        self.table = table[table['RuleSet'] == self.rule_set].reset_index(drop=True)
+        self.new_codes = 0
+
+    @classmethod
+    def load(cls, path, exclusion_rules=None):
+        """Reads a saved mapping; a missing file gives an empty mapping."""
+        if not os.path.exists(path):
+            return cls(exclusion_rules)
+        # Raw codes such as 'NA' must stay strings; only an empty StockCode means dropped
+        table = pd.read_csv(path, dtype={'RawStockCode': str, 'DroppedBy': str, 'RuleSet': str},
+                            keep_default_na=False, na_values={'StockCode': ['']})
+        return cls(exclusion_rules, table)
+
+    def save(self, path):
+        """Writes the mapping to CSV."""
+        self.table.to_csv(path, index=False)
+
+    def apply(self, stock_codes):
+        """
+        Maps a StockCode column to clean numeric codes.
+
+        Args:
+            stock_codes (pandas.Series): The raw StockCode column (numbers and/or strings).
+
+        Returns:
+            tuple: (numpy array of clean codes, NaN for dropped rows;
+                    DataFrame with the distinct codes and rows each rule dropped, and examples)
+        """
+        codes, distinct = pd.factorize(stock_codes)
+        raw = pd.Series(distinct, dtype=object).astype(str)
+        unseen = pd.unique(raw[~raw.isin(self.table['RawStockCode'])])
+        if len(unseen):
+            new_rows = normalize_stockcodes(unseen, self.exclusion_rules).assign(RuleSet=self.rule_set)
+            self.table = pd.concat([self.table, new_rows], ignore_index=True)
+            self.new_codes += len(unseen)
+        lookup = self.table.set_index('RawStockCode').reindex(raw)
+        clean = lookup['StockCode'].to_numpy(float)
+        dropped_by = lookup['DroppedBy'].to_numpy(object)
+
+        # Missing codes (factorize code -1) are dropped like any other non-numeric code
+        missing = codes < 0
+        row_values = np.where(missing, np.nan, clean[codes])
+        rows_per_code = np.bincount(codes[~missing], minlength=len(distinct))
+        per_code = pd.DataFrame({'RawStockCode': raw.to_numpy(), 'DroppedBy': dropped_by, 'Rows': rows_per_code})
+        if missing.any():
+            per_code.loc[len(per_code)] = ['<missing>', NOT_NUMERIC_RULE, int(missing.sum())]
+        per_code = per_code[per_code['DroppedBy'] != '']
+        report = per_code.groupby('DroppedBy').agg(
+            Codes=('RawStockCode', 'count'), Rows=('Rows', 'sum'),
+            Examples=('RawStockCode', lambda values: ', '.join(values.head(5))))
+        return row_values, report
+
+@track()
+def clean_stockcodes(input_file, output_file, mapping_path=None, exclusion_rules=None, intermediate_file=None):
     """
     Cleans the StockCode column in an Excel file and ensures it's numeric.
     - Keeps all other columns and rows unchanged
     - Fixes alphanumeric codes (e.g., '545614G' → '545614')
-    - Removes specific non-product codes (like 'POST', 'D')
-    - Converts the cleaned StockCode to a numeric type, setting unconvertible values to NaN.
-    - Removes rows where StockCode is NaN after conversion.
+    - Removes non-product codes (like 'POST', 'D') listed in the exclusion rules
+    - Converts the cleaned StockCode to a numeric type and removes rows where that is not possible
     - Saves cleaned version to new file
-    """
-    # Load data
-    df = pd.read_excel(input_file)
-    print(f"Loaded '{input_file}' with {len(df)} rows")
-    initial_rows = len(df) # To track dropped rows later
 
-    # Clean StockCode (ONLY change made to the data)
-    df['StockCode'] = df['StockCode'].astype(str)
+    The cleaned rows are the input of later stages (e.g. verify_duplicates). Pass an
+    intermediate_file ('.arrow') to hand them over through the columnar store, which keeps
+    the dtypes and is read back without parsing; the Excel output is then only needed for
+    the Power BI delivery and can be skipped with output_file=None.
+
+    Each distinct code is normalized once (see StockCodeMapping). With a mapping_path, the
+    mapping is loaded from and saved to that CSV, so later runs only normalize new codes.
 
-    # Step 1: Remove trailing letters from alphanumeric codes (e.g., '545614G' -> '545614')
-    # Use a new temporary column or direct assignment if you're sure about overwriting
-    df['StockCode_temp'] = df['StockCode'].str.replace(r'[A-Za-z]+$', '', regex=True)
+    Args:
+        input_file (str): The original Excel file.
+        output_file (str): The cleaned Excel file to write (None to skip it).
+        mapping_path (str): Optional CSV for the persisted raw -> clean mapping.
+        exclusion_rules (dict): Rule name -> non-product codes (default: DEFAULT_EXCLUSION_RULES).
+        intermediate_file (str): Optional Arrow IPC file for the cleaned rows (see pipeline_utils.columnar_store).
 
-    # Step 2: Remove specific non-product codes (apply to the temp cleaned column)
-    non_product_codes = ['POST', 'D', 'M', 'CRUK', 'DOT', 'ADJUST',
-                         'S', 'B', 'C', 'PADS', 'A', 'P', 'R', 'K', 'C2',
-                         'AMAZONFEE', 'BANK CHARGES', 'DCGS'] # Added more common ones
-    # Filter df based on the cleaned temp column
-    df = df[~df['StockCode_temp'].isin(non_product_codes)].copy() # Use .copy() after filtering for safety
+    Returns:
+        pandas.DataFrame: The cleaned data.
+    """
+    # Load data (through the shared parsed-workbook cache)
+    df = load_workbook(input_file)
+    print(f"Loaded '{input_file}' with {len(df)} rows")
+    initial_rows = len(df) # To track dropped rows later
 
-    # Step 3: Convert the cleaned StockCode column to numeric.
-    # 'errors='coerce'' will turn any value that can't be converted into NaN.
-    df['StockCode_numeric'] = pd.to_numeric(df['StockCode_temp'], errors='coerce')
+    # Clean StockCode (ONLY change made to the data), one lookup per row
+    if mapping_path:
+        mapping = StockCodeMapping.load(mapping_path, exclusion_rules)
+    else:
+        mapping = StockCodeMapping(exclusion_rules)
+    clean_codes, drop_report = mapping.apply(df['StockCode'])
+    print(f"Normalized {mapping.new_codes} new distinct StockCodes ({len(mapping.table)} in the mapping).")
+    if not drop_report.empty:
+        print("\nRows dropped by each StockCode rule:")
+        print(drop_report)
 
-    # Step 4: Remove rows where StockCode could not be converted to a number.
-    # These are truly invalid or non-product codes that slipped through or were malformed.
-    rows_before_final_drop = len(df)
-    df.dropna(subset=['StockCode_numeric'], inplace=True)
-    rows_after_final_drop = len(df)
-    print(f"Dropped {rows_before_final_drop - rows_after_final_drop} rows due to StockCode not being convertible to numeric.")
+    # Keep the rows with a numeric code; the cleaned StockCode replaces the original (as the last column)
+    keep = ~np.isnan(clean_codes)
+    df = df[keep].drop(columns='StockCode')
+    df['StockCode'] = clean_codes[keep]
 
-    # Drop the temporary column and replace original StockCode with the cleaned, numeric one
-    df.drop(columns=['StockCode', 'StockCode_temp'], inplace=True) # Drop original and temp
-    df.rename(columns={'StockCode_numeric': 'StockCode'}, inplace=True) # Rename the numeric one back
+    if mapping_path:
+        mapping.save(mapping_path)
+        print(f"Saved the StockCode mapping to '{mapping_path}'")
 
     # Final check of column types (optional, but good for verification)
     print("\nDataFrame info after StockCode cleaning and type conversion:")
     df.info()
 
-    # Save cleaned data
-    df.to_excel(output_file, index=False)
-    print(f"Saved cleaned data to '{output_file}' ({len(df)} rows) after dropping {initial_rows - len(df)} total rows.")
+    # Save cleaned data: the columnar hand-off for later stages, the workbook for Power BI
+    if intermediate_file:
+        write_table(df, intermediate_file)
+        print(f"Saved cleaned data to '{intermediate_file}' ({len(df)} rows)")
+    if output_file:
+        seconds = export_table(df, output_file)
+        print(f"Saved cleaned data to '{output_file}' ({len(df)} rows) in {seconds:.2f}s")
+    print(f"Dropped {initial_rows - len(df)} total rows.")
     return df
 
 # Example usage
 # IMPORTANT: Use your original input file and specify a new output file name
-clean_stockcodes(
-    input_file='OnlineRetail.xlsx', # Make sure this is the original, unprocessed file
-    output_file='Cleaned_OnlineRetail_ForBI.xlsx' # Save to a NEW file
-)
\ No newline at end of file
+if __name__ == "__main__":
+    clean_stockcodes(
+        input_file='OnlineRetail.xlsx', # Make sure this is the original, unprocessed file
+        output_file='Cleaned_OnlineRetail_ForBI.xlsx', # Save to a NEW file (Power BI deliverable; None to skip)
+        intermediate_file='Cleaned_OnlineRetail_ForBI.arrow', # Typed hand-off read by verify_duplicates
+        mapping_path='stockcode_mapping.csv' # Raw -> clean codes kept between runs; delete it to rebuild
+    )
+    print_summary()
\ No newline at end of file
@@ -0,0 +1,54 @@
+import datetime
+
+import pandas as pd
+import pandas.testing as tm
+from openpyxl import Workbook
+
+import dataMod
+from pipeline_utils import read_table, write_table
+from retail_loader import normalize_mixed_columns
+
+
+def test_arrow_conversion_matches_read_excel_when_types_change_in_a_later_batch(tmp_path, monkeypatch):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(['InvoiceNo', 'CustomerID', 'InvoiceDate', 'UnitPrice', 'Quantity', 'Note'])
+    for i in range(10):
+        late = i >= 8
+        sheet.append([
+            f'C{536365 + i}' if late else 536365 + i,       # text only in the last batch
+            None if i % 3 == 0 else 12000 + i,               # numbers with blanks
+            datetime.datetime(2011, 1, 1) + datetime.timedelta(hours=i),
+            i if i % 2 else i + 0.5,                         # int and float cells
+            i - 4,
+            'gift' if late else None,                        # blank until the last batch
+        ])
+    workbook.create_sheet('empty').append(['CountryKey', 'Country'])
+    path = tmp_path / 'fact_sales.xlsx'
+    workbook.save(path)
+    monkeypatch.setattr(dataMod, 'ARROW_BATCH_ROWS', 3)
+
+    written = dataMod.convert_workbook_to_arrow(str(path), str(tmp_path))
+
+    assert written == ['fact_sales.arrow', 'fact_sales_empty.arrow']
+    # What the whole-sheet conversion wrote: read_excel, then mixed columns as text
+    reference = write_table(normalize_mixed_columns(pd.read_excel(path)), str(tmp_path / 'reference' / 'fact_sales.arrow'))
+    tm.assert_frame_equal(read_table(str(tmp_path / 'fact_sales.arrow')), read_table(reference))
+    assert list(read_table(str(tmp_path / 'fact_sales_empty.arrow')).columns) == ['CountryKey', 'Country']
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['fact_sales.arrow', 'fact_sales.xlsx', 'fact_sales_empty.arrow',
+                                                          'reference'] # No spilled batches left behind
+
+
+def test_manifest_is_only_rewritten_when_an_entry_changed(tmp_path):
+    workbook = Workbook()
+    workbook.active.append(['CountryKey', 'Country'])
+    workbook.active.append([1, 'United Kingdom'])
+    workbook.save(tmp_path / 'dim_country.xlsx')
+    manifest = tmp_path / dataMod.MANIFEST_FILE
+
+    dataMod.export_excel_to_csv(['dim_country.xlsx'], str(tmp_path), max_workers=1)
+    written_at = manifest.stat().st_mtime_ns
+    dataMod.export_excel_to_csv(['dim_country.xlsx'], str(tmp_path), max_workers=1)
+
+    assert manifest.stat().st_mtime_ns == written_at
+    assert not (tmp_path / (dataMod.MANIFEST_FILE + '.tmp')).exists()
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from duplicate_engine import find_duplicates
+
+ROWS = pd.DataFrame({
+    'InvoiceNo': ['536365', '536366', 'C536379', '536365'],
+    'StockCode': ['85123', '71053', '85123', '85123'],
+    'Quantity': [6, 6, -1, 6],
+})
+
+
+def _kept_rows(groups, n_rows):
+    dropped = groups.loc[groups['row_id'] != groups['first_row_id'], 'row_id']
+    return np.setdiff1d(np.arange(n_rows), dropped.to_numpy())
+
+
+@pytest.mark.parametrize('dtype', [None, str])
+def test_chunks_read_with_mixed_key_types_match_drop_duplicates(tmp_path, dtype):
+    # With chunks of 2 rows, InvoiceNo is read as int64 in the first chunk and as text in the second
+    path = tmp_path / 'mixed_keys.csv'
+    ROWS.to_csv(path, index=False)
+    expected = pd.read_csv(path).drop_duplicates().index.to_numpy()
+
+    groups = find_duplicates(pd.read_csv(path, chunksize=2, dtype=dtype))
+
+    np.testing.assert_array_equal(_kept_rows(groups, len(ROWS)), expected)
+
+
+def test_in_memory_frame_matches_drop_duplicates():
+    groups = find_duplicates(ROWS)
+
+    np.testing.assert_array_equal(_kept_rows(groups, len(ROWS)), ROWS.drop_duplicates().index.to_numpy())
@@ -0,0 +1,49 @@
+import pandas as pd
+
+from rfm_state import RFMState
+
+
+def _lines(customers, invoices, days, totals):
+    dates = pd.Timestamp('2011-01-01') + pd.to_timedelta(days, unit='D')
+    return pd.DataFrame({'CustomerID': customers, 'InvoiceNo': invoices, 'InvoiceDate': dates, 'TotalPrice': totals})
+
+
+def test_lines_of_an_invoice_split_across_batches_are_all_counted():
+    state = RFMState()
+    state.update(_lines([1], ['536365'], [0], [10.0]))
+    changed = state.update(_lines([1, 2], ['536365', '536366'], [1, 0], [5.0, 3.0]))
+
+    rfm = state.to_frame().set_index('CustomerID')
+    assert sorted(changed.tolist()) == [1, 2]
+    assert rfm.loc[1, 'Monetary'] == 15.0
+    assert rfm.loc[1, 'Frequency'] == 1
+    assert rfm.loc[1, 'Recency'] == 1
+    assert rfm.loc[2, 'Monetary'] == 3.0
+
+
+def test_batches_match_a_single_update():
+    lines = _lines([1, 1, 2, 1, 2, 3], ['A', 'A', 'B', 'C', 'B', 'D'], [0, 0, 1, 2, 1, 3],
+                   [1.5, 2.0, 4.0, 8.0, -1.0, 6.0])
+    whole = RFMState()
+    whole.update(lines)
+    batched = RFMState()
+    for start in range(0, len(lines), 2):
+        batched.update(lines.iloc[start:start + 2])
+
+    pd.testing.assert_frame_equal(batched.to_frame(), whole.to_frame())
+
+
+def test_saved_state_keeps_its_source_and_reports_changes(tmp_path):
+    path = str(tmp_path / 'rfm_state.npz')
+    before = RFMState(source='v1')
+    before.update(_lines([1, 2, 3], ['A', 'B', 'C'], [0, 1, 2], [1.0, 2.0, 3.0]))
+    before.save(path)
+    loaded = RFMState.load(path)
+    assert loaded.source == 'v1'
+
+    # Customer 2 corrected, customer 3 gone, customer 4 new
+    after = RFMState(source='v2')
+    after.update(_lines([1, 2, 4], ['A', 'B', 'D'], [0, 1, 3], [1.0, 2.5, 4.0]))
+    changed, removed = after.changes_since(loaded)
+    assert changed.tolist() == [2, 4]
+    assert removed.tolist() == [3]
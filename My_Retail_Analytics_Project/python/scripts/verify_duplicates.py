@@ -1,43 +1,77 @@
 import pandas as pd
+from retail_loader import load_workbook
+from duplicate_engine import find_duplicates
+from pipeline_utils import is_intermediate, iter_frames
 
-def verify_unique_rows(file_path):
+def verify_unique_rows(file_path, subset=None, expected_unique=None, chunk_size=500_000, spill_dir=None, show_groups=5):
     """
-    Loads an Excel file, counts the initial number of rows,
-    removes exact duplicate rows across all columns, and
-    prints the row count before and after duplicate removal.
+    Loads an Excel, CSV or Arrow IPC file, finds the duplicate rows, and prints the row
+    count before and after duplicate removal together with the duplicate groups.
+
+    Duplicates are found with the hash-partitioned engine in duplicate_engine.py.
+    CSV files are read in chunks and the partitions are spilled to disk, so the
+    file does not have to fit in memory. Arrow IPC files from the columnar store
+    (e.g. 'Cleaned_OnlineRetail_ForBI.arrow') are memory-mapped and read one record
+    batch at a time, with no parsing.
 
     Args:
-        file_path (str): The path to the Excel file.
+        file_path (str): The path to the Excel, CSV or .arrow file.
+        subset (list): Key columns that define a duplicate, e.g.
+                       ['InvoiceNo', 'StockCode', 'Quantity']. Defaults to all columns.
+        expected_unique (int): Optional number of unique rows to check the result against.
+        chunk_size (int): Rows per chunk when reading a CSV file.
+        spill_dir (str): Directory for the spilled partitions. Defaults to a temporary directory.
+        show_groups (int): Number of duplicate groups to print.
+
+    Returns:
+        pandas.DataFrame: The duplicate groups (group_id, row_id, first_row_id), or None on error.
     """
     try:
-        # Load the Excel file into a DataFrame
-        df = pd.read_excel(file_path)
+        if is_intermediate(file_path):
+            # Stream the record batches of the columnar store; row numbers continue across batches
+            data = iter_frames(file_path)
+        elif str(file_path).lower().endswith('.csv'):
+            # Stream the CSV as text, so every chunk sees the same key values; row numbers continue across chunks
+            data = pd.read_csv(file_path, chunksize=chunk_size, dtype=str)
+        else:
+            # Load the Excel file into a DataFrame (through the shared parsed-workbook cache)
+            data = load_workbook(file_path)
         print(f"Successfully loaded '{file_path}'.")
 
-        # Get the initial number of rows
-        initial_rows = len(df)
+        groups = find_duplicates(data, subset=subset, spill_dir=spill_dir)
+        initial_rows = len(data) if isinstance(data, pd.DataFrame) else None
+        if initial_rows is None:
+            # The chunked reader is used up by now; count the rows without keeping them
+            if is_intermediate(file_path):
+                initial_rows = sum(len(batch) for batch in iter_frames(file_path, columns=[]))
+            else:
+                initial_rows = sum(len(chunk) for chunk in pd.read_csv(file_path, chunksize=chunk_size, usecols=[0]))
         print(f"Initial number of rows: {initial_rows}")
 
-        # Remove exact duplicate rows across all columns
-        # (This is the default behavior of drop_duplicates() when no 'subset' is specified)
-        df_unique = df.drop_duplicates()
-
-        # Get the number of rows after removing duplicates
-        rows_after_duplicates = len(df_unique)
-        print(f"Number of rows after removing all exact duplicates: {rows_after_duplicates}")
-
-        # Calculate how many rows were removed
-        rows_removed = initial_rows - rows_after_duplicates
+        # Every member of a group except its first occurrence is a duplicate
+        rows_removed = int((groups['row_id'] != groups['first_row_id']).sum())
+        rows_after_duplicates = initial_rows - rows_removed
+        key_description = ', '.join(subset) if subset else 'all columns'
+        print(f"Number of rows after removing duplicates on {key_description}: {rows_after_duplicates}")
         print(f"Total duplicate rows removed: {rows_removed}")
+        print(f"Duplicate groups found: {groups['group_id'].nunique()}")
 
-        # Check if the result matches 37 as expected
-        if rows_after_duplicates == 37:
-            print("\nResult CONFIRMED: The number of unique rows is 37. This matches your Power BI observation!")
-            print("This confirms the total sales figure of 2920 is based on these 37 distinct transaction line items.")
-            print("The previous 228M figure was indeed due to over-counting massive duplicates.")
-        else:
-            print(f"\nResult: The number of unique rows is {rows_after_duplicates}, which differs from 37.")
-            print("This might indicate a slight difference in how duplicates were previously handled or a different file was used.")
+        # Show which rows are duplicated, not just how many
+        if show_groups and not groups.empty:
+            summary = groups.groupby('group_id').agg(first_row_id=('first_row_id', 'first'),
+                                                      copies=('row_id', 'size'),
+                                                      duplicate_rows=('row_id', lambda ids: list(ids[1:])))
+            print(f"\nFirst {min(show_groups, len(summary))} duplicate groups (0-based row numbers):")
+            print(summary.head(show_groups))
+
+        # Optionally compare with a known figure (e.g. the unique row count seen in Power BI)
+        if expected_unique is not None:
+            if rows_after_duplicates == expected_unique:
+                print(f"\nResult CONFIRMED: The number of unique rows is {expected_unique}, as expected.")
+            else:
+                print(f"\nResult: The number of unique rows is {rows_after_duplicates}, which differs from {expected_unique}.")
+                print("This might indicate a slight difference in how duplicates were previously handled or a different file was used.")
+        return groups
 
     except FileNotFoundError:
         print(f"Error: The file '{file_path}' was not found. Please check the file path.")
@@ -45,7 +79,10 @@ def verify_unique_rows(file_path):
         print(f"An unexpected error occurred: {e}")
 
 # --- Example Usage ---
-# Make sure 'Cleaned_OnlineRetail_ForBI.xlsx' is in the same directory as this Python script,
+# Make sure 'Cleaned_OnlineRetail_ForBI.arrow' (written by stockCodeCleaning.py) is in the same directory as this Python script,
 # or provide the full path to the file.
-file_to_check = 'Cleaned_OnlineRetail_ForBI.xlsx'
-verify_unique_rows(file_to_check)
\ No newline at end of file
+if __name__ == "__main__":
+    file_to_check = 'Cleaned_OnlineRetail_ForBI.arrow' # The .xlsx deliverable works too, but has to be parsed
+    key_columns = None          # e.g. ['InvoiceNo', 'StockCode', 'Quantity']; None = all columns
+    expected_unique_rows = None # Set to a known unique row count to check against it
+    verify_unique_rows(file_to_check, subset=key_columns, expected_unique=expected_unique_rows)
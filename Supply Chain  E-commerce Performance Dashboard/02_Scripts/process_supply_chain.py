@@ -1,89 +1,373 @@
 import pandas as pd
+import json
+import os
+from pipeline_utils import export_table, print_summary, profile_csv, track, write_profile, write_table
 
-def set_supply_chain_datatypes(file_path):
+# --- Column groups used to set the data types ---
+numerical_int_cols = [
+    'Product Status', 'Product Card Id', 'Product Category Id',
+    'Order Item Quantity', 'Order Item Cardprod Id', 'Order Item Id',
+    'Order Customer Id', 'Order Id', 'Department Id', 'Customer Id',
+    'Late_delivery_risk', 'Category Id', 'Days for shipping (real)',
+    'Days for shipment (scheduled)'
+]
+
+numerical_float_cols = [
+    'Product Price', 'Order Item Profit Ratio', 'Sales',
+    'Order Item Total', 'Order Profit Per Order', 'Order Item Discount',
+    'Order Item Discount Rate', 'Order Item Product Price',
+    'Latitude', 'Longitude', 'Benefit per order', 'Sales per customer'
+]
+
+date_cols = ['shipping date (DateOrders)', 'order date (DateOrders)']
+
+# Text columns with fewer unique values than this share of the rows become 'category'
+CATEGORY_UNIQUE_RATIO = 0.5
+
+# Columns kept as text even though they look numeric, to preserve leading zeros
+TEXT_COLUMNS = ['Order Zipcode', 'Customer Zipcode']
+
+# Column pairs that may hold the same ID twice; the profile checks them on every row
+CANDIDATE_DUPLICATE_IDS = [('Customer Id', 'Order Customer Id'), ('Category Id', 'Product Category Id')]
+
+# Columns with at least this share of empty values are reported
+HIGH_NULL_RATIO = 0.5
+
+
+@track()
+def infer_schema(file_path, schema_path, sample_rows=20_000, encoding='latin1'):
     """
-    Loads the DataCoSupplyChainDataset from a CSV file and sets appropriate data types.
+    Infers the column types from a sample of the CSV and saves them as a reviewable JSON schema.
+
+    The same rules as the in-memory type setting are used: the listed integer, float
+    and date columns get those types, text columns with few unique values (in the
+    sample) become 'category', and everything else stays text. Columns that are
+    completely empty in the sample are listed under "drop_columns". The file can be
+    edited by hand before the next load, e.g. to keep or drop a column.
 
     Args:
         file_path (str): The path to your DataCoSupplyChainDataset CSV file.
+        schema_path (str): Where the schema JSON is written.
+        sample_rows (int): Number of rows read to infer the schema.
+        encoding (str): The CSV file encoding.
 
     Returns:
-        pandas.DataFrame: The DataFrame with adjusted data types.
+        dict: The schema that was saved.
     """
-    try:
-        # Load the dataset
-        df = pd.read_csv(file_path, encoding='latin1', parse_dates=['shipping date (DateOrders)', 'order date (DateOrders)'])
-        # You might need to adjust 'encoding' based on your file. 'utf-8' is common, 'latin1' or 'ISO-8859-1' are also possibilities.
-
-        print(f"Successfully loaded {file_path}. Initial shape: {df.shape}")
-        print("Inferring and setting data types...")
-
-        # --- Numerical Columns (Integers and Decimals) ---
-        numerical_int_cols = [
-            'Product Status', 'Product Card Id', 'Product Category Id',
-            'Order Item Quantity', 'Order Item Cardprod Id', 'Order Item Id',
-            'Order Customer Id', 'Order Id', 'Department Id', 'Customer Id',
-            'Late_delivery_risk', 'Category Id', 'Days for shipping (real)',
-            'Days for shipment (scheduled)'
-        ]
-        for col in numerical_int_cols:
-            if col in df.columns:
-                # Use pd.to_numeric with errors='coerce' to turn unparseable values into NaN
-                # Then, convert to Int64 (nullable integer) to handle NaNs if any
-                df[col] = pd.to_numeric(df[col], errors='coerce').astype('Int64')
-            else:
-                print(f"Warning: Column '{col}' not found in the dataset.")
-
-        numerical_float_cols = [
-            'Product Price', 'Order Item Profit Ratio', 'Sales',
-            'Order Item Total', 'Order Profit Per Order', 'Order Item Discount',
-            'Order Item Discount Rate', 'Order Item Product Price',
-            'Latitude', 'Longitude', 'Benefit per order', 'Sales per customer'
-        ]
-        for col in numerical_float_cols:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce') # Default to float64, handles NaNs
+    sample = pd.read_csv(file_path, encoding=encoding, nrows=sample_rows)
+    columns = []
+    for col in sample.columns:
+        if col in numerical_int_cols:
+            dtype = 'Int64'
+        elif col in numerical_float_cols:
+            dtype = 'float64'
+        elif col in date_cols:
+            dtype = 'datetime'
+        elif (col not in TEXT_COLUMNS and pd.api.types.is_string_dtype(sample[col])
+              and sample[col].nunique() < len(sample) * CATEGORY_UNIQUE_RATIO):
+            dtype = 'category'
+        else:
+            dtype = 'str'
+        columns.append({
+            'name': col,
+            'dtype': dtype,
+            'sample_unique': int(sample[col].nunique()),
+            'sample_null_ratio': round(float(sample[col].isna().mean()), 4),
+        })
+
+    schema = {
+        'source_file': os.path.basename(file_path),
+        'encoding': encoding,
+        'sample_rows': len(sample),
+        'columns': columns,
+        'drop_columns': [col['name'] for col in columns if col['sample_null_ratio'] == 1.0],
+    }
+    with open(schema_path, 'w') as f:
+        json.dump(schema, f, indent=2)
+    print(f"Inferred schema from {len(sample)} sample rows and saved it to '{schema_path}'. Review it before the next run.")
+    return schema
+
+
+@track()
+def profile_supply_chain(file_path, profile_path, chunk_size=100_000, encoding='latin1'):
+    """
+    Measures every column of the CSV in one chunked pass and saves the profile as JSON.
+
+    Per column: null ratio, numeric min/max/mean/variance, approximate distinct count and
+    top values; for the date columns the date range; for CANDIDATE_DUPLICATE_IDS the
+    share of equal rows and whether each column determines the other. Memory does not
+    grow with the file (see pipeline_utils/profiler.py).
+
+    Args:
+        file_path (str): The path to your DataCoSupplyChainDataset CSV file.
+        profile_path (str): Where the profile JSON is written.
+        chunk_size (int): Rows read per chunk.
+        encoding (str): The CSV file encoding.
+
+    Returns:
+        dict: The profile that was saved.
+    """
+    profile = profile_csv(file_path, chunk_size, encoding, date_columns=date_cols, pairs=CANDIDATE_DUPLICATE_IDS)
+    saved = write_profile(profile, profile_path, source_file=os.path.basename(file_path), encoding=encoding)
+    print(f"Profiled {saved['rows']} rows and saved the profile to '{profile_path}'.")
+    return saved
+
+
+def load_or_profile(file_path, profile_path):
+    """Loads the saved profile, profiling the CSV on the first run (delete the file to profile again)."""
+    if os.path.exists(profile_path):
+        with open(profile_path) as f:
+            return json.load(f)
+    return profile_supply_chain(file_path, profile_path)
+
+
+def _dtype_from_profile(column, rows):
+    """The dtype of one column, decided from its measured statistics."""
+    numeric = column['numeric']
+    if column['null_ratio'] == 1.0:
+        return 'str'
+    if column['name'] in TEXT_COLUMNS or (numeric and numeric['leading_zeros']):
+        return 'str'
+    if 'dates' in column and column['dates']['unparseable'] == 0:
+        return 'datetime'
+    if column['all_numeric']:
+        # Declared float columns stay float even when every value happens to be whole
+        if column['name'] in numerical_float_cols or not numeric['integral']:
+            return 'float64'
+        return 'Int64'
+    if column['name'] in numerical_int_cols + numerical_float_cols:
+        return 'str' # Declared numeric but holds text: kept as read (print_quality_report warns about it)
+    if column['approx_unique'] < rows * CATEGORY_UNIQUE_RATIO:
+        return 'category'
+    return 'str'
+
+
+def schema_from_profile(profile, drop_duplicate_ids=True):
+    """
+    Builds the schema (as infer_schema does) from a profile of the whole file instead of a sample.
+
+    Whole numbers become 'Int64' and other numbers 'float64', but only when every non-empty
+    value parses as a number. Values with a leading zero keep a column as text. Date columns
+    become 'datetime' when every value parses. Text columns with few distinct values become
+    'category'. Empty columns are dropped, and so are ID columns that are identical to their
+    candidate duplicate on every row (when drop_duplicate_ids).
+
+    Args:
+        profile (dict): A profile produced by profile_supply_chain().
+        drop_duplicate_ids (bool): Drop the second column of an identical CANDIDATE_DUPLICATE_IDS pair.
+
+    Returns:
+        dict: The schema, with the reason for every dropped column under "drop_reasons".
+    """
+    rows = profile['rows']
+    columns = []
+    drop_reasons = {}
+    for column in profile['columns']:
+        columns.append({
+            'name': column['name'],
+            'dtype': _dtype_from_profile(column, rows),
+            'approx_unique': column['approx_unique'],
+            'null_ratio': column['null_ratio'],
+        })
+        if column['null_ratio'] == 1.0:
+            drop_reasons[column['name']] = 'empty'
+    if drop_duplicate_ids:
+        for relationship in profile['relationships']:
+            first, second = relationship['columns']
+            if relationship['identical']:
+                drop_reasons[second] = f"identical to '{first}'"
+
+    return {
+        'source_file': profile.get('source_file'),
+        'encoding': profile.get('encoding', 'latin1'),
+        'profile_rows': rows,
+        'columns': columns,
+        'drop_columns': list(drop_reasons),
+        'drop_reasons': drop_reasons,
+    }
+
+
+def load_or_infer_schema(file_path, schema_path, profile=None):
+    """
+    Loads the saved schema. On the first run it is built from the profile when one is
+    given, or inferred from a sample of the CSV otherwise, and saved for review.
+    """
+    if os.path.exists(schema_path):
+        with open(schema_path) as f:
+            return json.load(f)
+    if profile is None:
+        return infer_schema(file_path, schema_path)
+    schema = schema_from_profile(profile)
+    with open(schema_path, 'w') as f:
+        json.dump(schema, f, indent=2)
+    print(f"Built the schema from the profile of {profile['rows']} rows and saved it to '{schema_path}'. Review it before the next run.")
+    return schema
+
+
+def print_quality_report(profile):
+    """Prints the data quality notes measured by the profile."""
+    rows = profile['rows']
+    print(f"\nData quality (measured on all {rows} rows):")
+    for column in profile['columns']:
+        name, ratio = column['name'], column['null_ratio']
+        if ratio == 1.0:
+            print(f"Note: '{name}' is entirely empty/null. Consider dropping or investigating source.")
+        elif ratio >= HIGH_NULL_RATIO:
+            print(f"Note: '{name}' has {ratio:.1%} empty/null values. Address data quality if crucial for analysis.")
+        if name in numerical_int_cols + numerical_float_cols and column['non_numeric']:
+            print(f"Warning: '{name}' should be numeric but has {column['non_numeric']} values that are not numbers.")
+        elif name in numerical_int_cols and column['numeric'] and not column['numeric']['integral']:
+            print(f"Warning: '{name}' should hold whole numbers but has fractional values.")
+        if 'dates' in column and column['dates']['unparseable']:
+            print(f"Warning: '{name}' has {column['dates']['unparseable']} values that are not dates.")
+
+    # Confirming potential duplicate IDs
+    for relationship in profile['relationships']:
+        first, second = relationship['columns']
+        forward, backward = relationship['a_determines_b'], relationship['b_determines_a']
+        compared = relationship['rows_compared']
+        different = compared - relationship['equal_rows']
+        if relationship['identical']:
+            print(f"Observation: '{first}' and '{second}' are identical on all {compared} rows. You might only need one.")
+        elif forward['holds'] and backward['holds']:
+            print(f"Observation: '{first}' and '{second}' differ on {different} of {compared} rows "
+                  f"but map one-to-one, so they encode the same entity. You might only need one.")
+        else:
+            print(f"Observation: '{first}' and '{second}' are present and different (they differ on {different} of {compared} rows, "
+                  f"{first} -> {second}: {'holds' if forward['holds'] else 'does not hold'}, "
+                  f"{second} -> {first}: {'holds' if backward['holds'] else 'does not hold'}). "
+                  f"Keep both if they represent distinct IDs.")
+
+
+def read_with_schema(file_path, schema):
+    """
+    Reads the CSV in one typed pass, using the dtypes, columns and date columns from the schema.
+
+    Args:
+        file_path (str): The path to your DataCoSupplyChainDataset CSV file.
+        schema (dict): A schema produced by infer_schema().
+
+    Returns:
+        pandas.DataFrame: The typed DataFrame.
+    """
+    keep = [col for col in schema['columns'] if col['name'] not in schema.get('drop_columns', [])]
+    dtypes = {col['name']: (str if col['dtype'] == 'str' else col['dtype']) for col in keep if col['dtype'] != 'datetime'}
+    parse_dates = [col['name'] for col in keep if col['dtype'] == 'datetime']
+    return pd.read_csv(
+        file_path,
+        encoding=schema.get('encoding', 'latin1'),
+        usecols=[col['name'] for col in keep],
+        dtype=dtypes,
+        parse_dates=parse_dates,
+    )
+
+
+def _load_and_infer_datatypes(file_path):
+    """Loads the whole CSV with default inference, then sets the data types column by column."""
+    # Load the dataset
+    df = pd.read_csv(file_path, encoding='latin1', parse_dates=['shipping date (DateOrders)', 'order date (DateOrders)'])
+    # You might need to adjust 'encoding' based on your file. 'utf-8' is common, 'latin1' or 'ISO-8859-1' are also possibilities.
+
+    print(f"Successfully loaded {file_path}. Initial shape: {df.shape}")
+    print("Inferring and setting data types...")
+
+    # --- Numerical Columns (Integers and Decimals) ---
+    for col in numerical_int_cols:
+        if col in df.columns:
+            # Use pd.to_numeric with errors='coerce' to turn unparseable values into NaN
+            # Then, convert to Int64 (nullable integer) to handle NaNs if any
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('Int64')
+        else:
+            print(f"Warning: Column '{col}' not found in the dataset.")
+
+    for col in numerical_float_cols:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce') # Default to float64, handles NaNs
+        else:
+            print(f"Warning: Column '{col}' not found in the dataset.")
+
+    # --- Date/Time Columns ---
+    # Already handled in pd.read_csv parse_dates for specified columns.
+    # Ensure they are datetime objects, Power BI will recognize this.
+    for col in date_cols:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+        else:
+            print(f"Warning: Date column '{col}' not found in the dataset.")
+
+
+    # --- Text/Categorical Columns ---
+    # Iterate through remaining columns and set to 'object' (string) or 'category'
+    # 'category' is memory efficient for columns with limited unique values.
+    for col in df.columns:
+        if col not in numerical_int_cols + numerical_float_cols + date_cols:
+            # Check for high cardinality before converting to 'category'
+            # A good threshold for categorical columns is subjective,
+            # but typically less than 50% unique values, or a fixed number like < 100.
+            if df[col].nunique() < df.shape[0] * 0.5 and df[col].dtype == 'object':
+                df[col] = df[col].astype('category')
             else:
-                print(f"Warning: Column '{col}' not found in the dataset.")
+                df[col] = df[col].astype(str) # Ensure all others are strings
 
-        # --- Date/Time Columns ---
-        # Already handled in pd.read_csv parse_dates for specified columns.
-        # Ensure they are datetime objects, Power BI will recognize this.
-        date_cols = ['shipping date (DateOrders)', 'order date (DateOrders)']
-        for col in date_cols:
-            if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors='coerce')
+    return df
+
+
+def _print_frame_quality_notes(df):
+    """The data quality notes for a run without a profile, measured on the loaded DataFrame."""
+    for col in df.columns:
+        ratio = df[col].isna().mean()
+        if ratio == 1.0:
+            print(f"Note: '{col}' is entirely empty/null. Consider dropping or investigating source.")
+        elif ratio >= HIGH_NULL_RATIO:
+            print(f"Note: '{col}' has {ratio:.1%} empty/null values. Address data quality if crucial for analysis.")
+
+    # Confirming potential duplicate IDs
+    for first, second in CANDIDATE_DUPLICATE_IDS:
+        if first in df.columns and second in df.columns:
+            if df[first].equals(df[second]):
+                print(f"Observation: '{first}' and '{second}' appear to be identical. You might only need one.")
             else:
-                print(f"Warning: Date column '{col}' not found in the dataset.")
-
-
-        # --- Text/Categorical Columns ---
-        # Iterate through remaining columns and set to 'object' (string) or 'category'
-        # 'category' is memory efficient for columns with limited unique values.
-        for col in df.columns:
-            if col not in numerical_int_cols + numerical_float_cols + date_cols:
-                # Check for high cardinality before converting to 'category'
-                # A good threshold for categorical columns is subjective,
-                # but typically less than 50% unique values, or a fixed number like < 100.
-                if df[col].nunique() < df.shape[0] * 0.5 and df[col].dtype == 'object':
-                    df[col] = df[col].astype('category')
-                else:
-                    df[col] = df[col].astype(str) # Ensure all others are strings
+                print(f"Observation: '{first}' and '{second}' are present and different. Keep both if they represent distinct IDs.")
 
-        # --- Special Handling / Data Quality Notes ---
-        if 'Product Description' in df.columns:
-            # Your observation: "Has 100% empty, so may need to be excluded or its source investigated."
-            if df['Product Description'].isnull().all() or (df['Product Description'] == '').all():
-                print("Note: 'Product Description' is entirely empty/null. Consider dropping or investigating source.")
 
-        if 'Order Zipcode' in df.columns:
-            # Your observation: "Has 97% empty/null values."
-            print("Note: 'Order Zipcode' has a high percentage of empty/null values. Address data quality if crucial for analysis.")
-            df['Order Zipcode'] = df['Order Zipcode'].astype(str) # Keep as string for potential leading zeros
+@track()
+def set_supply_chain_datatypes(file_path, schema_path=None, profile_path=None):
+    """
+    Loads the DataCoSupplyChainDataset from a CSV file and sets appropriate data types.
 
-        if 'Customer Zipcode' in df.columns:
-            print("Note: 'Customer Zipcode' has a high percentage of empty/null values. Address data quality if crucial for analysis.")
-            df['Customer Zipcode'] = df['Customer Zipcode'].astype(str) # Keep as string for potential leading zeros
+    Args:
+        file_path (str): The path to your DataCoSupplyChainDataset CSV file.
+        schema_path (str): Optional schema JSON. When given, the types are set while the
+                           CSV is parsed, in a single typed read (the schema is built
+                           from the profile, or inferred from a sample, and saved on the
+                           first run).
+        profile_path (str): Optional profile JSON (see profile_supply_chain; profiled and
+                            saved on the first run). When given, the data quality notes
+                            and the dtype and drop decisions come from the profile.
+
+    Returns:
+        pandas.DataFrame: The DataFrame with adjusted data types.
+    """
+    try:
+        profile = load_or_profile(file_path, profile_path) if profile_path is not None else None
+        if schema_path is not None:
+            df = read_with_schema(file_path, load_or_infer_schema(file_path, schema_path, profile))
+            print(f"Successfully loaded {file_path} with the schema in '{schema_path}'. Shape: {df.shape}")
+        elif profile is not None:
+            df = read_with_schema(file_path, schema_from_profile(profile))
+            print(f"Successfully loaded {file_path} with the types from the profile in '{profile_path}'. Shape: {df.shape}")
+        else:
+            df = _load_and_infer_datatypes(file_path)
+
+        # --- Special Handling / Data Quality Notes ---
+        if profile is not None:
+            print_quality_report(profile)
+        else:
+            _print_frame_quality_notes(df)
+
+        for col in TEXT_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].astype(str) # Keep as string for potential leading zeros
 
         # --- Sensitive Data Handling ---
         if 'Customer Password' in df.columns:
@@ -98,20 +382,6 @@ def set_supply_chain_datatypes(file_path):
             # Example to drop: df = df.drop(columns=['Customer Email'])
             # Example to mask: df['Customer Email'] = df['Customer Email'].apply(lambda x: '***@***.com' if pd.notnull(x) else x)
 
-        # Confirming potential duplicate IDs
-        if 'Customer Id' in df.columns and 'Order Customer Id' in df.columns:
-            if df['Customer Id'].equals(df['Order Customer Id']):
-                print("Observation: 'Customer Id' and 'Order Customer Id' appear to be identical. You might only need one.")
-            else:
-                print("Observation: 'Customer Id' and 'Order Customer Id' are present and different. Keep both if they represent distinct IDs.")
-
-        if 'Category Id' in df.columns and 'Product Category Id' in df.columns:
-            if df['Category Id'].equals(df['Product Category Id']):
-                print("Observation: 'Category Id' and 'Product Category Id' appear to be identical. You might only need one.")
-            else:
-                print("Observation: 'Category Id' and 'Product Category Id' are present and different. Keep both if they represent distinct IDs.")
-
-
         print("\nData type setting complete.")
         print("\nFinal DataFrame Info:")
         df.info()
@@ -129,13 +399,23 @@ def set_supply_chain_datatypes(file_path):
 if __name__ == "__main__":
     # IMPORTANT: Replace 'path/to/your/DataCoSupplyChainDataset.csv' with the actual path to your CSV file
     csv_file_path = 'DataCoSupplyChainDataset.csv' # Assuming it's in the same directory as your script
+    # Column types are inferred once from a sample and saved here; review/edit it, or delete it to re-infer
+    schema_file_path = 'supply_chain_schema.json'
+    # Measured once in a chunked pass over the whole file; drives the schema and the data quality notes
+    profile_file_path = 'supply_chain_profile.json'
+    # The typed hand-off (Arrow IPC keeps the Int64, category and datetime columns) and the CSV for Power BI
+    cleaned_file_path = 'DataCoSupplyChainDataset_cleaned.arrow'
+    export_file_path = 'DataCoSupplyChainDataset_cleaned.csv' # None to skip the CSV copy
 
-    processed_df = set_supply_chain_datatypes(csv_file_path)
+    processed_df = set_supply_chain_datatypes(csv_file_path, schema_file_path, profile_file_path)
 
     # Corrected indentation for the final if block
     if processed_df is not None:
-        # Save the processed DataFrame to a new CSV file
-        processed_df.to_csv('DataCoSupplyChainDataset_cleaned.csv', index=False)
-        print("\nCleaned data saved to 'DataCoSupplyChainDataset_cleaned.csv'")
-        print("You can now import 'DataCoSupplyChainDataset_cleaned.csv' into Power BI.")
-        print("Remember to review the 'Sensitive Data Handling' warnings.")
\ No newline at end of file
+        # Save the processed DataFrame: typed for later stages, CSV for Power BI
+        write_table(processed_df, cleaned_file_path)
+        print(f"\nCleaned data saved to '{cleaned_file_path}' (types preserved)")
+        if export_file_path:
+            export_table(processed_df, export_file_path)
+            print(f"You can now import '{export_file_path}' into Power BI.")
+        print("Remember to review the 'Sensitive Data Handling' warnings.")
+    print_summary()
\ No newline at end of file
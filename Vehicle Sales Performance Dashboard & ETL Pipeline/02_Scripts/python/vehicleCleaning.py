@@ -1,45 +1,96 @@
 import pandas as pd
+from pipeline_utils import export_table, print_summary, stage, track, write_table
+from saledate_parser import parse_saledate
 
-# 1. Load the data
-df = pd.read_csv("car_prices.csv")
+def clean_vehicle_frame(df):
+    """
+    Cleans one frame (the whole file or a single chunk) of car_prices data: parses
+    saledate, drops rows missing key data and adds the dashboard columns
+    (price_diff, profit_margin, sale_year, sale_month).
 
-# 2. Quick overview
-print(df.shape)
-print(df.columns)
-print(df.dtypes)
-print(df.isnull().sum())
+    Args:
+        df (pandas.DataFrame): The raw car_prices.csv data (or a chunk of it).
 
-# 3. Convert data types - FIXED DATE PARSING
-df['saledate'] = pd.to_datetime(df['saledate'], 
-                               format='mixed',  # Explicitly handle mixed formats
-                               utc=True,       # Handle timezones consistently
-                               errors='coerce') # Still coerce errors to NaT
+    Returns:
+        tuple: (cleaned DataFrame, or None if no saledate could be parsed;
+               dict with the number of rows each date-parsing path handled)
+    """
+    # 3. Convert data types - FIXED DATE PARSING
+    # Same result as pd.to_datetime(format='mixed', utc=True, errors='coerce'), but the
+    # known layouts are parsed with fixed formats and each distinct string only once
+    df['saledate'], date_parse_report = parse_saledate(df['saledate'])
+    date_parse_report['null_dates'] = int(df['saledate'].isnull().sum())
 
-# Verify date conversion worked
-print("\nDate conversion check:")
-print(df['saledate'].head())
-print("Null dates:", df['saledate'].isnull().sum())
+    # Only proceed if we have valid dates
+    if not df['saledate'].notnull().any():
+        return None, date_parse_report
 
-# Only proceed if we have valid dates
-if df['saledate'].notnull().any():
     # 4. Drop rows with missing key data - ADD DATE TO CRITICAL FIELDS
     df.dropna(subset=['saledate', 'sellingprice', 'mmr'], inplace=True)
-    
+
     # 5. Create new features - NOW SAFE TO USE .dt ACCESSOR
     df['price_diff'] = df['sellingprice'] - df['mmr']
     df['profit_margin'] = (df['price_diff'] / df['mmr']).round(2)
     df['sale_year'] = df['saledate'].dt.year
     df['sale_month'] = df['saledate'].dt.month_name()  # More readable than numbers
-    
-    
-    # 7. Final check
-    print("\nCleaned data sample:")
-    print(df.head())
-    print("\nData types:")
+    return df, date_parse_report
+
+
+@track()
+def clean_vehicle_sales(df):
+    """
+    Cleans the car_prices data in memory (see clean_vehicle_frame).
+
+    Args:
+        df (pandas.DataFrame): The raw car_prices.csv data.
+
+    Returns:
+        tuple: (cleaned DataFrame, or None if no saledate could be parsed;
+               dict with the number of rows each date-parsing path handled)
+    """
+    return clean_vehicle_frame(df)
+
+
+if __name__ == "__main__":
+    # Outputs: the typed hand-off for later stages (Arrow IPC keeps the UTC saledate and the
+    # numeric types) and the CSV deliverable for Power BI (None to skip it)
+    cleaned_file = "clean_vehicle_sales.arrow"
+    export_file = "clean_vehicle_sales.csv"
+
+    # 1. Load the data
+    with stage('load_car_prices') as load_stage:
+        df = pd.read_csv("car_prices.csv")
+        load_stage.rows_out = len(df)
+
+    # 2. Quick overview
+    print(df.shape)
+    print(df.columns)
     print(df.dtypes)
-    
-    # 8. Export clean data
-    df.to_csv("clean_vehicle_sales.csv", index=False)
-else:
-    print("ERROR: Could not parse any valid dates from saledate column.")
-    print("Please check the date format in your CSV file.")
\ No newline at end of file
+    print(df.isnull().sum())
+
+    df, date_parse_report = clean_vehicle_sales(df)
+
+    if df is not None:
+        # Verify date conversion worked
+        print("\nDate conversion check:")
+        print(df['saledate'].head())
+        print("Null dates:", date_parse_report['null_dates'])
+        print("Rows handled by each parsing path:", date_parse_report)
+
+        # 7. Final check
+        print("\nCleaned data sample:")
+        print(df.head())
+        print("\nData types:")
+        print(df.dtypes)
+
+        # 8. Export clean data
+        with stage('save_clean_data', rows_in=len(df)):
+            write_table(df, cleaned_file)
+            if export_file:
+                export_table(df, export_file)
+        print(f"Saved the cleaned data to '{cleaned_file}'" + (f" and '{export_file}'" if export_file else ""))
+    else:
+        print("Rows handled by each parsing path:", date_parse_report)
+        print("ERROR: Could not parse any valid dates from saledate column.")
+        print("Please check the date format in your CSV file.")
+    print_summary()
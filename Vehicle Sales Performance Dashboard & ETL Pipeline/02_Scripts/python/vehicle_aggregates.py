@@ -0,0 +1,271 @@
+import pandas as pd
+import numpy as np
+import os
+from pipeline_utils import TableWriter, print_summary, track
+from vehicleCleaning import clean_vehicle_frame
+
+# =============================================
+# OUT-OF-CORE VEHICLE SALES REPORTS
+# =============================================
+# Computes the reports of sql/SQLforVehicle.sql in one chunked pass over car_prices.csv,
+# without loading the file or a database:
+#   monthly_sales_trend   per sale month (yyyy-mm of the UTC saledate)
+#   top_brands            top 10 makes by revenue, with volume and average price
+#   price_gap_by_brand    average sellingprice - mmr and average margin per make
+#   condition_pricing     per condition grade
+#   state_revenue         per state
+#   transmission_trends   per transmission, with COUNT(DISTINCT model)
+#
+# Each chunk is cleaned with clean_vehicle_frame (saledate parsing, price_diff,
+# profit_margin, sale_year) and reduced to sums and counts per key, which are added
+# to the running totals. Averages are only divided out when a report is produced, so
+# the result is the same for any chunk size, and VehicleAggregates of different files
+# or partitions can be merged. The state is one row per make, state, condition grade,
+# month and (transmission, model) pair, however many sales are read.
+#
+# SQL Server compares text with a case-insensitive collation, so the queries group
+# 'Ford' and 'ford' together. The text keys here do the same; a group is shown with
+# the first spelling that was read.
+
+CHUNK_SIZE = 200_000
+
+# Types for every chunk, so all chunks (and the cleaned output) share one schema
+CHUNK_DTYPES = {
+    'year': 'Int64', 'condition': 'float64', 'odometer': 'float64', 'mmr': 'float64', 'sellingprice': 'float64',
+    'make': 'str', 'model': 'str', 'trim': 'str', 'body': 'str', 'transmission': 'str', 'vin': 'str',
+    'state': 'str', 'color': 'str', 'interior': 'str', 'seller': 'str', 'saledate': 'str',
+}
+
+# Report dimension -> column it is keyed by
+DIMENSIONS = {
+    'month': 'sale_month_key',
+    'make': 'make',
+    'condition': 'condition',
+    'state': 'state',
+    'transmission': 'transmission',
+}
+TEXT_DIMENSIONS = ('make', 'state', 'transmission')
+
+# Running sums per key: sales, sellingprice, mmr, price_diff, and the margin over sales with mmr != 0
+SUM_COLUMNS = ['count', 'price', 'mmr', 'price_diff', 'margin', 'margin_count']
+
+
+def _sums(chunk):
+    """The per-row values that are summed per key."""
+    mmr = chunk['mmr'].to_numpy(dtype='float64')
+    diff = chunk['price_diff'].to_numpy(dtype='float64')
+    has_mmr = mmr != 0
+    # The SQL margin is NULL (left out of the average) when mmr is 0
+    margin = np.divide(diff, mmr, out=np.zeros_like(diff), where=has_mmr)
+    return pd.DataFrame({
+        'count': 1,
+        'price': chunk['sellingprice'].to_numpy(dtype='float64'),
+        'mmr': mmr,
+        'price_diff': diff,
+        'margin': margin,
+        'margin_count': has_mmr.astype(np.int64),
+    }, index=chunk.index)
+
+
+class VehicleAggregates:
+    """Running totals behind the SQLforVehicle.sql reports."""
+
+    def __init__(self):
+        self.totals = {name: None for name in DIMENSIONS}
+        self.labels = {name: pd.Series(dtype=object) for name in TEXT_DIMENSIONS}
+        self.transmission_models = pd.DataFrame({'transmission': pd.Series(dtype=object), 'model': pd.Series(dtype=object)})
+        self.rows = 0
+
+    def _add(self, name, partial):
+        current = self.totals[name]
+        self.totals[name] = partial if current is None else current.add(partial, fill_value=0)
+
+    def _keys(self, name, values):
+        """Case-folded keys of a text dimension; the first spelling of each key is kept as its label."""
+        keys = values.str.lower()
+        first = values.groupby(keys, sort=False).first()
+        self.labels[name] = self.labels[name].combine_first(first)
+        return keys
+
+    def update(self, chunk):
+        """
+        Folds a chunk of cleaned rows (see clean_vehicle_frame) into the running totals.
+
+        Returns:
+            VehicleAggregates: self, so calls can be chained.
+        """
+        if chunk is None or chunk.empty:
+            return self
+        sums = _sums(chunk)
+        saledate = chunk['saledate']
+        keys = {
+            'month': saledate.dt.year * 100 + saledate.dt.month,
+            'condition': chunk['condition'],
+        }
+        for name in TEXT_DIMENSIONS:
+            keys[name] = self._keys(name, chunk[DIMENSIONS[name]])
+        for name, key in keys.items():
+            # NaN keys are dropped, as the queries' "IS NOT NULL" filters do
+            self._add(name, sums.groupby(key.to_numpy(), sort=False).sum())
+
+        pairs = pd.DataFrame({'transmission': keys['transmission'], 'model': chunk['model'].str.lower()}).dropna()
+        self.transmission_models = pd.concat([self.transmission_models, pairs.drop_duplicates()]).drop_duplicates()
+        self.rows += len(chunk)
+        return self
+
+    def merge(self, other):
+        """Folds in the totals of other data (another file or partition)."""
+        for name, partial in other.totals.items():
+            if partial is not None:
+                self._add(name, partial)
+        for name in TEXT_DIMENSIONS:
+            self.labels[name] = self.labels[name].combine_first(other.labels[name])
+        self.transmission_models = pd.concat([self.transmission_models, other.transmission_models]).drop_duplicates()
+        self.rows += other.rows
+        return self
+
+    def _table(self, name, label):
+        totals = self.totals[name]
+        if totals is None:
+            totals = pd.DataFrame(columns=SUM_COLUMNS, dtype='float64')
+        table = totals.copy()
+        if name in self.labels:
+            table.index = table.index.map(self.labels[name])
+        table.index.name = label
+        return table
+
+    # --- The reports of SQLforVehicle.sql ---
+
+    def monthly_sales_trend(self):
+        t = self._table('month', 'sale_month').sort_index()
+        t.index = [f'{key // 100:04d}-{key % 100:02d}' for key in t.index.astype(np.int64)]
+        t.index.name = 'sale_month'
+        return pd.DataFrame({
+            'total_vehicles_sold': t['count'].astype(np.int64),
+            'total_revenue': t['price'],
+            'avg_price': (t['price'] / t['count']).round(2),
+        }).reset_index()
+
+    def top_brands(self, n=10):
+        t = self._table('make', 'make')
+        return pd.DataFrame({
+            'total_sold': t['count'].astype(np.int64),
+            'total_sales': t['price'].round(0),
+            'avg_price': (t['price'] / t['count']).round(0),
+        }).sort_values('total_sales', ascending=False).head(n).reset_index()
+
+    def price_gap_by_brand(self):
+        t = self._table('make', 'make')
+        return pd.DataFrame({
+            'avg_price_diff': (t['price_diff'] / t['count']).round(2),
+            'avg_margin_pct': (t['margin'] / t['margin_count'].replace(0, np.nan)).round(2),
+        }).sort_values('avg_price_diff', ascending=False).reset_index()
+
+    def condition_pricing(self):
+        t = self._table('condition', 'condition')
+        return pd.DataFrame({
+            'vehicle_count': t['count'].astype(np.int64),
+            'avg_selling_price': (t['price'] / t['count']).round(0),
+            'avg_mmr': (t['mmr'] / t['count']).round(0),
+            'avg_price_difference': (t['price_diff'] / t['count']).round(0),
+        }).sort_values('avg_selling_price', ascending=False).reset_index()
+
+    def state_revenue(self):
+        t = self._table('state', 'state')
+        return pd.DataFrame({
+            'vehicles_sold': t['count'].astype(np.int64),
+            'total_revenue': t['price'],
+            'avg_price': (t['price'] / t['count']).round(0),
+            'avg_price_vs_mmr': (t['price_diff'] / t['count']).round(0),
+        }).sort_values('total_revenue', ascending=False).reset_index()
+
+    def transmission_trends(self):
+        t = self._table('transmission', 'transmission')
+        models = self.transmission_models.groupby('transmission')['model'].nunique()
+        return pd.DataFrame({
+            'total_sold': t['count'].astype(np.int64),
+            'avg_price': (t['price'] / t['count']).round(0),
+            'avg_price_vs_market': (t['price_diff'] / t['count']).round(0),
+            'unique_models_available': models.rename(index=self.labels['transmission']).reindex(t.index).fillna(0).astype(np.int64),
+        }).sort_values('total_sold', ascending=False).reset_index()
+
+    def reports(self):
+        """All six reports, by name."""
+        return {
+            'monthly_sales_trend': self.monthly_sales_trend(),
+            'top_brands': self.top_brands(),
+            'price_gap_by_brand': self.price_gap_by_brand(),
+            'condition_pricing': self.condition_pricing(),
+            'state_revenue': self.state_revenue(),
+            'transmission_trends': self.transmission_trends(),
+        }
+
+
+@track()
+def aggregate_vehicle_sales(input_path, chunk_size=CHUNK_SIZE, cleaned_path=None, aggregates=None):
+    """
+    Cleans car_prices.csv chunk by chunk and folds every chunk into the report totals.
+
+    Only one chunk is held in memory at a time, so files far larger than RAM can be
+    reported on.
+
+    Args:
+        input_path (str): The raw car_prices.csv.
+        chunk_size (int): Rows read and cleaned per chunk.
+        cleaned_path (str): Optional Arrow IPC file for the cleaned rows (one record batch per chunk).
+        aggregates (VehicleAggregates): Existing totals to add to. New totals are created when None.
+
+    Returns:
+        tuple: (VehicleAggregates, dict with the rows each date-parsing path handled over all chunks)
+    """
+    aggregates = aggregates or VehicleAggregates()
+    parse_report = {}
+    writer = TableWriter(cleaned_path) if cleaned_path else None
+    try:
+        for chunk in pd.read_csv(input_path, chunksize=chunk_size, dtype=CHUNK_DTYPES):
+            cleaned, chunk_report = clean_vehicle_frame(chunk)
+            for path_name, count in chunk_report.items():
+                parse_report[path_name] = parse_report.get(path_name, 0) + count
+            if cleaned is None:
+                continue # No parseable saledate in this chunk
+            aggregates.update(cleaned)
+            if writer is not None:
+                writer.write(cleaned)
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+    if writer is not None and writer.rows:
+        writer.close()
+    return aggregates, parse_report
+
+
+# =============================================
+# MAIN EXECUTION
+# =============================================
+if __name__ == "__main__":
+    # Configuration
+    input_file = "car_prices.csv"
+    chunk_size = CHUNK_SIZE
+    cleaned_file = None # e.g. "clean_vehicle_sales.arrow" to also write the cleaned rows
+    report_dir = "vehicle_reports" # One CSV per report; None to only print them
+
+    if not os.path.exists(input_file):
+        print(f"Error: File not found at {input_file}")
+        exit()
+
+    try:
+        aggregates, parse_report = aggregate_vehicle_sales(input_file, chunk_size, cleaned_file)
+        print(f"Aggregated {aggregates.rows:,} cleaned sales. Rows handled by each parsing path: {parse_report}")
+        if report_dir:
+            os.makedirs(report_dir, exist_ok=True)
+        for name, report in aggregates.reports().items():
+            print(f"\n--- {name} ---")
+            print(report.head(20))
+            if report_dir:
+                report.to_csv(os.path.join(report_dir, f"{name}.csv"), index=False)
+        if report_dir:
+            print(f"\nSaved the reports to '{report_dir}'")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+    print_summary()
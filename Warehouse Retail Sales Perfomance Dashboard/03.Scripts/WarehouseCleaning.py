@@ -1,21 +1,26 @@
 import pandas as pd
+import numpy as np
 import re
+from pipeline_utils import TableWriter, is_intermediate, print_summary, track, write_table
 
 # ----------------------------------------------------
-# STEP 1: Load the dataset
+# CONFIGURATION
 # ----------------------------------------------------
 # Replace 'your_file_name.csv' with the actual name of your CSV file.
-try:
-    df = pd.read_csv('Warehouse_and_Retail_Sales.csv')
-except FileNotFoundError:
-    print("Error: The file was not found. Please make sure the CSV file is in the same directory as this script.")
-    exit()
+input_file_name = 'Warehouse_and_Retail_Sales.csv'
+# The cleaned data is written to the columnar store (Arrow IPC), which keeps the Int64 and
+# string types and is memory-mapped by the next stage. A '.csv' name writes CSV instead.
+cleaned_file_name = 'cleaned_sales_data.arrow'
+# Optional CSV copy for delivery (Power BI, spreadsheets); None to skip it
+export_file_name = 'cleaned_sales_data.csv'
 
-# ----------------------------------------------------
-# STEP 2: Clean the numeric columns
-# ----------------------------------------------------
-# The goal is to remove any non-numeric characters (like currency symbols or spaces)
-# and convert the columns to a numeric format.
+# Streaming mode reads and cleans the CSV in chunks of CHUNK_SIZE rows and appends
+# each cleaned chunk to the output file, so memory use stays flat no matter how big
+# the extract is. The output is identical to the in-memory mode.
+STREAMING_MODE = True
+CHUNK_SIZE = 100_000
+# For monthly refreshes, warehouse_partitions.py keeps the cleaned data as one partition
+# per YEAR/MONTH and only cleans the periods that are new or changed.
 
 # List of columns that should be numeric
 numeric_columns = [
@@ -24,40 +29,173 @@ numeric_columns = [
     'WAREHOUSE SALES'
 ]
 
-for col in numeric_columns:
-    # Use a regular expression to remove everything except numbers and a decimal point.
-    # The [^0-9\.] part matches any character that is NOT a digit or a decimal point.
-    # We replace these characters with an empty string.
-    df[col] = df[col].astype(str).str.replace(r'[^0-9\.]', '', regex=True)
-    
-    # After cleaning, convert the column to a numeric data type.
-    # pd.to_numeric() is robust and will handle the conversion.
-    df[col] = pd.to_numeric(df[col], errors='coerce')
+# Columns that are always read as text, so each chunk sees the same raw values
+text_columns = ['SUPPLIER', 'ITEM DESCRIPTION', 'ITEM TYPE']
 
-# ----------------------------------------------------
-# STEP 3: Convert other columns to their correct types
-# ----------------------------------------------------
-# YEAR and MONTH are already integers, but it's good practice to ensure they are.
-df['YEAR'] = pd.to_numeric(df['YEAR'], errors='coerce').astype('Int64')
-df['MONTH'] = pd.to_numeric(df['MONTH'], errors='coerce').astype('Int64')
+# Matches every character that is NOT a digit or a decimal point
+non_numeric_pattern = r'[^0-9\.]'
 
-# Item Code is an identifier, so it can be an integer.
-df['ITEM CODE'] = pd.to_numeric(df['ITEM CODE'], errors='coerce').astype('Int64')
 
-# Supplier, Item Description, and Item Type are text/categorical.
-# The 'string' type in pandas is more memory-efficient than 'object'
-df['SUPPLIER'] = df['SUPPLIER'].astype('string')
-df['ITEM DESCRIPTION'] = df['ITEM DESCRIPTION'].astype('string')
-df['ITEM TYPE'] = df['ITEM TYPE'].astype('string')
+def parse_numeric_column(series):
+    """
+    Strips everything except digits and decimal points from a column and converts it to numbers.
 
-# ----------------------------------------------------
-# STEP 4: Save the cleaned DataFrame to a new CSV file
-# ----------------------------------------------------
-cleaned_file_name = 'cleaned_sales_data.csv'
-df.to_csv(cleaned_file_name, index=False)
+    The original cleaning cast every cell to str, removed the non-numeric characters
+    with a regex and parsed the result. When pandas has already read the column as
+    numbers, that round-trip is the same as taking the absolute value (the minus sign
+    is one of the removed characters), so the string work is only done for the few
+    values whose text form would change differently: non-finite values and numbers
+    Python prints in scientific notation. Columns read as text (e.g. because some
+    cells carry currency symbols) still go through the regex.
+
+    Args:
+        series (pandas.Series): The raw column.
+
+    Returns:
+        pandas.Series: The cleaned float column.
+    """
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        values = series.to_numpy(dtype='float64', na_value=np.nan)
+        cleaned = np.abs(values)
+        # repr() switches to scientific notation outside [1e-4, 1e16), e.g. '1e-05',
+        # and 'inf' contains no digits at all - send those through the string path
+        needs_text = ~np.isfinite(values) & ~np.isnan(values)
+        needs_text |= (cleaned != 0) & ((cleaned < 1e-4) | (cleaned >= 1e16))
+        if needs_text.any():
+            text = pd.Series(values[needs_text]).astype(str).str.replace(non_numeric_pattern, '', regex=True)
+            cleaned[needs_text] = pd.to_numeric(text, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+        return pd.Series(cleaned, index=series.index, name=series.name)
+
+    text = series.astype(str).str.replace(non_numeric_pattern, '', regex=True)
+    return pd.to_numeric(text, errors='coerce').astype('float64')
+
+
+def clean_sales_frame(df):
+    """
+    Cleans one frame (the whole file or a single chunk) of warehouse and retail sales.
+
+    Args:
+        df (pandas.DataFrame): Raw rows from the sales CSV.
+
+    Returns:
+        pandas.DataFrame: The cleaned rows.
+    """
+    # ----------------------------------------------------
+    # STEP 2: Clean the numeric columns
+    # ----------------------------------------------------
+    # The goal is to remove any non-numeric characters (like currency symbols or spaces)
+    # and convert the columns to a numeric format.
+    for col in numeric_columns:
+        df[col] = parse_numeric_column(df[col])
+
+    # ----------------------------------------------------
+    # STEP 3: Convert other columns to their correct types
+    # ----------------------------------------------------
+    # YEAR and MONTH are already integers, but it's good practice to ensure they are.
+    df['YEAR'] = pd.to_numeric(df['YEAR'], errors='coerce').astype('Int64')
+    df['MONTH'] = pd.to_numeric(df['MONTH'], errors='coerce').astype('Int64')
+
+    # Item Code is an identifier, so it can be an integer.
+    df['ITEM CODE'] = pd.to_numeric(df['ITEM CODE'], errors='coerce').astype('Int64')
+
+    # Supplier, Item Description, and Item Type are text/categorical.
+    # The 'string' type in pandas is more memory-efficient than 'object'
+    df['SUPPLIER'] = df['SUPPLIER'].astype('string')
+    df['ITEM DESCRIPTION'] = df['ITEM DESCRIPTION'].astype('string')
+    df['ITEM TYPE'] = df['ITEM TYPE'].astype('string')
+    return df
+
+
+@track()
+def clean_sales_file(input_path, output_path, export_path=None):
+    """
+    Loads the whole CSV into memory, cleans it and saves it (the original mode).
+
+    Args:
+        input_path (str): The raw sales CSV.
+        output_path (str): Where the cleaned data is written ('.arrow' or '.csv').
+        export_path (str): Optional CSV copy of the cleaned data.
+
+    Returns:
+        pandas.DataFrame: The cleaned data.
+    """
+    df = pd.read_csv(input_path, dtype={col: str for col in text_columns})
+    df = clean_sales_frame(df)
+    if is_intermediate(output_path):
+        write_table(df, output_path)
+    else:
+        df.to_csv(output_path, index=False)
+    if export_path:
+        df.to_csv(export_path, index=False)
+    return df
+
+
+@track()
+def stream_clean_sales_file(input_path, output_path, chunk_size=CHUNK_SIZE, export_path=None):
+    """
+    Cleans the CSV chunk by chunk, appending each cleaned chunk to the output file.
+
+    Only one chunk is held in memory at a time, so peak memory depends on
+    chunk_size rather than on the size of the input file. An '.arrow' output gets
+    one record batch per chunk.
+
+    Args:
+        input_path (str): The raw sales CSV.
+        output_path (str): Where the cleaned data is written ('.arrow' or '.csv').
+        chunk_size (int): Number of rows read and cleaned per chunk.
+        export_path (str): Optional CSV copy of the cleaned data, appended chunk by chunk.
+
+    Returns:
+        tuple: (total rows written, the first cleaned chunk for previewing)
+    """
+    total_rows = 0
+    first_chunk = None
+    csv_paths = [path for path in (output_path, export_path) if path and not is_intermediate(path)]
+    writer = TableWriter(output_path) if is_intermediate(output_path) else None
+    reader = pd.read_csv(input_path, chunksize=chunk_size, dtype={col: str for col in text_columns})
+    try:
+        for i, chunk in enumerate(reader):
+            chunk = clean_sales_frame(chunk)
+            if writer is not None:
+                writer.write(chunk)
+            for path in csv_paths:
+                # The header is written once, with the first chunk; later chunks are appended
+                chunk.to_csv(path, index=False, mode='w' if i == 0 else 'a', header=(i == 0))
+            total_rows += len(chunk)
+            if first_chunk is None:
+                first_chunk = chunk.head()
+            print(f"Cleaned chunk {i + 1} ({total_rows} rows so far)")
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+    if writer is not None:
+        writer.close()
+    return total_rows, first_chunk
+
+
+if __name__ == "__main__":
+    # ----------------------------------------------------
+    # STEP 1: Load, clean and save the dataset
+    # ----------------------------------------------------
+    try:
+        if STREAMING_MODE:
+            total_rows, preview = stream_clean_sales_file(input_file_name, cleaned_file_name, CHUNK_SIZE, export_file_name)
+        else:
+            df = clean_sales_file(input_file_name, cleaned_file_name, export_file_name)
+            total_rows, preview = len(df), df.head()
+    except FileNotFoundError:
+        print("Error: The file was not found. Please make sure the CSV file is in the same directory as this script.")
+        exit()
 
-print(f"Data cleaning complete! The cleaned data has been saved to: {cleaned_file_name}")
+    # ----------------------------------------------------
+    # STEP 4: Confirm where the cleaned data was saved
+    # ----------------------------------------------------
+    print(f"Data cleaning complete! The cleaned data ({total_rows} rows) has been saved to: {cleaned_file_name}")
+    if export_file_name:
+        print(f"CSV copy for delivery: {export_file_name}")
 
-# Display the first few rows of the cleaned data for confirmation
-print("\nFirst 5 rows of the cleaned data:")
-print(df.head())
+    # Display the first few rows of the cleaned data for confirmation
+    print("\nFirst 5 rows of the cleaned data:")
+    print(preview)
+    print_summary()
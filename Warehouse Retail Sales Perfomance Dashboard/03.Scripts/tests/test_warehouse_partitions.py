@@ -0,0 +1,65 @@
+import pandas.testing as tm
+
+from warehouse_partitions import SUMMARY_DIMENSIONS, load_manifest, refresh_partitions, summarize_partitions
+
+HEADER = 'YEAR,MONTH,SUPPLIER,ITEM CODE,ITEM DESCRIPTION,ITEM TYPE,RETAIL SALES,RETAIL TRANSFERS,WAREHOUSE SALES\n'
+# Enough rows on both sides of 2018/12 that the restated row is far from the start and
+# the end of the file
+ROWS_2018_11 = [f'2018,11,BEER CO,{code},PALE ALE,BEER,1.00,0.00,2.00\n' for code in range(3000)]
+ROWS_2018_12 = [
+    '2018,12,ACME WINES,100,RED BLEND,WINE,10.50,1.00,4.00\n',
+    '2018,12,BEER CO,200,LAGER,BEER,$7.25,0.00,12.00\n',
+]
+ROWS_2019_1 = [f'2019,1,ACME WINES,{code},RED BLEND,WINE,9.00,2.00,3.00\n' for code in range(3000)]
+ROWS_2020_12 = [
+    '2020,12,BEER CO,200,LAGER,BEER,5.00,1.00,8.00\n',
+    '2020,12,ACME WINES,101,WHITE BLEND,WINE,3.75,0.00,1.00\n',
+]
+
+
+def _write(path, rows):
+    path.write_text(HEADER + ''.join(rows))
+
+
+def _assert_same_as_full_refresh(source, partition_dir, tmp_path):
+    reference_dir = str(tmp_path / 'reference')
+    refresh_partitions(str(source), reference_dir, chunk_size=1000)
+    for dimension in SUMMARY_DIMENSIONS:
+        tm.assert_frame_equal(summarize_partitions(partition_dir, dimension),
+                              summarize_partitions(reference_dir, dimension))
+    assert load_manifest(partition_dir)['partitions'].keys() == load_manifest(reference_dir)['partitions'].keys()
+    for label, entry in load_manifest(reference_dir)['partitions'].items():
+        assert load_manifest(partition_dir)['partitions'][label]['checksum'] == entry['checksum']
+
+
+def test_append_only_cleans_the_new_period(tmp_path):
+    source = tmp_path / 'sales.csv'
+    partition_dir = str(tmp_path / 'partitions')
+    _write(source, ROWS_2018_11 + ROWS_2018_12 + ROWS_2019_1)
+    assert refresh_partitions(str(source), partition_dir, chunk_size=1000)['mode'] == 'full'
+
+    _write(source, ROWS_2018_11 + ROWS_2018_12 + ROWS_2019_1 + ROWS_2020_12)
+    result = refresh_partitions(str(source), partition_dir, chunk_size=1000)
+
+    assert result['mode'] == 'append'
+    assert result['cleaned'] == ['YEAR=2020/MONTH=12']
+    _assert_same_as_full_refresh(source, partition_dir, tmp_path)
+
+
+def test_restated_row_before_an_append_is_cleaned_again(tmp_path):
+    source = tmp_path / 'sales.csv'
+    partition_dir = str(tmp_path / 'partitions')
+    _write(source, ROWS_2018_11 + ROWS_2018_12 + ROWS_2019_1)
+    refresh_partitions(str(source), partition_dir, chunk_size=1000)
+
+    # Same length, so only a full hash of the old content can tell that it changed
+    restated = [ROWS_2018_12[0].replace('10.50', '11.50')] + ROWS_2018_12[1:]
+    _write(source, ROWS_2018_11 + restated + ROWS_2019_1 + ROWS_2020_12)
+    result = refresh_partitions(str(source), partition_dir, chunk_size=1000)
+
+    assert result['mode'] == 'full'
+    assert result['cleaned'] == ['YEAR=2018/MONTH=12', 'YEAR=2020/MONTH=12']
+    assert result['unchanged'] == ['YEAR=2018/MONTH=11', 'YEAR=2019/MONTH=1']
+    supplier = summarize_partitions(partition_dir, 'supplier').set_index('SUPPLIER')
+    assert supplier.loc['ACME WINES', 'RETAIL SALES'] == 11.50 + 3000 * 9.00 + 3.75
+    _assert_same_as_full_refresh(source, partition_dir, tmp_path)
@@ -0,0 +1,502 @@
+import pandas as pd
+import numpy as np
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+from pipeline_utils import TableWriter, iter_frames, print_summary, read_table, track, write_table
+from WarehouseCleaning import CHUNK_SIZE, clean_sales_frame, input_file_name, numeric_columns, text_columns
+
+# =============================================
+# INCREMENTAL, PARTITIONED CLEANING BY YEAR/MONTH
+# =============================================
+# The extract grows by whole YEAR/MONTH periods, so the cleaned data is kept as one
+# partition per period instead of one file that is rewritten on every run:
+#
+#   cleaned_sales_partitions/
+#       _manifest.json
+#       YEAR=2017/MONTH=6/data.arrow              the cleaned rows of the period
+#       YEAR=2017/MONTH=6/summary_supplier.arrow  sales per SUPPLIER in the period
+#       YEAR=2017/MONTH=6/summary_item_type.arrow sales per ITEM TYPE in the period
+#
+# The manifest records, per partition, its row count and a checksum of its raw rows
+# (the sum of the 64-bit hashes of the rows, so it does not depend on chunking). A
+# refresh only cleans and writes the partitions that are new or whose checksum changed,
+# and deletes the partitions whose period left the extract:
+#   - unchanged file (same size, mtime and fingerprints): nothing is read;
+#   - rows appended to the end of the file (the sha256 of the previous file still matches
+#     its prefix, so no earlier row was restated): the prefix is only hashed, the new
+#     bytes are parsed, and the periods they belong to are extended;
+#   - anything else: the raw rows are hashed per period (no cleaning, no writing) and
+#     only the periods that differ are cleaned.
+# So a monthly refresh costs one month of data. The supplier and item-type summaries are
+# the sum of the per-partition summaries, without rescanning the cleaned rows.
+#
+# Rows are only compared as a set: reordering the rows of a period does not count as a change.
+
+PARTITION_DIR = 'cleaned_sales_partitions'
+MANIFEST_FILE = '_manifest.json'
+DATA_FILE = 'data.arrow'
+
+# Bump when clean_sales_frame changes, so every partition is cleaned again
+CLEANING_VERSION = 1
+
+PARTITION_KEYS = ['YEAR', 'MONTH']
+# Rows whose YEAR or MONTH is missing or not a number (the Hive convention)
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+# Summary name -> column it is grouped by
+SUMMARY_DIMENSIONS = {
+    'supplier': 'SUPPLIER',
+    'item_type': 'ITEM TYPE',
+}
+
+# Bytes hashed at the end of the file, to recognise an unchanged file without reading all of it
+FINGERPRINT_BYTES = 64 * 1024
+_HASH_BLOCK = 1024 * 1024
+_CHECKSUM_MASK = (1 << 64) - 1
+
+
+def partition_labels(year, month):
+    """
+    The partition of each row, e.g. 'YEAR=2017/MONTH=6', from the raw or cleaned YEAR and MONTH.
+
+    Args:
+        year (pandas.Series): The YEAR column.
+        month (pandas.Series): The MONTH column.
+
+    Returns:
+        pandas.Series: One label per row.
+    """
+    parts = []
+    for key, values in zip(PARTITION_KEYS, (year, month)):
+        numbers = pd.to_numeric(values, errors='coerce').astype('Int64')
+        parts.append(key + '=' + numbers.astype('string').fillna(NULL_PARTITION))
+    return (parts[0] + '/' + parts[1]).astype(object)
+
+
+def partition_path(output_dir, label, file_name=DATA_FILE):
+    """The path of a file of a partition."""
+    return os.path.join(output_dir, *label.split('/'), file_name)
+
+
+def _summary_path(output_dir, label, dimension):
+    return partition_path(output_dir, label, f'summary_{dimension}.arrow')
+
+
+# ----------------------------------------------------
+# Source file: reading from an offset and recognising appends
+# ----------------------------------------------------
+
+def _hash_range(file_path, start, end, digest=None):
+    """Feeds bytes [start, end) of the file to a sha256 digest (a new one when None) and returns the digest."""
+    digest = hashlib.sha256() if digest is None else digest
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        remaining = max(end - start, 0)
+        while remaining:
+            block = f.read(min(remaining, _HASH_BLOCK))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest
+
+
+def source_fingerprint(file_path, digest=None):
+    """
+    Size, mtime and content hashes of the raw extract.
+
+    sha256 covers the whole file, so a later run can check that this content is still,
+    byte for byte, the start of a grown file. tail_sha256 covers the last
+    FINGERPRINT_BYTES and is enough, with the size and mtime, to recognise an unchanged file.
+
+    Args:
+        file_path (str): The raw sales CSV.
+        digest: A sha256 digest already fed with the whole file, to avoid reading it again.
+
+    Returns:
+        dict: The fingerprint.
+    """
+    stat = os.stat(file_path)
+    size = stat.st_size
+    if digest is None:
+        digest = _hash_range(file_path, 0, size)
+    return {
+        'path': os.path.abspath(file_path),
+        'size': size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': digest.hexdigest(),
+        'tail_sha256': _hash_range(file_path, max(size - FINGERPRINT_BYTES, 0), size).hexdigest(),
+    }
+
+
+def _is_unchanged(file_path, previous):
+    stat = os.stat(file_path)
+    if stat.st_size != previous.get('size') or stat.st_mtime_ns != previous.get('mtime_ns'):
+        return False
+    tail = _hash_range(file_path, max(stat.st_size - FINGERPRINT_BYTES, 0), stat.st_size)
+    return tail.hexdigest() == previous.get('tail_sha256')
+
+
+def _appended_prefix(file_path, previous):
+    """
+    Checks whether the file is the previous file with whole rows appended.
+
+    The first previous['size'] bytes are hashed in full, so a row restated anywhere in
+    the old content makes this a full refresh.
+
+    Returns:
+        The sha256 digest of the previous content when it is an unchanged prefix (it can be
+        fed the appended bytes to fingerprint the new file), else None.
+    """
+    size = previous.get('size', 0)
+    if not size or 'sha256' not in previous or os.path.getsize(file_path) <= size:
+        return None
+    with open(file_path, 'rb') as f:
+        f.seek(size - 1)
+        if f.read(1) != b'\n':
+            return None # The old content did not end on a whole line
+    digest = _hash_range(file_path, 0, size)
+    return digest if digest.hexdigest() == previous['sha256'] else None
+
+
+def read_raw_chunks(file_path, chunk_size, offset=0, columns=None, dtype=None):
+    """
+    Yields the raw CSV in chunks, starting at a byte offset.
+
+    Args:
+        file_path (str): The raw sales CSV.
+        chunk_size (int): Rows per chunk.
+        offset (int): Byte offset of the first row to read; 0 reads the whole file (with its header).
+        columns (list): The column names, required when offset > 0 (there is no header to read them from).
+        dtype: Passed to pd.read_csv.
+
+    Yields:
+        pandas.DataFrame: Chunks of raw rows.
+    """
+    if not offset:
+        yield from pd.read_csv(file_path, chunksize=chunk_size, dtype=dtype)
+        return
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        yield from pd.read_csv(f, chunksize=chunk_size, dtype=dtype, header=None, names=columns)
+
+
+# ----------------------------------------------------
+# Raw checksums per partition
+# ----------------------------------------------------
+
+@track()
+def partition_checksums(file_path, chunk_size=CHUNK_SIZE, offset=0, columns=None):
+    """
+    Hashes the raw rows of the extract per YEAR/MONTH partition, without cleaning them.
+
+    Every row is read as text and hashed with pandas' 64-bit row hash; the checksum of a
+    partition is the sum of its row hashes modulo 2**64, so it is the same for any chunk
+    size and can be extended by adding the checksum of appended rows.
+
+    Args:
+        file_path (str): The raw sales CSV.
+        chunk_size (int): Rows per chunk.
+        offset (int): Byte offset to start at (see read_raw_chunks).
+        columns (list): The column names when offset > 0.
+
+    Returns:
+        dict: label -> {'rows': int, 'checksum': int}
+    """
+    checksums = {}
+    for chunk in read_raw_chunks(file_path, chunk_size, offset, columns, dtype=str):
+        labels = partition_labels(chunk['YEAR'], chunk['MONTH'])
+        hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+        codes, uniques = pd.factorize(labels)
+        sums = np.zeros(len(uniques), dtype=np.uint64)
+        np.add.at(sums, codes, hashes) # uint64 addition wraps, i.e. is modulo 2**64
+        counts = np.bincount(codes, minlength=len(uniques))
+        for label, rows, checksum in zip(uniques, counts, sums):
+            entry = checksums.setdefault(label, {'rows': 0, 'checksum': 0})
+            entry['rows'] += int(rows)
+            entry['checksum'] = (entry['checksum'] + int(checksum)) & _CHECKSUM_MASK
+    return checksums
+
+
+# ----------------------------------------------------
+# Cleaning and writing partitions
+# ----------------------------------------------------
+
+def summarize_frame(df, column):
+    """Rows and summed sales of a frame of cleaned rows, per value of column (missing values kept as a group)."""
+    grouped = df.groupby(column, dropna=False, sort=False)
+    summary = grouped[numeric_columns].sum()
+    summary.insert(0, 'ROWS', grouped.size())
+    return summary
+
+
+def _add_summary(current, partial):
+    return partial if current is None else current.add(partial, fill_value=0)
+
+
+class _PartitionOutput:
+    """The data writer and running summaries of one partition being written."""
+
+    def __init__(self, output_dir, label):
+        self.output_dir = output_dir
+        self.label = label
+        self.writer = TableWriter(partition_path(output_dir, label))
+        self.summaries = {dimension: None for dimension in SUMMARY_DIMENSIONS}
+
+    def write(self, frame):
+        self.writer.write(frame)
+        for dimension, column in SUMMARY_DIMENSIONS.items():
+            self.summaries[dimension] = _add_summary(self.summaries[dimension], summarize_frame(frame, column))
+
+    def close(self):
+        self.writer.close()
+        for dimension, summary in self.summaries.items():
+            summary = summary.astype({'ROWS': np.int64}).reset_index()
+            write_table(summary, _summary_path(self.output_dir, self.label, dimension))
+
+
+@track()
+def clean_partitions(file_path, output_dir, labels, chunk_size=CHUNK_SIZE, offset=0, columns=None, extend=()):
+    """
+    Cleans the rows of the given partitions and writes each partition with its summaries.
+
+    Rows of other partitions are skipped before cleaning. The chunks are read with the
+    same types as the streaming cleaner, so a partition holds exactly the rows that
+    stream_clean_sales_file would write for its period.
+
+    Args:
+        file_path (str): The raw sales CSV.
+        output_dir (str): The partition directory.
+        labels (iterable): The partitions to write.
+        chunk_size (int): Rows per chunk.
+        offset (int): Byte offset to start at (see read_raw_chunks).
+        columns (list): The column names when offset > 0.
+        extend (iterable): Partitions whose existing rows are kept, with the rows read here appended.
+
+    Returns:
+        dict: label -> rows written.
+    """
+    labels = set(labels)
+    extend = set(extend)
+    outputs = {}
+
+    def output_for(label):
+        if label not in outputs:
+            output = _PartitionOutput(output_dir, label)
+            existing = partition_path(output_dir, label)
+            if label in extend and os.path.exists(existing):
+                for frame in iter_frames(existing):
+                    output.write(frame)
+            outputs[label] = output
+        return outputs[label]
+
+    dtype = {col: str for col in text_columns}
+    try:
+        for chunk in read_raw_chunks(file_path, chunk_size, offset, columns, dtype=dtype):
+            chunk_labels = partition_labels(chunk['YEAR'], chunk['MONTH'])
+            keep = chunk_labels.isin(labels).to_numpy()
+            if not keep.any():
+                continue
+            cleaned = clean_sales_frame(chunk[keep].copy())
+            for label, frame in cleaned.groupby(chunk_labels[keep].to_numpy(), sort=False):
+                output_for(label).write(frame)
+    except BaseException:
+        for output in outputs.values():
+            output.writer.abort()
+        raise
+    for output in outputs.values():
+        output.close()
+    return {label: output.writer.rows for label, output in outputs.items()}
+
+
+# ----------------------------------------------------
+# Manifest and refresh
+# ----------------------------------------------------
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def _partitions_present(output_dir, partitions):
+    return all(
+        os.path.exists(partition_path(output_dir, label))
+        and all(os.path.exists(_summary_path(output_dir, label, dimension)) for dimension in SUMMARY_DIMENSIONS)
+        for label in partitions
+    )
+
+
+@track()
+def refresh_partitions(input_path, output_dir=PARTITION_DIR, chunk_size=CHUNK_SIZE, force=False):
+    """
+    Brings the partitioned cleaned data up to date with the raw extract.
+
+    Args:
+        input_path (str): The raw sales CSV.
+        output_dir (str): The partition directory (created if needed).
+        chunk_size (int): Rows per chunk.
+        force (bool): Clean every partition again, ignoring the manifest.
+
+    Returns:
+        dict: 'mode' ('unchanged', 'append' or 'full'), and the sorted 'cleaned',
+              'unchanged' and 'removed' partition labels.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    columns = list(pd.read_csv(input_path, nrows=0).columns)
+    known = manifest.get('partitions', {})
+    previous = manifest.get('source', {})
+    # Partitions are reused only when they were cleaned by the same code from the same layout
+    reusable = (not force and manifest.get('version') == CLEANING_VERSION
+                and manifest.get('columns') == columns and _partitions_present(output_dir, known))
+    if not reusable:
+        known = {}
+
+    if known and _is_unchanged(input_path, previous):
+        return {'mode': 'unchanged', 'cleaned': [], 'unchanged': sorted(known), 'removed': []}
+
+    removed = []
+    prefix = _appended_prefix(input_path, previous) if known else None
+    if prefix is not None:
+        # Only the appended rows are read; the periods they fall in are new or extended
+        mode = 'append'
+        scanned = partition_checksums(input_path, chunk_size, previous['size'], columns)
+        extend = [label for label in scanned if label in known]
+        written = clean_partitions(input_path, output_dir, scanned, chunk_size, previous['size'], columns, extend)
+        checksums = {label: dict(entry) for label, entry in known.items()}
+        for label, entry in scanned.items():
+            old = checksums.get(label, {'rows': 0, 'checksum': '0'})
+            checksums[label] = {
+                'rows': old['rows'] + entry['rows'],
+                'checksum': (int(old['checksum'], 16) + entry['checksum']) & _CHECKSUM_MASK,
+            }
+        cleaned = sorted(scanned)
+        source = source_fingerprint(input_path, _hash_range(input_path, previous['size'], os.path.getsize(input_path), prefix))
+    else:
+        mode = 'full'
+        scanned = partition_checksums(input_path, chunk_size)
+        checksums = scanned
+        cleaned = sorted(label for label, entry in scanned.items()
+                         if label not in known
+                         or known[label]['rows'] != entry['rows']
+                         or int(known[label]['checksum'], 16) != entry['checksum'])
+        written = clean_partitions(input_path, output_dir, cleaned, chunk_size) if cleaned else {}
+        removed = sorted(set(known) - set(scanned))
+        for label in removed:
+            shutil.rmtree(os.path.dirname(partition_path(output_dir, label)), ignore_errors=True)
+        source = source_fingerprint(input_path)
+
+    now = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    partitions = {}
+    for label in sorted(checksums):
+        entry = checksums[label]
+        checksum = entry['checksum'] if isinstance(entry['checksum'], int) else int(entry['checksum'], 16)
+        partitions[label] = {
+            'rows': entry['rows'],
+            'checksum': f'{checksum:016x}',
+            'cleaned_at': now if label in written else known[label]['cleaned_at'],
+        }
+    _save_manifest(output_dir, {
+        'version': CLEANING_VERSION,
+        'columns': columns,
+        'source': source,
+        'partitions': partitions,
+    })
+    return {
+        'mode': mode,
+        'cleaned': cleaned,
+        'unchanged': sorted(set(partitions) - set(cleaned)),
+        'removed': removed,
+    }
+
+
+# ----------------------------------------------------
+# Reading partitions and summaries
+# ----------------------------------------------------
+
+def _select(output_dir, partitions):
+    known = load_manifest(output_dir).get('partitions', {})
+    return sorted(known) if partitions is None else [label for label in partitions if label in known]
+
+
+def read_partitions(output_dir=PARTITION_DIR, partitions=None, columns=None):
+    """
+    Reads cleaned rows back from the partitions.
+
+    Args:
+        output_dir (str): The partition directory.
+        partitions (list): Labels to read (e.g. ['YEAR=2020/MONTH=1']); all when None.
+        columns (list): Optional subset of columns.
+
+    Returns:
+        pandas.DataFrame: The cleaned rows, partition by partition.
+    """
+    frames = [read_table(partition_path(output_dir, label), columns) for label in _select(output_dir, partitions)]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
+
+
+def summarize_partitions(output_dir=PARTITION_DIR, dimension='supplier', partitions=None):
+    """
+    Rows and summed sales per supplier or item type, added up from the per-partition summaries.
+
+    Args:
+        output_dir (str): The partition directory.
+        dimension (str): A key of SUMMARY_DIMENSIONS ('supplier' or 'item_type').
+        partitions (list): Labels to include; all when None.
+
+    Returns:
+        pandas.DataFrame: One row per value, by RETAIL SALES descending.
+    """
+    column = SUMMARY_DIMENSIONS[dimension]
+    total = None
+    for label in _select(output_dir, partitions):
+        summary = read_table(_summary_path(output_dir, label, dimension)).set_index(column)
+        total = _add_summary(total, summary)
+    if total is None:
+        return pd.DataFrame(columns=[column, 'ROWS'] + numeric_columns)
+    total = total.astype({'ROWS': np.int64})
+    return total.sort_values('RETAIL SALES', ascending=False).reset_index()
+
+
+# =============================================
+# MAIN EXECUTION
+# =============================================
+if __name__ == "__main__":
+    # Configuration
+    partition_dir = PARTITION_DIR
+    force_full_refresh = False # True cleans every partition again
+    summary_files = {'supplier': 'supplier_summary.csv', 'item_type': 'item_type_summary.csv'} # None to only print
+
+    try:
+        result = refresh_partitions(input_file_name, partition_dir, CHUNK_SIZE, force_full_refresh)
+    except FileNotFoundError:
+        print("Error: The file was not found. Please make sure the CSV file is in the same directory as this script.")
+        exit()
+
+    print(f"Refresh mode: {result['mode']}")
+    print(f"Cleaned {len(result['cleaned'])} partition(s): {', '.join(result['cleaned']) or '-'}")
+    print(f"Unchanged: {len(result['unchanged'])}, removed: {len(result['removed'])} {result['removed'] or ''}")
+
+    for dimension in SUMMARY_DIMENSIONS:
+        summary = summarize_partitions(partition_dir, dimension)
+        print(f"\nTop 10 by {SUMMARY_DIMENSIONS[dimension]}:")
+        print(summary.head(10))
+        if summary_files:
+            summary.to_csv(summary_files[dimension], index=False)
+            print(f"Saved to {summary_files[dimension]}")
+    print_summary()
@@ -0,0 +1,436 @@
+import pandas as pd
+import numpy as np
+import os
+from pipeline_utils.excel_writer import write_excel
+
+# =============================================
+# SYNTHETIC DATASET GENERATORS
+# =============================================
+# Deterministic stand-ins for the real input files, with the same columns and the
+# same quirks the cleaning scripts have to deal with:
+#   online_retail  - OnlineRetail.xlsx: alphanumeric and non-product StockCodes,
+#                    cancelled 'C' invoices, missing CustomerIDs, zero prices, duplicates
+#   car_prices     - car_prices.csv: mixed saledate layouts (JS-style with GMT offsets,
+#                    ISO, junk), missing mmr/sellingprice/transmission
+#   warehouse      - Warehouse_and_Retail_Sales.csv: currency-laden numeric strings
+#   supply_chain   - DataCoSupplyChainDataset.csv: latin1 text, empty/sparse columns,
+#                    duplicated ID columns, 'm/d/yyyy h:mm' dates
+#   paysim         - Fraud.csv: the PaySim transaction log, ordered by step
+#
+# Rows are generated in fixed-size chunks, each with its own seeded random generator,
+# so a file only depends on (dataset, rows, seed) and 10M-row files never have to be
+# held in memory at once.
+
+CHUNK_ROWS = 250_000
+EXCEL_MAX_ROWS = 1_048_575 # One row of the sheet is the header
+DUPLICATE_SHARE = 0.01     # Share of rows that repeat an earlier row of the same chunk
+
+
+def _add_duplicates(df, rng, share=DUPLICATE_SHARE):
+    # Overwrite a few rows with exact copies of earlier rows
+    n = int(len(df) * share)
+    if n == 0 or len(df) < 2:
+        return df
+    targets = rng.choice(np.arange(1, len(df)), size=n, replace=False)
+    take = np.arange(len(df))
+    take[targets] = (rng.random(n) * targets).astype(np.int64)
+    return df.iloc[take].reset_index(drop=True)
+
+
+def _chunks(n_rows, seed):
+    """Yields (chunk number, first row, rows in chunk, random generator) for each chunk."""
+    for chunk_no, start in enumerate(range(0, n_rows, CHUNK_ROWS)):
+        yield chunk_no, start, min(CHUNK_ROWS, n_rows - start), np.random.default_rng([seed, chunk_no])
+
+
+# --- Online Retail ---
+COUNTRIES = ['United Kingdom', 'Germany', 'France', 'EIRE', 'Spain', 'Netherlands', 'Belgium',
+             'Switzerland', 'Portugal', 'Australia', 'Norway', 'Italy', 'Channel Islands', 'Finland']
+COUNTRY_WEIGHTS = np.array([0.89, 0.02, 0.02, 0.015, 0.01, 0.01, 0.007, 0.006, 0.005, 0.004, 0.004, 0.004, 0.003, 0.002])
+NON_PRODUCT_CODES = ['POST', 'D', 'M', 'C2', 'DOT', 'BANK CHARGES', 'AMAZONFEE', 'CRUK', 'PADS']
+WORDS = ['WHITE', 'HANGING', 'HEART', 'T-LIGHT', 'HOLDER', 'METAL', 'LANTERN', 'CREAM', 'CUPID', 'HEARTS',
+         'COAT', 'HANGER', 'KNITTED', 'UNION', 'FLAG', 'HOT', 'WATER', 'BOTTLE', 'RED', 'WOOLLY', 'SET',
+         'OF', '6', 'VINTAGE', 'CHRISTMAS', 'BUNTING', 'GLASS', 'STAR', 'FROSTED', 'JUMBO', 'BAG']
+
+
+def _retail_catalog(n_products=4000, seed=0):
+    rng = np.random.default_rng([seed, 10**6])
+    base = rng.choice(np.arange(10000, 90000), size=n_products, replace=False).astype(str)
+    suffix = np.where(rng.random(n_products) < 0.12, rng.choice(list('ABCDEFGLNPSW'), n_products), '')
+    codes = np.char.add(base, suffix).astype(object)
+    # Excel stores the all-digit codes as numbers, so the column mixes ints and strings
+    codes = np.array([int(code) if code.isdigit() else code for code in codes], dtype=object)
+    n_special = len(NON_PRODUCT_CODES)
+    codes[:n_special] = NON_PRODUCT_CODES
+    descriptions = [' '.join(rng.choice(WORDS, size=rng.integers(2, 6))) for _ in range(n_products)]
+    prices = np.round(rng.lognormal(1.0, 0.8, n_products), 2)
+    return codes, np.array(descriptions, dtype=object), prices
+
+
+def generate_online_retail(n_rows, seed=42):
+    """
+    Yields chunks shaped like OnlineRetail.xlsx.
+
+    Args:
+        n_rows (int): Total rows to generate.
+        seed (int): Seed; the same seed always gives the same rows.
+
+    Yields:
+        pandas.DataFrame: InvoiceNo, StockCode, Description, Quantity, InvoiceDate,
+                          UnitPrice, CustomerID, Country.
+    """
+    codes, descriptions, prices = _retail_catalog(seed=seed)
+    popularity = np.random.default_rng([seed, 10**6 + 1]).pareto(1.2, len(codes)) + 0.01
+    product_weights = popularity / popularity.sum()
+    start_date = pd.Timestamp('2010-12-01 08:26:00')
+    span_minutes = int((pd.Timestamp('2011-12-09 12:50:00') - start_date).total_seconds() // 60)
+    lines_per_invoice = 20
+
+    # Everything shared by the lines of an invoice is drawn once per invoice
+    n_invoices = n_rows // lines_per_invoice + 1
+    invoice_cancelled = np.random.default_rng([seed, 7]).random(n_invoices) < 0.02
+    invoice_customer = np.random.default_rng([seed, 8]).integers(12346, 18288, n_invoices).astype(float)
+    invoice_customer[np.random.default_rng([seed, 9]).random(n_invoices) < 0.25] = np.nan
+    invoice_country = np.random.default_rng([seed, 11]).choice(len(COUNTRIES), n_invoices, p=COUNTRY_WEIGHTS)
+
+    for _, start, n, rng in _chunks(n_rows, seed):
+        invoice = np.arange(start, start + n) // lines_per_invoice
+        cancelled = invoice_cancelled[invoice]
+        product = rng.choice(len(codes), size=n, p=product_weights)
+        quantity = rng.geometric(0.25, n).astype(np.int64)
+        quantity[cancelled] *= -1
+        unit_price = prices[product].copy()
+        unit_price[rng.random(n) < 0.003] = 0.0
+        # Invoice dates move forward with the invoice number (all lines of an invoice share it)
+        minutes = invoice * span_minutes // n_invoices
+        invoice_no = (536365 + invoice).astype(str).astype(object)
+
+        df = pd.DataFrame({
+            'InvoiceNo': np.where(cancelled, 'C' + invoice_no, invoice_no),
+            'StockCode': codes[product],
+            'Description': descriptions[product],
+            'Quantity': quantity,
+            'InvoiceDate': start_date + pd.to_timedelta(minutes, unit='m'),
+            'UnitPrice': unit_price,
+            'CustomerID': invoice_customer[invoice],
+            'Country': np.array(COUNTRIES, dtype=object)[invoice_country[invoice]],
+        })
+        yield _add_duplicates(df, rng)
+
+
+# --- Vehicle sales (car_prices.csv) ---
+MAKES = {'Ford': ['Fusion', 'F-150', 'Escape', 'Focus'], 'Chevrolet': ['Malibu', 'Impala', 'Silverado 1500'],
+         'Nissan': ['Altima', 'Sentra', 'Rogue'], 'Toyota': ['Camry', 'Corolla', 'Prius'],
+         'BMW': ['3 Series', '5 Series', 'X5'], 'Honda': ['Accord', 'Civic', 'CR-V'], 'Kia': ['Sorento', 'Optima']}
+STATES = ['fl', 'ca', 'pa', 'tx', 'ga', 'nj', 'il', 'nc', 'oh', 'tn', 'mo', 'mi', 'nv', 'va', 'md', 'wi']
+BODIES = ['Sedan', 'SUV', 'sedan', 'suv', 'Crew Cab', 'Hatchback', 'Minivan', 'Coupe', 'Wagon']
+COLORS = ['black', 'white', 'silver', 'gray', 'blue', 'red', '—', 'gold', 'green']
+
+
+def _js_saledates(timestamps):
+    # "Tue Dec 16 2014 12:30:00 GMT-0800 (PST)", daylight saving roughly March to October
+    summer = timestamps.month.isin(range(3, 11))
+    offset = np.where(summer, 'GMT-0700 (PDT)', 'GMT-0800 (PST)')
+    return timestamps.strftime('%a %b %d %Y %H:%M:%S').to_numpy(dtype=object) + ' ' + offset
+
+
+def generate_car_prices(n_rows, seed=42):
+    """
+    Yields chunks shaped like car_prices.csv, with the mixed saledate layouts.
+
+    Args:
+        n_rows (int): Total rows to generate.
+        seed (int): Seed; the same seed always gives the same rows.
+
+    Yields:
+        pandas.DataFrame: The 16 car_prices.csv columns.
+    """
+    makes = np.array(list(MAKES), dtype=object)
+    # Auctions run at a limited set of times, so many sales share a saledate string
+    auction_times = pd.date_range('2014-01-01 09:30', '2015-07-21 17:30', freq='h')
+    auction_times = auction_times[(auction_times.hour >= 9) & (auction_times.hour <= 17)]
+
+    for _, start, n, rng in _chunks(n_rows, seed):
+        make = makes[rng.integers(0, len(makes), n)]
+        model = np.array([MAKES[m][i % len(MAKES[m])] for m, i in zip(make, rng.integers(0, 12, n))], dtype=object)
+        year = rng.integers(1990, 2016, n)
+        mmr = np.round(np.maximum(200, 30000 - (2015 - year) * 1400 + rng.normal(0, 4000, n)), -1)
+        selling = np.round(np.maximum(100, mmr * rng.normal(1.0, 0.12, n)), -2)
+        times = auction_times[rng.integers(0, len(auction_times), n)]
+
+        layout = rng.random(n)
+        saledate = _js_saledates(times)
+        iso_datetime = layout > 0.95
+        saledate[iso_datetime] = times[iso_datetime].strftime('%Y-%m-%d %H:%M:%S')
+        iso_date = layout > 0.98
+        saledate[iso_date] = times[iso_date].strftime('%Y-%m-%d')
+        junk = layout > 0.993
+        saledate[junk] = np.round(rng.uniform(1, 50, junk.sum()), 1).astype(str) # Shifted-column rows in the real file
+        saledate[layout > 0.997] = None
+
+        df = pd.DataFrame({
+            'year': year,
+            'make': make,
+            'model': model,
+            'trim': rng.choice(['SE', 'LX', 'Base', 'S', 'Limited', 'Sport'], n),
+            'body': rng.choice(BODIES, n),
+            'transmission': np.where(rng.random(n) < 0.1, None, np.where(rng.random(n) < 0.97, 'automatic', 'manual')),
+            'vin': [f'{v:017x}' for v in rng.integers(0, 2**63, n)],
+            'state': rng.choice(STATES, n),
+            'condition': np.where(rng.random(n) < 0.02, np.nan, rng.integers(1, 50, n).astype(float)),
+            'odometer': np.round(rng.exponential(60000, n)),
+            'color': rng.choice(COLORS, n),
+            'interior': rng.choice(['black', 'gray', 'beige', 'tan', '—'], n),
+            'seller': rng.choice(['nissan-infiniti lt', 'the hertz corporation', 'santander consumer',
+                                  'avis corporation', 'kia motors america  inc'], n),
+            'mmr': np.where(rng.random(n) < 0.002, np.nan, mmr),
+            'sellingprice': np.where(rng.random(n) < 0.002, np.nan, selling),
+            'saledate': saledate,
+        })
+        yield _add_duplicates(df, rng)
+
+
+# --- Warehouse and retail sales ---
+ITEM_TYPES = ['WINE', 'LIQUOR', 'BEER', 'KEGS', 'NON-ALCOHOL', 'STR_SUPPLIES', 'REF', 'DUNNAGE']
+SUPPLIERS = ['REPUBLIC NATIONAL DISTRIBUTING CO', 'E & J GALLO WINERY', 'DIAGEO NORTH AMERICA INC',
+             'CONSTELLATION BRANDS', 'ANHEUSER BUSCH INC', 'JIM BEAM BRANDS CO', 'BACARDI USA INC']
+
+
+def _currency_strings(values, rng):
+    # Most values are plain numbers; the rest carry currency signs, thousands separators or units
+    text = np.char.mod('%.2f', values).astype(object)
+    decorated = rng.random(len(values))
+    text[decorated > 0.85] = np.char.add('$', np.char.mod('%.2f', values[decorated > 0.85]))
+    thousands = decorated > 0.93
+    text[thousands] = [f'{v:,.2f}' for v in values[thousands]]
+    text[decorated > 0.97] = np.char.add(np.char.mod('%.2f', values[decorated > 0.97]), ' units')
+    text[decorated > 0.995] = None
+    return text
+
+
+def generate_warehouse_sales(n_rows, seed=42):
+    """
+    Yields chunks shaped like Warehouse_and_Retail_Sales.csv, with currency-laden numeric strings.
+
+    Args:
+        n_rows (int): Total rows to generate.
+        seed (int): Seed; the same seed always gives the same rows.
+
+    Yields:
+        pandas.DataFrame: YEAR, MONTH, SUPPLIER, ITEM CODE, ITEM DESCRIPTION, ITEM TYPE,
+                          RETAIL SALES, RETAIL TRANSFERS, WAREHOUSE SALES.
+    """
+    for _, start, n, rng in _chunks(n_rows, seed):
+        # Rows are grouped by period, like the monthly extracts the real file is built from
+        period = (np.arange(start, start + n) * 48) // max(n_rows, 1)
+        item = rng.integers(100000, 400000, n)
+        df = pd.DataFrame({
+            'YEAR': 2017 + period // 12,
+            'MONTH': period % 12 + 1,
+            'SUPPLIER': np.array(SUPPLIERS, dtype=object)[item % len(SUPPLIERS)],
+            'ITEM CODE': item,
+            'ITEM DESCRIPTION': np.char.add('ITEM ', item.astype(str)).astype(object),
+            'ITEM TYPE': np.array(ITEM_TYPES, dtype=object)[item % len(ITEM_TYPES)],
+            'RETAIL SALES': _currency_strings(np.round(rng.exponential(15, n) * np.where(rng.random(n) < 0.02, -1, 1), 2), rng),
+            'RETAIL TRANSFERS': _currency_strings(np.round(rng.exponential(12, n), 2), rng),
+            'WAREHOUSE SALES': _currency_strings(np.round(rng.exponential(40, n), 2), rng),
+        })
+        yield _add_duplicates(df, rng)
+
+
+# --- DataCo supply chain ---
+CITIES = ['Caguas', 'Chicago', 'Los Angeles', 'São Paulo', 'Bogotá', 'México', 'Santo Domingo',
+          'Medellín', 'Zürich', 'Köln', 'Montréal', 'Besançon', 'Málaga', 'Tegucigalpa']
+MARKETS = ['Pacific Asia', 'USCA', 'Africa', 'Europe', 'LATAM']
+CATEGORIES = ['Sporting Goods', 'Cleats', "Men's Footwear", "Women's Apparel", 'Fishing', 'Camping & Hiking',
+              'Cardio Equipment', 'Water Sports', 'Indoor/Outdoor Games', 'Electronics']
+DELIVERY_STATUS = ['Advance shipping', 'Late delivery', 'Shipping on time', 'Shipping canceled']
+SHIPPING_MODES = ['Standard Class', 'First Class', 'Second Class', 'Same Day']
+ORDER_STATUS = ['COMPLETE', 'PENDING', 'CLOSED', 'PENDING_PAYMENT', 'CANCELED', 'PROCESSING',
+                'SUSPECTED_FRAUD', 'ON_HOLD', 'PAYMENT_REVIEW']
+
+
+def generate_supply_chain(n_rows, seed=42):
+    """
+    Yields chunks shaped like DataCoSupplyChainDataset.csv (write them with encoding='latin1').
+
+    Args:
+        n_rows (int): Total rows to generate.
+        seed (int): Seed; the same seed always gives the same rows.
+
+    Yields:
+        pandas.DataFrame: The 53 DataCo columns.
+    """
+    for _, start, n, rng in _chunks(n_rows, seed):
+        order_id = 1 + (np.arange(start, start + n) // 3)
+        customer = rng.integers(1, 20000, n)
+        category = rng.integers(0, len(CATEGORIES), n)
+        product = category * 100 + rng.integers(0, 40, n)
+        quantity = rng.integers(1, 6, n)
+        price = np.round(rng.lognormal(4, 0.8, n), 2)
+        discount_rate = rng.choice([0, 0.01, 0.02, 0.05, 0.1, 0.15, 0.2, 0.25], n)
+        sales = np.round(price * quantity, 2)
+        discount = np.round(sales * discount_rate, 2)
+        total = np.round(sales - discount, 2)
+        profit_ratio = np.round(rng.uniform(-0.75, 0.5, n), 2)
+        profit = np.round(total * profit_ratio, 2)
+        real_days = rng.integers(0, 7, n)
+        scheduled_days = rng.choice([0, 1, 2, 4], n)
+        order_date = pd.Timestamp('2015-01-01') + pd.to_timedelta(rng.integers(0, 3 * 365 * 24 * 60, n), unit='m')
+        ship_date = order_date + pd.to_timedelta(real_days, unit='D')
+        city = np.array(CITIES, dtype=object)[rng.integers(0, len(CITIES), n)]
+        # 'm/d/yyyy h:mm' without leading zeros, as in the real file
+        order_text = [f'{d.month}/{d.day}/{d.year} {d.hour}:{d.minute:02d}' for d in order_date]
+        ship_text = [f'{d.month}/{d.day}/{d.year} {d.hour}:{d.minute:02d}' for d in ship_date]
+
+        df = pd.DataFrame({
+            'Type': rng.choice(['DEBIT', 'TRANSFER', 'CASH', 'PAYMENT'], n),
+            'Days for shipping (real)': real_days,
+            'Days for shipment (scheduled)': scheduled_days,
+            'Benefit per order': profit,
+            'Sales per customer': total,
+            'Delivery Status': rng.choice(DELIVERY_STATUS, n),
+            'Late_delivery_risk': (real_days > scheduled_days).astype(int),
+            'Category Id': category + 2,
+            'Category Name': np.array(CATEGORIES, dtype=object)[category],
+            'Customer City': city,
+            'Customer Country': np.where(rng.random(n) < 0.6, 'EE. UU.', 'Puerto Rico'),
+            'Customer Email': 'XXXXXXXXX',
+            'Customer Fname': rng.choice(['Mary', 'José', 'Zoë', 'Renée', 'Ana', 'Björn'], n),
+            'Customer Id': customer,
+            'Customer Lname': rng.choice(['Smith', 'Muñoz', 'García', 'Öztürk', 'Hernández'], n),
+            'Customer Password': 'XXXXXXXXX',
+            'Customer Segment': rng.choice(['Consumer', 'Corporate', 'Home Office'], n),
+            'Customer State': rng.choice(['PR', 'CA', 'NY', 'TX', 'IL'], n),
+            'Customer Street': rng.choice(['5365 Noble Nectar Island', 'Calle Mayor 12', 'Rue de la Paix 3'], n),
+            'Customer Zipcode': np.where(rng.random(n) < 0.001, np.nan, rng.integers(603, 99999, n).astype(float)),
+            'Department Id': category % 7 + 2,
+            'Department Name': rng.choice(['Fitness', 'Apparel', 'Golf', 'Footwear', 'Outdoors', 'Fan Shop'], n),
+            'Latitude': np.round(rng.uniform(17, 49, n), 6),
+            'Longitude': np.round(rng.uniform(-123, -65, n), 6),
+            'Market': rng.choice(MARKETS, n),
+            'Order City': np.array(CITIES, dtype=object)[rng.integers(0, len(CITIES), n)],
+            'Order Country': rng.choice(['Estados Unidos', 'Francia', 'México', 'Alemania', 'Brasil'], n),
+            'Order Customer Id': customer,
+            'order date (DateOrders)': order_text,
+            'Order Id': order_id,
+            'Order Item Cardprod Id': product,
+            'Order Item Discount': discount,
+            'Order Item Discount Rate': discount_rate,
+            'Order Item Id': np.arange(start, start + n) + 1,
+            'Order Item Product Price': price,
+            'Order Item Profit Ratio': profit_ratio,
+            'Order Item Quantity': quantity,
+            'Sales': sales,
+            'Order Item Total': total,
+            'Order Profit Per Order': profit,
+            'Order Region': rng.choice(['Southeast Asia', 'South Asia', 'Oceania', 'Western Europe', 'Central America'], n),
+            'Order State': rng.choice(['Java Occidental', 'Île-de-France', 'Querétaro', 'São Paulo'], n),
+            'Order Status': rng.choice(ORDER_STATUS, n),
+            'Order Zipcode': np.where(rng.random(n) < 0.97, np.nan, rng.integers(1000, 99999, n).astype(float)),
+            'Product Card Id': product,
+            'Product Category Id': category + 2,
+            'Product Description': np.nan,
+            'Product Image': np.char.add('http://images.acmesports.sports/', product.astype(str)).astype(object),
+            'Product Name': np.char.add('Product ', product.astype(str)).astype(object),
+            'Product Price': price,
+            'Product Status': 0,
+            'shipping date (DateOrders)': ship_text,
+            'Shipping Mode': rng.choice(SHIPPING_MODES, n),
+        })
+        yield _add_duplicates(df, rng)
+
+
+# --- PaySim transaction log ---
+PAYSIM_TYPES = np.array(['CASH_IN', 'CASH_OUT', 'DEBIT', 'PAYMENT', 'TRANSFER'], dtype=object)
+PAYSIM_TYPE_WEIGHTS = np.array([0.22, 0.35, 0.01, 0.34, 0.08])
+
+
+def generate_paysim(n_rows, seed=42):
+    """
+    Yields chunks shaped like the PaySim Fraud.csv log, ordered by step.
+
+    Args:
+        n_rows (int): Total rows to generate.
+        seed (int): Seed; the same seed always gives the same rows.
+
+    Yields:
+        pandas.DataFrame: step, type, amount, nameOrig, oldbalanceOrg, newbalanceOrig,
+                          nameDest, oldbalanceDest, newbalanceDest, isFraud, isFlaggedFraud.
+    """
+    n_accounts = max(1000, n_rows // 2)
+    for _, start, n, rng in _chunks(n_rows, seed):
+        step = 1 + (np.arange(start, start + n) * 743) // max(n_rows, 1)
+        kind = rng.choice(len(PAYSIM_TYPES), n, p=PAYSIM_TYPE_WEIGHTS)
+        amount = np.round(rng.lognormal(11, 1.3, n), 2)
+        old_orig = np.round(np.where(rng.random(n) < 0.3, 0, rng.lognormal(11, 1.5, n)), 2)
+        new_orig = np.round(np.maximum(old_orig - amount, 0), 2)
+        is_fraud = (rng.random(n) < 0.0013) & np.isin(kind, [1, 4])
+        old_dest = np.round(np.where(rng.random(n) < 0.4, 0, rng.lognormal(12, 1.5, n)), 2)
+        df = pd.DataFrame({
+            'step': step,
+            'type': PAYSIM_TYPES[kind],
+            'amount': amount,
+            'nameOrig': np.char.add('C', rng.integers(0, n_accounts, n).astype(str)).astype(object),
+            'oldbalanceOrg': old_orig,
+            'newbalanceOrig': new_orig,
+            'nameDest': np.char.add(np.where(kind == 3, 'M', 'C'), rng.integers(0, n_accounts, n).astype(str)).astype(object),
+            'oldbalanceDest': old_dest,
+            'newbalanceDest': np.round(old_dest + np.where(kind == 3, 0, amount), 2),
+            'isFraud': is_fraud.astype(int),
+            'isFlaggedFraud': (is_fraud & (kind == 4) & (amount > 200_000)).astype(int),
+        })
+        yield df
+
+
+# =============================================
+# FILE OUTPUT
+# =============================================
+# Dataset name -> (generator, file name of the real dataset, CSV encoding)
+DATASETS = {
+    'online_retail': (generate_online_retail, 'OnlineRetail', 'utf-8'),
+    'car_prices': (generate_car_prices, 'car_prices', 'utf-8'),
+    'warehouse': (generate_warehouse_sales, 'Warehouse_and_Retail_Sales', 'utf-8'),
+    'supply_chain': (generate_supply_chain, 'DataCoSupplyChainDataset', 'latin1'),
+    'paysim': (generate_paysim, 'Fraud', 'utf-8'),
+}
+
+
+def dataset_path(name, n_rows, data_dir, seed=42, fmt='csv'):
+    """Returns the path a generated dataset is cached at."""
+    return os.path.join(data_dir, f'{DATASETS[name][1]}_{n_rows}_s{seed}.{fmt}')
+
+
+def ensure_dataset(name, n_rows, data_dir, seed=42, fmt='csv'):
+    """
+    Generates a dataset file unless it already exists.
+
+    Args:
+        name (str): A key of DATASETS.
+        n_rows (int): Rows to generate.
+        data_dir (str): Directory for the generated files.
+        seed (int): Seed for the generator.
+        fmt (str): 'csv' or 'xlsx' (xlsx is limited to EXCEL_MAX_ROWS rows).
+
+    Returns:
+        str: Path of the dataset file.
+    """
+    path = dataset_path(name, n_rows, data_dir, seed, fmt)
+    if os.path.exists(path):
+        return path
+    if fmt == 'xlsx' and n_rows > EXCEL_MAX_ROWS:
+        raise ValueError(f"{n_rows} rows do not fit in one Excel sheet (max {EXCEL_MAX_ROWS})")
+    os.makedirs(data_dir, exist_ok=True)
+    generator, _, encoding = DATASETS[name]
+    root, extension = os.path.splitext(path)
+    temp_path = root + '.partial' + extension # Keeps the extension
+
+    print(f"Generating {name} ({n_rows:,} rows) -> {path}")
+    if fmt == 'xlsx':
+        write_excel(generator(n_rows, seed), temp_path, verbose=False)
+    else:
+        for i, chunk in enumerate(generator(n_rows, seed)):
+            chunk.to_csv(temp_path, mode='w' if i == 0 else 'a', header=(i == 0), index=False, encoding=encoding)
+    # Only a complete file gets the final name, so an interrupted run regenerates it
+    os.replace(temp_path, path)
+    return path
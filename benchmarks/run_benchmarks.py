@@ -0,0 +1,444 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from generators import EXCEL_MAX_ROWS, ensure_dataset
+
+# =============================================
+# BENCHMARK HARNESS
+# =============================================
+# Runs the cleaning and analysis functions of every project against the synthetic
+# datasets from generators.py and appends wall time, peak RSS and rows/sec to a
+# JSON history, so a change that makes a stage slower or hungrier shows up.
+#
+# Every benchmark runs in its own subprocess: peak RSS can only go up within a
+# process, so sharing one would hide all but the largest run. Output the functions
+# print is swallowed; only the measurements are reported.
+#
+# Usage:
+#   python benchmarks/run_benchmarks.py                     # every case at 100k rows
+#   python benchmarks/run_benchmarks.py --sizes 100k,1m --cases warehouse,vehicle
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARK_DIR = os.path.join(REPO_ROOT, 'benchmarks')
+DEFAULT_DATA_DIR = os.path.join(BENCHMARK_DIR, 'data')
+DEFAULT_HISTORY = os.path.join(BENCHMARK_DIR, 'results', 'history.json')
+
+# Script folders the benchmarked functions are imported from
+SCRIPT_DIRS = [
+    os.path.join(REPO_ROOT, 'My_Retail_Analytics_Project', 'python', 'scripts'),
+    os.path.join(REPO_ROOT, 'Vehicle Sales Performance Dashboard & ETL Pipeline', '02_Scripts', 'python'),
+    os.path.join(REPO_ROOT, 'Warehouse Retail Sales Perfomance Dashboard', '03.Scripts'),
+    os.path.join(REPO_ROOT, 'Supply Chain  E-commerce Performance Dashboard', '02_Scripts'),
+    os.path.join(REPO_ROOT, 'Financial-Service-Fraud-Detection-SQL_Project'),
+]
+
+SIZES = {'100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+
+# A run is reported as a regression when it is this much worse than the recent median
+REGRESSION_FACTOR = 1.25
+
+
+# =============================================
+# BENCHMARK CASES
+# =============================================
+# Each case gets the dataset path and a scratch directory and returns the function to
+# time; anything done before returning (imports, reading the input) is not timed.
+
+def _clean_retail_rows(path):
+    # The same filtering as load_and_clean_data, for the cases that start from clean rows
+    import pandas as pd
+    from dim_date import date_keys, month_keys
+    df = pd.read_csv(path, parse_dates=['InvoiceDate'], dtype={'InvoiceNo': str, 'StockCode': str})
+    df = df[df['CustomerID'].notna() & (df['Quantity'] > 0) & (df['UnitPrice'] > 0)].copy()
+    df['CustomerID'] = df['CustomerID'].astype(int)
+    df['TotalPrice'] = df['Quantity'] * df['UnitPrice']
+    df['DateKey'] = date_keys(df['InvoiceDate'])
+    df['InvoiceYearMonth'] = month_keys(df['DateKey'])
+    return df
+
+
+def case_retail_load_and_clean(path, workdir):
+    from retail_analysis import load_and_clean_data
+    # Time the cold parse, not a hit in the parsed-workbook cache
+    shutil.rmtree(os.path.join(os.path.dirname(path), '.cache'), ignore_errors=True)
+    return lambda: load_and_clean_data(path)
+
+
+def case_retail_clean_stockcodes(path, workdir):
+    from stockCodeCleaning import clean_stockcodes
+    shutil.rmtree(os.path.join(os.path.dirname(path), '.cache'), ignore_errors=True)
+    return lambda: clean_stockcodes(path, os.path.join(workdir, 'cleaned.xlsx'))
+
+
+def case_retail_find_duplicates(path, workdir):
+    import pandas as pd
+    from duplicate_engine import find_duplicates
+    return lambda: find_duplicates(pd.read_csv(path, chunksize=250_000, dtype={'InvoiceNo': str, 'StockCode': str}),
+                                   subset=['InvoiceNo', 'StockCode', 'Quantity'], spill_dir=os.path.join(workdir, 'spill'))
+
+
+def case_retail_rfm(path, workdir):
+    from retail_analysis import perform_rfm_analysis
+    df = _clean_retail_rows(path)
+    return lambda: perform_rfm_analysis(df)
+
+
+def case_retail_analyze_sales(path, workdir):
+    from retail_analysis import analyze_sales
+    df = _clean_retail_rows(path)
+    return lambda: analyze_sales(df)
+
+
+def case_retail_analyze_products(path, workdir):
+    from retail_analysis import analyze_products
+    df = _clean_retail_rows(path)
+    return lambda: analyze_products(df)
+
+
+def case_retail_parallel_aggregates(path, workdir):
+    from parallel_aggregation import parallel_aggregates
+    df = _clean_retail_rows(path)
+    return lambda: parallel_aggregates(df)
+
+
+def case_retail_write_excel(path, workdir):
+    from pipeline_utils import write_excel
+    df = _clean_retail_rows(path)
+    return lambda: write_excel(df, os.path.join(workdir, 'cleaned.xlsx'), verbose=False)
+
+
+def _write_fact_rows(path, workdir):
+    import pandas as pd
+    # fact_sales rows are cleaned rows with numeric StockCodes
+    df = _clean_retail_rows(path)
+    df['StockCode'] = pd.to_numeric(df['StockCode'], errors='coerce')
+    fact_path = os.path.join(workdir, 'fact_sales.csv')
+    df.dropna(subset=['StockCode']).drop(columns=['DateKey', 'InvoiceYearMonth']).to_csv(fact_path, index=False)
+    return fact_path
+
+
+def case_retail_sales_cube(path, workdir):
+    from sales_cube import SalesCube
+    fact_path = _write_fact_rows(path, workdir)
+    return lambda: SalesCube().update_from_csv(fact_path)
+
+
+def case_retail_fact_encoding(path, workdir):
+    from fact_encoding import EncodedFactTable, SurrogateKeys
+    fact_path = _write_fact_rows(path, workdir)
+    return lambda: EncodedFactTable(SurrogateKeys.load()).append_csv(fact_path).sum_by('product_key')
+
+
+def case_vehicle_parse_saledate(path, workdir):
+    import pandas as pd
+    from saledate_parser import parse_saledate
+    saledate = pd.read_csv(path, usecols=['saledate'])['saledate']
+    return lambda: parse_saledate(saledate)
+
+
+def case_vehicle_clean(path, workdir):
+    import pandas as pd
+    from vehicleCleaning import clean_vehicle_sales
+    df = pd.read_csv(path)
+    return lambda: clean_vehicle_sales(df)
+
+
+def case_vehicle_aggregates(path, workdir):
+    from vehicle_aggregates import aggregate_vehicle_sales
+    return lambda: aggregate_vehicle_sales(path)[0].reports()
+
+
+def case_warehouse_clean(path, workdir):
+    from WarehouseCleaning import clean_sales_file
+    return lambda: clean_sales_file(path, os.path.join(workdir, 'cleaned.csv'))
+
+
+def case_warehouse_stream_clean(path, workdir):
+    from WarehouseCleaning import stream_clean_sales_file
+    return lambda: stream_clean_sales_file(path, os.path.join(workdir, 'cleaned.csv'))
+
+
+def case_warehouse_stream_clean_arrow(path, workdir):
+    from WarehouseCleaning import stream_clean_sales_file
+    return lambda: stream_clean_sales_file(path, os.path.join(workdir, 'cleaned.arrow'))
+
+
+def case_warehouse_monthly_refresh(path, workdir):
+    import pandas as pd
+    from warehouse_partitions import refresh_partitions
+    # Partition every period but the last one outside the timing; the run appends that period and refreshes
+    with open(path) as f:
+        header, *lines = f.readlines()
+    periods = pd.read_csv(path, usecols=['YEAR', 'MONTH'])
+    last = (periods['YEAR'] * 100 + periods['MONTH']).to_numpy() == (periods['YEAR'] * 100 + periods['MONTH']).max()
+    extract = os.path.join(workdir, 'extract.csv')
+    with open(extract, 'w') as f:
+        f.writelines([header] + [line for line, new in zip(lines, last) if not new])
+    output_dir = os.path.join(workdir, 'partitions')
+    refresh_partitions(extract, output_dir)
+
+    def run():
+        with open(extract, 'a') as f:
+            f.writelines(line for line, new in zip(lines, last) if new)
+        return refresh_partitions(extract, output_dir)
+    return run
+
+
+def case_supply_chain_datatypes(path, workdir):
+    from process_supply_chain import set_supply_chain_datatypes
+    return lambda: set_supply_chain_datatypes(path)
+
+
+def case_supply_chain_schema_read(path, workdir):
+    from process_supply_chain import set_supply_chain_datatypes
+    schema_path = os.path.join(workdir, 'schema.json')
+    set_supply_chain_datatypes(path, schema_path) # Infer and save the schema outside the timing
+    return lambda: set_supply_chain_datatypes(path, schema_path)
+
+
+def case_supply_chain_profile(path, workdir):
+    from process_supply_chain import profile_supply_chain
+    return lambda: profile_supply_chain(path, os.path.join(workdir, 'profile.json'))
+
+
+def case_fraud_load(path, workdir):
+    from fraud_engine import TransactionLog
+    return lambda: TransactionLog.from_csv(path)
+
+
+def case_fraud_reports(path, workdir):
+    from fraud_engine import TransactionLog, compute_reports
+    log = TransactionLog.from_csv(path)
+    return lambda: compute_reports(log)
+
+
+def case_fraud_replay(path, workdir):
+    from fraud_replay import group_by_step, read_feed, replay
+    return lambda: sum(1 for _ in replay(group_by_step(read_feed(path))))
+
+
+# Case name -> (function, dataset, file format, largest size it runs at)
+CASES = {
+    'retail.load_and_clean_data': (case_retail_load_and_clean, 'online_retail', 'xlsx', EXCEL_MAX_ROWS),
+    'retail.clean_stockcodes': (case_retail_clean_stockcodes, 'online_retail', 'xlsx', EXCEL_MAX_ROWS),
+    'retail.find_duplicates': (case_retail_find_duplicates, 'online_retail', 'csv', None),
+    'retail.perform_rfm_analysis': (case_retail_rfm, 'online_retail', 'csv', None),
+    'retail.analyze_sales': (case_retail_analyze_sales, 'online_retail', 'csv', None),
+    'retail.analyze_products': (case_retail_analyze_products, 'online_retail', 'csv', None),
+    'retail.parallel_aggregates': (case_retail_parallel_aggregates, 'online_retail', 'csv', None),
+    'retail.write_excel': (case_retail_write_excel, 'online_retail', 'csv', EXCEL_MAX_ROWS),
+    'retail.sales_cube': (case_retail_sales_cube, 'online_retail', 'csv', None),
+    'retail.fact_encoding': (case_retail_fact_encoding, 'online_retail', 'csv', None),
+    'vehicle.parse_saledate': (case_vehicle_parse_saledate, 'car_prices', 'csv', None),
+    'vehicle.clean_vehicle_sales': (case_vehicle_clean, 'car_prices', 'csv', None),
+    'vehicle.aggregate_vehicle_sales': (case_vehicle_aggregates, 'car_prices', 'csv', None),
+    'warehouse.clean_sales_file': (case_warehouse_clean, 'warehouse', 'csv', None),
+    'warehouse.stream_clean_sales_file': (case_warehouse_stream_clean, 'warehouse', 'csv', None),
+    'warehouse.stream_clean_to_arrow': (case_warehouse_stream_clean_arrow, 'warehouse', 'csv', None),
+    'warehouse.monthly_refresh': (case_warehouse_monthly_refresh, 'warehouse', 'csv', None),
+    'supply_chain.set_datatypes': (case_supply_chain_datatypes, 'supply_chain', 'csv', None),
+    'supply_chain.schema_read': (case_supply_chain_schema_read, 'supply_chain', 'csv', None),
+    'supply_chain.profile': (case_supply_chain_profile, 'supply_chain', 'csv', None),
+    'fraud.load': (case_fraud_load, 'paysim', 'csv', None),
+    'fraud.compute_reports': (case_fraud_reports, 'paysim', 'csv', None),
+    'fraud.replay': (case_fraud_replay, 'paysim', 'csv', None),
+}
+
+
+def _peak_rss_mb():
+    # On Linux ru_maxrss survives exec, so a child would report the harness's own peak;
+    # VmHWM (the high-water mark of this process image) starts fresh in the child
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_case_in_this_process(case_name, path, result_path):
+    """Runs one case (inside the child process) and writes its measurements to result_path."""
+    sys.path[:0] = SCRIPT_DIRS
+    function = CASES[case_name][0]
+    workdir = tempfile.mkdtemp(prefix='bench_')
+    cwd = os.getcwd()
+    os.chdir(workdir) # Anything the scripts write lands in the scratch directory
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            run = function(path, workdir)
+            setup_rss = _peak_rss_mb()
+            cpu_start = time.process_time()
+            start = time.perf_counter()
+            run()
+            seconds = time.perf_counter() - start
+            cpu_seconds = time.process_time() - cpu_start
+        result = {'seconds': seconds, 'cpu_seconds': cpu_seconds,
+                  'setup_peak_rss_mb': setup_rss, 'peak_rss_mb': _peak_rss_mb()}
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    with open(result_path, 'w') as f:
+        json.dump(result, f)
+
+
+def run_case(case_name, n_rows, data_dir, seed=42, timeout=None):
+    """
+    Runs one case at one size in a fresh subprocess.
+
+    Args:
+        case_name (str): A key of CASES.
+        n_rows (int): Dataset size.
+        data_dir (str): Directory with the generated datasets.
+        seed (int): Dataset seed.
+        timeout (float): Seconds before the run is abandoned.
+
+    Returns:
+        dict: The history record for this run (with an 'error' key if it failed).
+    """
+    _, dataset, fmt, max_rows = CASES[case_name]
+    record = {'case': case_name, 'rows': n_rows, 'dataset': dataset, 'seed': seed}
+    if max_rows is not None and n_rows > max_rows:
+        record['skipped'] = f'{dataset} {fmt} is limited to {max_rows:,} rows'
+        return record
+    path = ensure_dataset(dataset, n_rows, data_dir, seed, fmt)
+
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+        result_path = f.name
+    env = dict(os.environ, MPLBACKEND='Agg') # The analysis functions plot; never open a window
+    try:
+        completed = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', case_name, path, result_path],
+                                   capture_output=True, text=True, env=env, timeout=timeout)
+        if completed.returncode != 0:
+            record['error'] = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'failed'
+            return record
+        with open(result_path) as f:
+            record.update(json.load(f))
+    except subprocess.TimeoutExpired:
+        record['error'] = f'timed out after {timeout}s'
+        return record
+    finally:
+        os.remove(result_path)
+
+    record['rows_per_second'] = n_rows / record['seconds'] if record['seconds'] > 0 else None
+    return record
+
+
+# =============================================
+# HISTORY & REGRESSION CHECKS
+# =============================================
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def load_history(history_path):
+    try:
+        with open(history_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def check_regression(record, history, window=5):
+    """
+    Compares a run with the median of the last `window` successful runs of the same case and size.
+
+    Returns:
+        list: Descriptions of the measurements that got worse by more than REGRESSION_FACTOR.
+    """
+    previous = [r for r in history if r.get('case') == record['case'] and r.get('rows') == record['rows']
+                and 'seconds' in r][-window:]
+    if not previous or 'seconds' not in record:
+        return []
+    problems = []
+    for key in ('seconds', 'peak_rss_mb'):
+        values = sorted(r[key] for r in previous)
+        median = values[len(values) // 2]
+        if median > 0 and record[key] > median * REGRESSION_FACTOR:
+            problems.append(f"{key} {record[key]:.2f} vs median {median:.2f} (x{record[key] / median:.2f})")
+    return problems
+
+
+def run_benchmarks(case_names, sizes, data_dir=DEFAULT_DATA_DIR, history_path=DEFAULT_HISTORY, seed=42, timeout=None):
+    """
+    Runs the given cases at the given sizes, prints a summary table and appends the
+    results to the JSON history.
+
+    Args:
+        case_names (list): Keys of CASES.
+        sizes (list): Row counts.
+        data_dir (str): Directory for the generated datasets.
+        history_path (str): The JSON history file.
+        seed (int): Dataset seed.
+        timeout (float): Seconds before one run is abandoned.
+
+    Returns:
+        list: The records of this run.
+    """
+    history = load_history(history_path)
+    run_info = {'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'), 'commit': _git_commit(),
+                'python': platform.python_version(), 'machine': platform.node()}
+    records = []
+    print(f"{'case':<36} {'rows':>10} {'seconds':>9} {'rows/s':>12} {'peak RSS MB':>12}")
+    for n_rows in sizes:
+        for case_name in case_names:
+            record = dict(run_info, **run_case(case_name, n_rows, data_dir, seed, timeout))
+            if 'skipped' in record:
+                print(f"{case_name:<36} {n_rows:>10,} skipped: {record['skipped']}")
+                continue
+            if 'error' in record:
+                print(f"{case_name:<36} {n_rows:>10,} ERROR: {record['error']}")
+            else:
+                print(f"{case_name:<36} {n_rows:>10,} {record['seconds']:>9.2f} {record['rows_per_second']:>12,.0f} "
+                      f"{record['peak_rss_mb']:>12.1f}")
+                for problem in check_regression(record, history):
+                    print(f"    REGRESSION: {problem}")
+            records.append(record)
+
+    os.makedirs(os.path.dirname(history_path), exist_ok=True)
+    with open(history_path, 'w') as f:
+        json.dump(history + records, f, indent=1)
+    print(f"\nAppended {len(records)} results to {history_path}")
+    return records
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        run_case_in_this_process(*sys.argv[2:5])
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Benchmark the cleaning and analysis scripts on synthetic data.")
+    parser.add_argument('--sizes', default='100k', help="Comma-separated sizes: " + ', '.join(SIZES))
+    parser.add_argument('--cases', default='', help="Comma-separated case names or prefixes (default: all)")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help="Where generated datasets are cached")
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help="JSON history file to append to")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--timeout', type=float, default=None, help="Seconds before a single run is abandoned")
+    parser.add_argument('--list', action='store_true', help="List the cases and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        print('\n'.join(CASES))
+        sys.exit(0)
+    prefixes = [p for p in args.cases.split(',') if p]
+    selected = [name for name in CASES if not prefixes or any(name.startswith(p) for p in prefixes)]
+    run_benchmarks(selected, [SIZES[s.strip().lower()] for s in args.sizes.split(',')],
+                   args.data_dir, args.history, args.seed, args.timeout)
@@ -0,0 +1,9 @@
+# Shared helpers for the project pipelines. Install the package once from the repository
+# root (`pip install -e .`, see the README) and import from here in any script
+# (e.g. `from pipeline_utils import track`).
+from pipeline_utils.instrumentation import configure, print_summary, stage, track
+from pipeline_utils.sketches import GroupedHyperLogLog, HyperLogLog, SpaceSaving, TDigest
+from pipeline_utils.excel_writer import StreamingExcelWriter, write_excel
+from pipeline_utils.columnar_store import (INTERMEDIATE_EXTENSION, TableWriter, export_table, intermediate_path,
+                                           is_intermediate, iter_frames, open_table, read_table, write_table)
+from pipeline_utils.profiler import DataProfile, profile_chunks, profile_csv, write_profile
@@ -0,0 +1,227 @@
+import os
+import time
+
+import pandas as pd
+
+from pipeline_utils.excel_writer import write_excel
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc  # noqa: F401 - registers pa.ipc
+    ARROW_AVAILABLE = True
+except ImportError:
+    pa = None
+    ARROW_AVAILABLE = False
+
+# =============================================
+# COLUMNAR INTERMEDIATE STORE (ARROW IPC)
+# =============================================
+# Stages hand data to each other through Arrow IPC files ('.arrow', the Feather v2
+# format) instead of CSV or XLSX:
+#   - the schema travels with the data: Int64, category, string, datetime and float
+#     columns come back with the dtypes they were written with, nothing is re-parsed;
+#   - files are written uncompressed, so a reader can memory-map them and use the
+#     column buffers in place (open_table) - only the columns and pages it touches
+#     are read from disk;
+#   - record batches are written one chunk at a time (TableWriter), so the streaming
+#     cleaners keep their constant memory, and read back one batch at a time (iter_frames).
+#
+# CSV and XLSX remain available as final deliverables through export_table (XLSX through
+# the streaming writer in excel_writer.py); they are not read back by the pipeline.
+#
+#     write_table(df, 'cleaned_sales_data.arrow')
+#     df = read_table('cleaned_sales_data.arrow', columns=['SUPPLIER', 'RETAIL SALES'])
+
+INTERMEDIATE_EXTENSION = '.arrow'
+INTERMEDIATE_EXTENSIONS = ('.arrow', '.feather', '.ipc')
+
+
+def _require_arrow():
+    if not ARROW_AVAILABLE:
+        raise ImportError("The columnar store needs pyarrow (pip install pyarrow).")
+
+
+def is_intermediate(path):
+    """True when the path names an Arrow IPC file of the store."""
+    return str(path).lower().endswith(INTERMEDIATE_EXTENSIONS)
+
+
+def intermediate_path(path):
+    """The store file that goes with a deliverable path ('cleaned.csv' -> 'cleaned.arrow')."""
+    return os.path.splitext(path)[0] + INTERMEDIATE_EXTENSION
+
+
+def _to_arrow(df, schema=None):
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+class TableWriter:
+    """
+    Writes DataFrame chunks to one Arrow IPC file, as consecutive record batches.
+
+    The schema is taken from the first chunk; later chunks are converted to it. Category
+    columns may see new categories in later chunks: they are written as dictionary deltas
+    that extend the categories written so far. The file is written under a temporary name
+    and moved into place on close, so readers never see a half-written file.
+
+        with TableWriter('cleaned.arrow') as writer:
+            for chunk in chunks:
+                writer.write(clean(chunk))
+
+    Args:
+        path (str): The .arrow file to write.
+    """
+
+    def __init__(self, path):
+        _require_arrow()
+        self.path = path
+        self.rows = 0
+        self._tmp_path = path + '.tmp'
+        self._writer = None
+        self._schema = None
+        self._categories = {}
+
+    def _schema_for(self, df):
+        schema = pa.Schema.from_pandas(df, preserve_index=False)
+        for i, field in enumerate(schema):
+            if pa.types.is_dictionary(field.type):
+                # int32 indices, so categories can keep growing across chunks
+                schema = schema.set(i, field.with_type(pa.dictionary(pa.int32(), field.type.value_type)))
+                self._categories[field.name] = pd.Index([])
+        return schema
+
+    def write(self, df):
+        """Appends a chunk; returns the number of rows written so far."""
+        if self._writer is None:
+            self._schema = self._schema_for(df)
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+            self._writer = pa.ipc.new_file(self._tmp_path, self._schema, options=options)
+        if self._categories:
+            df = df.copy(deep=False)
+            for col, known in self._categories.items():
+                values = df[col].astype('category')
+                known = known.append(values.cat.categories.difference(known, sort=False))
+                df[col] = values.cat.set_categories(known)
+                self._categories[col] = known
+        self._writer.write_table(_to_arrow(df, self._schema))
+        self.rows += len(df)
+        return self.rows
+
+    def close(self):
+        if self._writer is None:
+            raise ValueError(f"No rows were written to '{self.path}'.")
+        self._writer.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def write_table(df, path):
+    """
+    Writes a DataFrame to an Arrow IPC file of the store.
+
+    Args:
+        df (pandas.DataFrame): The data. The index is not stored.
+        path (str): The .arrow file to write.
+
+    Returns:
+        str: The path written.
+    """
+    with TableWriter(path) as writer:
+        writer.write(df)
+    return path
+
+
+def open_table(path, columns=None):
+    """
+    Memory-maps an Arrow IPC file and returns it as a pyarrow.Table without copying.
+
+    The table's buffers point into the mapped file, so opening is instant and only
+    the pages of the columns that are used are read from disk.
+
+    Args:
+        path (str): The .arrow file.
+        columns (list): Optional subset of columns.
+
+    Returns:
+        pyarrow.Table: The table.
+    """
+    _require_arrow()
+    reader = pa.ipc.open_file(pa.memory_map(path, 'r'))
+    table = reader.read_all()
+    return table.select(columns) if columns is not None else table
+
+
+def read_table(path, columns=None):
+    """
+    Reads an Arrow IPC file of the store into a DataFrame with the dtypes it was written with.
+
+    Args:
+        path (str): The .arrow file.
+        columns (list): Optional subset of columns; the others are never read.
+
+    Returns:
+        pandas.DataFrame: The data.
+    """
+    return open_table(path, columns).to_pandas()
+
+
+def iter_frames(path, columns=None):
+    """
+    Yields the file one record batch (one written chunk) at a time, as DataFrames.
+
+    Args:
+        path (str): The .arrow file.
+        columns (list): Optional subset of columns.
+
+    Yields:
+        pandas.DataFrame: One batch of rows.
+    """
+    _require_arrow()
+    reader = pa.ipc.open_file(pa.memory_map(path, 'r'))
+    for i in range(reader.num_record_batches):
+        batch = reader.get_batch(i)
+        if columns is not None:
+            batch = batch.select(columns)
+        # Wrapping in a Table applies the pandas metadata (Int64, category, ...) as in read_table
+        yield pa.Table.from_batches([batch]).to_pandas()
+
+
+def export_table(df, path):
+    """
+    Writes a final deliverable; the format follows the extension (.csv, .xlsx or .arrow).
+
+    Args:
+        df (pandas.DataFrame): The data.
+        path (str): The output file.
+
+    Returns:
+        float: Seconds taken.
+    """
+    start = time.perf_counter()
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        df.to_csv(path, index=False)
+    elif extension == '.xlsx':
+        write_excel(df, path)
+    elif is_intermediate(path):
+        write_table(df, path)
+    else:
+        raise ValueError(f"Unsupported export format '{extension}' (use .csv, .xlsx or .arrow).")
+    return time.perf_counter() - start
+
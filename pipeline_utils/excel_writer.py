@@ -0,0 +1,372 @@
+import datetime
+import math
+import os
+import re
+import time
+import zipfile
+from xml.sax.saxutils import quoteattr
+
+import numpy as np
+import pandas as pd
+
+# =============================================
+# STREAMING XLSX WRITER
+# =============================================
+# DataFrame.to_excel builds the whole workbook in memory (an openpyxl Cell object per
+# value) before saving it, so memory grows with the sheet and every value pays for
+# openpyxl's per-cell bookkeeping. openpyxl's own write-only mode saves the memory but
+# not the time: without lxml every cell still goes through its pure-Python XML
+# serializer (~1 ms per row of 8 columns here).
+#
+# This writer streams the sheet XML straight into the .xlsx zip, write-only:
+#   - rows are written one chunk at a time and each cell is a single formatted string,
+#     so memory depends on the chunk size, not on the number of rows; a DataFrame or
+#     any iterable of chunks can be written;
+#   - column number formats come from the dtypes (integers, decimals, dates and text)
+#     and are declared once in the workbook styles; values are stored in full;
+#   - category columns are formatted once per category, not once per row;
+#   - a sheet that reaches Excel's row limit is continued on a new sheet
+#     ('Sales', 'Sales_2', ...), each with the header row;
+#   - rows written, sheets, time and rows/s are reported when the file is closed.
+#
+#     write_excel(df, 'Cleaned_OnlineRetail_ForBI.xlsx')
+#
+#     with StreamingExcelWriter('big.xlsx', sheet_name='Sales') as writer:
+#         for chunk in pd.read_csv('big.csv', chunksize=100_000):
+#             writer.write(chunk)
+
+EXCEL_MAX_ROWS = 1_048_576 # Rows per worksheet, including the header row
+EXCEL_MAX_COLUMNS = 16_384
+EXCEL_MAX_SHEET_NAME = 31
+DEFAULT_CHUNK_ROWS = 50_000
+EXCEL_EPOCH = pd.Timestamp('1899-12-30') # Day 0 of Excel serial dates
+
+# dtype kind -> Excel number format
+NUMBER_FORMATS = {
+    'integer': '0',
+    'float': '0.00',
+    'datetime': 'yyyy-mm-dd hh:mm:ss',
+    'date': 'yyyy-mm-dd',
+    'text': '@',
+}
+
+_MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_ILLEGAL_XML_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]') # Cannot be stored in an .xlsx at all
+_INVALID_SHEET_CHARS = re.compile(r'[\[\]:*?/\\]')
+
+
+def number_format_for(series):
+    """
+    The Excel number format for a column, from its dtype (None keeps Excel's General format).
+
+    Floats get two decimals for display only; the full value is stored. Datetime columns
+    whose values are all at midnight get a date-only format.
+    """
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return None
+    if pd.api.types.is_integer_dtype(dtype):
+        return NUMBER_FORMATS['integer']
+    if pd.api.types.is_float_dtype(dtype):
+        return NUMBER_FORMATS['float']
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        values = series.dropna()
+        if len(values) and (values.dt.normalize() == values).all():
+            return NUMBER_FORMATS['date']
+        return NUMBER_FORMATS['datetime']
+    if isinstance(dtype, pd.CategoricalDtype):
+        return number_format_for(pd.Series(dtype.categories))
+    if pd.api.types.is_string_dtype(dtype) and pd.api.types.infer_dtype(series, skipna=True) in ('string', 'empty'):
+        return NUMBER_FORMATS['text']
+    return None
+
+
+def column_letter(index):
+    """Excel column letters of a 0-based column index (0 -> 'A', 26 -> 'AA')."""
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _escape(text):
+    return _ILLEGAL_XML_CHARS.sub('', text).replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def _text_tail(text, style):
+    return f'{style} t="inlineStr"><is><t xml:space="preserve">{_escape(text)}</t></is></c>'
+
+
+def _value_tail(value, style, date_style):
+    """The XML of a cell after its reference, for one Python value (None for an empty cell)."""
+    if value is None or value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, (bool, np.bool_)):
+        return f'{style} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, np.integer)):
+        return f'{style}><v>{int(value)}</v></c>'
+    if isinstance(value, (float, np.floating)):
+        return f'{style}><v>{float(value)!r}</v></c>' if math.isfinite(value) else None
+    if isinstance(value, datetime.datetime):
+        value = pd.Timestamp(value)
+        value = value.tz_localize(None) if value.tzinfo is not None else value
+        return f'{style or date_style}><v>{(value - EXCEL_EPOCH) / pd.Timedelta(days=1)!r}</v></c>'
+    return _text_tail(str(value), style)
+
+
+def _column_tails(series, style, date_style=''):
+    """
+    The XML after the cell reference for every value of a column (None for empty cells).
+
+    Cells are written as '<c r="B7"' + tail, so everything but the reference is prepared
+    per column, with typed shortcuts for the common dtypes. date_style is used for
+    datetime values in columns of mixed values, which have no number format of their own.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Each category is formatted once and looked up by code
+        tails = _column_tails(pd.Series(series.cat.categories), style, date_style) + [None] # Code -1 (missing) -> None
+        return [tails[code] for code in series.cat.codes.tolist()]
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return [None if value is None else f'{style} t="b"><v>{int(value)}</v></c>'
+                for value in series.astype(object).where(series.notna(), None).tolist()]
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return [None if value is None else f'{style}><v>{value}</v></c>'
+                for value in series.astype(object).where(series.notna(), None).tolist()]
+    if pd.api.types.is_float_dtype(series.dtype):
+        values = series.to_numpy(dtype='float64', na_value=np.nan)
+        finite = np.isfinite(values)
+        return [f'{style}><v>{value!r}</v></c>' if ok else None for value, ok in zip(values.tolist(), finite.tolist())]
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        if isinstance(series.dtype, pd.DatetimeTZDtype):
+            # Excel has no time zones; write the wall-clock time of the column's zone
+            series = series.dt.tz_localize(None)
+        serial = ((series - EXCEL_EPOCH) / pd.Timedelta(days=1)).to_numpy(dtype='float64', na_value=np.nan)
+        return [None if value != value else f'{style}><v>{value!r}</v></c>' for value in serial.tolist()]
+    if pd.api.types.is_string_dtype(series.dtype) and pd.api.types.infer_dtype(series, skipna=True) in ('string', 'empty'):
+        return [None if value is None else _text_tail(value, style)
+                for value in series.astype(object).where(series.notna(), None).tolist()]
+    return [_value_tail(value, style, date_style) for value in series.astype(object).where(series.notna(), None).tolist()]
+
+
+def _sheet_title(sheet_name, number):
+    sheet_name = _INVALID_SHEET_CHARS.sub('_', sheet_name) or 'Sheet'
+    if number == 1:
+        return sheet_name[:EXCEL_MAX_SHEET_NAME]
+    suffix = f'_{number}'
+    return sheet_name[:EXCEL_MAX_SHEET_NAME - len(suffix)] + suffix
+
+
+class StreamingExcelWriter:
+    """
+    Writes DataFrame chunks to an .xlsx file in constant memory.
+
+    Args:
+        path (str): The .xlsx file to write.
+        sheet_name (str): Name of the first sheet; continuation sheets get '_2', '_3', ...
+        number_formats (dict): Column -> Excel number format, overriding the dtype-based
+                               format (None for General).
+        max_rows_per_sheet (int): Data rows per sheet before a new sheet is started.
+                                  Defaults to Excel's limit minus the header row.
+        compresslevel (int): zlib level for the file (1 is fastest, 9 smallest).
+    """
+
+    def __init__(self, path, sheet_name='Sheet1', number_formats=None, max_rows_per_sheet=EXCEL_MAX_ROWS - 1,
+                 compresslevel=1):
+        if not 1 <= max_rows_per_sheet <= EXCEL_MAX_ROWS - 1:
+            raise ValueError(f"max_rows_per_sheet must be between 1 and {EXCEL_MAX_ROWS - 1}.")
+        self.path = path
+        self.sheet_name = sheet_name
+        self.number_formats = number_formats or {}
+        self.max_rows_per_sheet = max_rows_per_sheet
+        self.rows = 0
+        self.sheet_titles = []
+        root, extension = os.path.splitext(path)
+        self._tmp_path = root + '.partial' + extension # Only a complete file gets the final name
+        self._zip = zipfile.ZipFile(self._tmp_path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=compresslevel)
+        self._sheet = None
+        self._sheet_rows = 0
+        self._columns = None
+        self._styles = None
+        self._formats = [] # Distinct number formats, in the order of their cell style ids
+        self._start = time.perf_counter()
+
+    @property
+    def sheets(self):
+        return len(self.sheet_titles)
+
+    def _setup_columns(self, df):
+        if len(df.columns) > EXCEL_MAX_COLUMNS:
+            raise ValueError(f"{len(df.columns)} columns do not fit in an Excel sheet (max {EXCEL_MAX_COLUMNS}).")
+        self._columns = list(df.columns)
+        self._letters = [column_letter(i) for i in range(len(self._columns))]
+        self._styles = [self._style(self.number_formats.get(col, number_format_for(df[col]))) for col in self._columns]
+        self._date_style = self._style(NUMBER_FORMATS['datetime'])
+
+    def _style(self, number_format):
+        """The cell style attribute for a number format ('' for General)."""
+        if number_format is None:
+            return ''
+        if number_format not in self._formats:
+            self._formats.append(number_format)
+        return f' s="{self._formats.index(number_format) + 1}"'
+
+    def _new_sheet(self):
+        self._end_sheet()
+        self.sheet_titles.append(_sheet_title(self.sheet_name, self.sheets + 1))
+        self._sheet = self._zip.open(f'xl/worksheets/sheet{self.sheets}.xml', 'w', force_zip64=True)
+        header = ''.join(f'<c r="{letter}1"{_text_tail(str(col), "")}' for letter, col in zip(self._letters, self._columns))
+        self._sheet.write(f'{_XML_HEADER}<worksheet xmlns="{_MAIN_NS}"><sheetData><row r="1">{header}</row>'.encode('utf-8'))
+        self._sheet_rows = 0
+
+    def _end_sheet(self):
+        if self._sheet is not None:
+            self._sheet.write(b'</sheetData></worksheet>')
+            self._sheet.close()
+            self._sheet = None
+
+    def write(self, df):
+        """
+        Appends a chunk of rows, starting new sheets at the row limit.
+
+        Returns:
+            int: Rows written so far.
+        """
+        if self._columns is None:
+            self._setup_columns(df)
+        elif list(df.columns) != self._columns:
+            raise ValueError("Every chunk must have the same columns as the first one.")
+        tails = [_column_tails(df[col], style, self._date_style) for col, style in zip(self._columns, self._styles)]
+        letters = self._letters
+        start = 0
+        while start < len(df):
+            if self._sheet is None or self._sheet_rows >= self.max_rows_per_sheet:
+                self._new_sheet()
+            stop = min(len(df), start + self.max_rows_per_sheet - self._sheet_rows)
+            first_row = self._sheet_rows + 2 # Row 1 holds the header
+            lines = []
+            for offset, row_tails in enumerate(zip(*(column[start:stop] for column in tails))):
+                row = first_row + offset
+                cells = ''.join(f'<c r="{letter}{row}"{tail}' for letter, tail in zip(letters, row_tails) if tail is not None)
+                lines.append(f'<row r="{row}">{cells}</row>')
+            self._sheet.write(''.join(lines).encode('utf-8'))
+            self._sheet_rows += stop - start
+            start = stop
+        self.rows += len(df)
+        return self.rows
+
+    def _styles_xml(self):
+        num_fmts = ''.join(f'<numFmt numFmtId="{164 + i}" formatCode={quoteattr(code)}/>' for i, code in enumerate(self._formats))
+        xfs = ''.join(f'<xf numFmtId="{164 + i}" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+                      for i in range(len(self._formats)))
+        return (f'{_XML_HEADER}<styleSheet xmlns="{_MAIN_NS}">'
+                f'<numFmts count="{len(self._formats)}">{num_fmts}</numFmts>'
+                '<fonts count="1"><font><sz val="11"/><name val="Calibri"/><family val="2"/></font></fonts>'
+                '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+                '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+                '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+                f'<cellXfs count="{len(self._formats) + 1}"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>{xfs}</cellXfs>'
+                '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+                '</styleSheet>')
+
+    def _write_package_parts(self):
+        sheet_ids = range(1, self.sheets + 1)
+        overrides = ''.join(f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+                            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                            for i in sheet_ids)
+        self._zip.writestr('[Content_Types].xml', (
+            f'{_XML_HEADER}<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            f'{overrides}</Types>'))
+        self._zip.writestr('_rels/.rels', (
+            f'{_XML_HEADER}<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'<Relationship Id="rId1" Type="{_REL_NS}/officeDocument" Target="xl/workbook.xml"/></Relationships>'))
+        sheets = ''.join(f'<sheet name={quoteattr(title)} sheetId="{i}" r:id="rId{i}"/>'
+                         for i, title in zip(sheet_ids, self.sheet_titles))
+        self._zip.writestr('xl/workbook.xml', (
+            f'{_XML_HEADER}<workbook xmlns="{_MAIN_NS}" xmlns:r="{_REL_NS}"><sheets>{sheets}</sheets></workbook>'))
+        sheet_rels = ''.join(f'<Relationship Id="rId{i}" Type="{_REL_NS}/worksheet" Target="worksheets/sheet{i}.xml"/>'
+                             for i in sheet_ids)
+        self._zip.writestr('xl/_rels/workbook.xml.rels', (
+            f'{_XML_HEADER}<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'{sheet_rels}<Relationship Id="rId{self.sheets + 1}" Type="{_REL_NS}/styles" Target="styles.xml"/></Relationships>'))
+        self._zip.writestr('xl/styles.xml', self._styles_xml())
+
+    def close(self):
+        """
+        Finishes the workbook and moves it to its final name.
+
+        Returns:
+            dict: path, rows, sheets, seconds and rows_per_second.
+        """
+        if self._sheet is None and not self.sheet_titles:
+            # Nothing was written; still produce a valid workbook with the header (if known)
+            if self._columns is None:
+                self._columns, self._letters, self._styles = [], [], []
+            self._new_sheet()
+        self._end_sheet()
+        self._write_package_parts()
+        self._zip.close()
+        os.replace(self._tmp_path, self.path)
+        seconds = time.perf_counter() - self._start
+        return {
+            'path': self.path, 'rows': self.rows, 'sheets': self.sheets, 'seconds': round(seconds, 3),
+            'rows_per_second': round(self.rows / seconds) if seconds > 0 else None,
+        }
+
+    def abort(self):
+        """Discards the partial file."""
+        if self._sheet is not None:
+            self._sheet.close()
+            self._sheet = None
+        self._zip.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.stats = self.close()
+        else:
+            self.abort()
+        return False
+
+
+def write_excel(data, path, sheet_name='Sheet1', chunk_size=DEFAULT_CHUNK_ROWS, number_formats=None,
+                max_rows_per_sheet=EXCEL_MAX_ROWS - 1, verbose=True):
+    """
+    Streams a DataFrame (or an iterable of DataFrame chunks) to an .xlsx file.
+
+    Args:
+        data (pandas.DataFrame or iterable): The rows to write. A DataFrame is written in
+                                             chunks of chunk_size rows.
+        path (str): The .xlsx file to write.
+        sheet_name (str): Name of the first sheet.
+        chunk_size (int): Rows converted at a time when data is a DataFrame.
+        number_formats (dict): Column -> Excel number format overrides.
+        max_rows_per_sheet (int): Data rows per sheet before a new sheet is started.
+        verbose (bool): Print the throughput report.
+
+    Returns:
+        dict: path, rows, sheets, seconds and rows_per_second.
+    """
+    if isinstance(data, pd.DataFrame):
+        chunks = (data.iloc[start:start + chunk_size] for start in range(0, max(len(data), 1), chunk_size))
+    else:
+        chunks = data
+    with StreamingExcelWriter(path, sheet_name, number_formats, max_rows_per_sheet) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+    stats = writer.stats
+    if verbose:
+        print(f"Wrote {stats['rows']:,} rows to '{path}' ({stats['sheets']} sheet(s)) in "
+              f"{stats['seconds']:.2f}s ({stats['rows_per_second'] or 0:,} rows/s)")
+    return stats
@@ -0,0 +1,291 @@
+import cProfile
+import functools
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# =============================================
+# PER-STAGE INSTRUMENTATION
+# =============================================
+# Measures each stage of a pipeline (load, clean, analyse, export, ...) so a slow or
+# memory-hungry run shows which stage blew up, not just the total runtime:
+#   - wall time and CPU time,
+#   - peak memory growth (the highest RSS seen while the stage ran, minus RSS at the start),
+#   - rows in and rows out,
+#   - optionally a cProfile capture of the stage, saved as a .prof file.
+#
+# Use a stage as a context manager or a decorator:
+#
+#     with stage('load', rows_in=None) as s:
+#         df = pd.read_csv(path)
+#         s.rows_out = len(df)
+#
+#     @track()                  # rows are taken from the first argument and the result
+#     def clean(df): ...
+#
+# Records go to an in-memory list (print_summary() shows them as a table) and,
+# when configured, to a JSON lines file, one record per finished stage.
+#
+# Environment variables (so a production run can be instrumented without code changes):
+#   PIPELINE_METRICS      JSON lines file to append the stage records to
+#   PIPELINE_PROFILE      comma-separated stage names to profile, or 'all'
+#   PIPELINE_PROFILE_DIR  directory for the .prof files (default: current directory)
+
+MEMORY_SAMPLE_SECONDS = 0.01
+
+
+def _current_rss_bytes():
+    # /proc is cheap to read on Linux; elsewhere fall back to the process peak
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class _MemorySampler:
+    """Polls RSS in a background thread and keeps the highest value seen."""
+
+    def __init__(self, interval=MEMORY_SAMPLE_SECONDS):
+        self.interval = interval
+        self.start_rss = _current_rss_bytes()
+        self.peak_rss = self.start_rss
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, _current_rss_bytes())
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.peak_rss = max(self.peak_rss, _current_rss_bytes())
+        return self.peak_rss - self.start_rss
+
+
+def _count_rows(value):
+    """Best-effort row count: len() of frames/arrays/lists, the first item of a tuple, or an int."""
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    if isinstance(value, bool) or value is None or isinstance(value, (str, bytes, dict)):
+        return None
+    if isinstance(value, int):
+        return value
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+
+class StageRecord:
+    """
+    Measurements of one stage run. Set rows_in / rows_out inside a `with stage(...)` block.
+
+    Attributes:
+        name (str): Stage name.
+        parent (str): Name of the enclosing stage, if stages are nested.
+        rows_in, rows_out (int): Rows going into and coming out of the stage.
+        wall_seconds, cpu_seconds (float): Elapsed and CPU time.
+        peak_memory_delta_mb (float): Highest RSS during the stage minus RSS at its start.
+        profile_path (str): The .prof file, when the stage was profiled.
+        error (str): The exception that ended the stage, if any.
+    """
+
+    def __init__(self, name, parent=None, rows_in=None):
+        self.name = name
+        self.parent = parent
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        self.peak_memory_delta_mb = None
+        self.profile_path = None
+        self.error = None
+        self.started_at = None
+
+    def to_dict(self):
+        record = {
+            'stage': self.name, 'parent': self.parent, 'started_at': self.started_at,
+            'wall_seconds': self.wall_seconds, 'cpu_seconds': self.cpu_seconds,
+            'peak_memory_delta_mb': self.peak_memory_delta_mb,
+            'rows_in': self.rows_in, 'rows_out': self.rows_out,
+        }
+        if self.wall_seconds and self.rows_in:
+            record['rows_per_second'] = round(self.rows_in / self.wall_seconds)
+        if self.profile_path:
+            record['profile_path'] = self.profile_path
+        if self.error:
+            record['error'] = self.error
+        return record
+
+
+class StageRecorder:
+    """
+    Collects stage records and writes them out.
+
+    Args:
+        jsonl_path (str): Optional JSON lines file; each finished stage is appended to it.
+        profile (set or str): Stage names to run under cProfile, or 'all'.
+        profile_dir (str): Directory for the .prof files.
+    """
+
+    def __init__(self, jsonl_path=None, profile=None, profile_dir='.'):
+        self.records = []
+        self.jsonl_path = jsonl_path
+        self.profile = profile or set()
+        self.profile_dir = profile_dir
+        self._stack = []
+        self._profiling = False
+
+    def _should_profile(self, name):
+        # cProfile cannot run two profilers at once, so nested stages are not profiled separately
+        if self._profiling:
+            return False
+        return self.profile == 'all' or name in self.profile
+
+    @contextmanager
+    def stage(self, name, rows_in=None, profile=None):
+        """
+        Context manager that measures the code inside it as one stage.
+
+        Args:
+            name (str): Stage name.
+            rows_in (int): Rows going into the stage (can also be set on the record).
+            profile (bool): Force cProfile on or off for this stage (default: configured set).
+
+        Yields:
+            StageRecord: The record being filled in.
+        """
+        record = StageRecord(name, self._stack[-1].name if self._stack else None, rows_in)
+        record.started_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+        profiler = None
+        if profile or (profile is None and self._should_profile(name)):
+            profiler = cProfile.Profile()
+            self._profiling = True
+        self._stack.append(record)
+        sampler = _MemorySampler()
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        try:
+            yield record
+        except BaseException as e:
+            record.error = f'{type(e).__name__}: {e}'
+            raise
+        finally:
+            if profiler:
+                profiler.disable()
+                self._profiling = False
+                os.makedirs(self.profile_dir, exist_ok=True)
+                record.profile_path = os.path.join(self.profile_dir, f'{name}.prof')
+                profiler.dump_stats(record.profile_path)
+            record.wall_seconds = round(time.perf_counter() - wall_start, 4)
+            record.cpu_seconds = round(time.process_time() - cpu_start, 4)
+            record.peak_memory_delta_mb = round(sampler.stop() / (1024 * 1024), 1)
+            self._stack.pop()
+            self._finish(record)
+
+    def track(self, name=None, rows_in=None, rows_out=None):
+        """
+        Decorator that runs every call of a function as a stage.
+
+        Args:
+            name (str): Stage name. Defaults to the function name.
+            rows_in (callable): f(*args, **kwargs) -> rows in. Defaults to the row
+                                count of the first argument (None for file paths).
+            rows_out (callable): f(result) -> rows out. Defaults to the row count of the result.
+        """
+        def decorator(function):
+            stage_name = name or function.__name__
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                count_in = rows_in(*args, **kwargs) if rows_in else (_count_rows(args[0]) if args else None)
+                with self.stage(stage_name, rows_in=count_in) as record:
+                    result = function(*args, **kwargs)
+                    record.rows_out = rows_out(result) if rows_out else _count_rows(result)
+                return result
+            return wrapper
+        return decorator
+
+    def _finish(self, record):
+        self.records.append(record)
+        if self.jsonl_path:
+            with open(self.jsonl_path, 'a') as f:
+                f.write(json.dumps(record.to_dict()) + '\n')
+
+    def summary(self):
+        """Returns the records as a list of dicts, in the order the stages finished."""
+        return [record.to_dict() for record in self.records]
+
+    def print_summary(self, title='Stage summary'):
+        """Prints one line per stage: time, CPU, memory growth and rows."""
+        if not self.records:
+            return
+        print(f"\n{'='*50}\n{title}\n{'='*50}")
+        print(f"{'stage':<32} {'wall s':>8} {'cpu s':>8} {'peak +MB':>9} {'rows in':>10} {'rows out':>10}")
+        for record in self.records:
+            label = ('  ' if record.parent else '') + record.name + (' (FAILED)' if record.error else '')
+            rows_in = '' if record.rows_in is None else f'{record.rows_in:,}'
+            rows_out = '' if record.rows_out is None else f'{record.rows_out:,}'
+            print(f"{label:<32} {record.wall_seconds:>8.2f} {record.cpu_seconds:>8.2f} "
+                  f"{record.peak_memory_delta_mb:>9.1f} {rows_in:>10} {rows_out:>10}")
+        if any(record.profile_path for record in self.records):
+            print("\nProfiles (open with: python -m pstats <file>):")
+            for record in self.records:
+                if record.profile_path:
+                    print(f"  {record.name}: {record.profile_path}")
+
+
+def _profile_setting(value):
+    if not value:
+        return set()
+    return 'all' if value.strip().lower() == 'all' else {name.strip() for name in value.split(',') if name.strip()}
+
+
+# The shared recorder the pipeline scripts use, set up from the environment
+RECORDER = StageRecorder(
+    jsonl_path=os.environ.get('PIPELINE_METRICS') or None,
+    profile=_profile_setting(os.environ.get('PIPELINE_PROFILE')),
+    profile_dir=os.environ.get('PIPELINE_PROFILE_DIR', '.'),
+)
+
+
+def configure(jsonl_path=None, profile=None, profile_dir=None):
+    """
+    Changes where the shared recorder writes and what it profiles.
+
+    Args:
+        jsonl_path (str): JSON lines file to append the stage records to.
+        profile (set or str): Stage names to profile, or 'all'.
+        profile_dir (str): Directory for the .prof files.
+    """
+    if jsonl_path is not None:
+        RECORDER.jsonl_path = jsonl_path
+    if profile is not None:
+        RECORDER.profile = profile if profile == 'all' else set(profile)
+    if profile_dir is not None:
+        RECORDER.profile_dir = profile_dir
+
+
+def stage(name, rows_in=None, profile=None):
+    """Measures a block of code as a stage of the shared recorder (see StageRecorder.stage)."""
+    return RECORDER.stage(name, rows_in, profile)
+
+
+def track(name=None, rows_in=None, rows_out=None):
+    """Decorator that measures a function as a stage of the shared recorder (see StageRecorder.track)."""
+    return RECORDER.track(name, rows_in, rows_out)
+
+
+def print_summary(title='Stage summary'):
+    """Prints the stages recorded by the shared recorder."""
+    RECORDER.print_summary(title)
@@ -0,0 +1,395 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from pipeline_utils.sketches import HyperLogLog, SpaceSaving
+
+# =============================================
+# SINGLE-PASS DATA PROFILER
+# =============================================
+# Measures a dataset chunk by chunk, in memory that does not grow with the rows:
+#   - nulls per column (missing or blank cells) and their ratio,
+#   - numeric min, max, mean and variance of the values that parse as numbers, merged
+#     across chunks with the parallel form of Welford's algorithm (Chan et al.), plus
+#     how many values do not parse, whether all are whole numbers and how many have a
+#     leading zero (zip codes, codes that must stay text),
+#   - date range and unparseable count of the given date columns,
+#   - approximate distinct count (HyperLogLog) and top values (Space-Saving),
+#   - for pairs of candidate duplicate columns: how many rows are equal, and whether
+#     each column functionally determines the other (every value of A maps to a single
+#     value of B). The dependency is checked exactly while the distinct keys fit in
+#     max_keys, and from HyperLogLog estimates of |A| and |A, B| after that.
+#
+# Chunks may be raw text (read with dtype=str, the usual case) or already typed. Profiles
+# of different files or partitions merge. to_dict() gives a JSON-ready profile.
+#
+#     profile = profile_csv('data.csv', date_columns=['order date'], pairs=[('Customer Id', 'Order Customer Id')])
+#     write_profile(profile.to_dict(), 'data_profile.json')
+
+NULL_SENTINEL = '\x00<NA>'  # Stands for a missing value of B in the dependency checks
+
+
+def _is_text(series):
+    return not (pd.api.types.is_numeric_dtype(series) or pd.api.types.is_datetime64_any_dtype(series))
+
+
+def _null_mask(series):
+    mask = series.isna()
+    if _is_text(series) and not pd.api.types.is_bool_dtype(series):
+        mask |= series.astype(str).str.strip() == ''
+    return mask.to_numpy(dtype=bool)
+
+
+NUMBER_PATTERN = r'^[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$'
+
+
+def _parse_numbers(text):
+    """The number in each string, NaN where it is not one. Only strings shaped like numbers are parsed."""
+    numbers = np.full(len(text), np.nan)
+    looks_numeric = text.str.match(NUMBER_PATTERN).to_numpy(dtype=bool)
+    if looks_numeric.any():
+        numbers[looks_numeric] = pd.to_numeric(text[looks_numeric], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    return numbers
+
+
+class _Moments:
+    """Count, min, max, mean and sum of squared deviations, mergeable across chunks."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.integral = True
+
+    def update(self, values):
+        values = values[~np.isnan(values)]
+        if len(values):
+            mean = values.mean()
+            self._combine(len(values), mean, float(((values - mean) ** 2).sum()), values.min(), values.max(),
+                          bool(np.all(np.mod(values, 1) == 0)))
+
+    def _combine(self, count, mean, m2, low, high, integral):
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = min(self.min, float(low))
+        self.max = max(self.max, float(high))
+        self.integral &= integral
+
+    def merge(self, other):
+        if other.count:
+            self._combine(other.count, other.mean, other.m2, other.min, other.max, other.integral)
+
+    def to_dict(self):
+        if not self.count:
+            return None
+        variance = self.m2 / (self.count - 1) if self.count > 1 else 0.0 # Sample variance, as pandas' var()
+        return {
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.mean,
+            'variance': variance,
+            'std': variance ** 0.5,
+            'integral': self.integral,
+        }
+
+
+class _Dependency:
+    """Checks whether the values of one column determine the values of another (A -> B)."""
+
+    def __init__(self, max_keys, p):
+        self.max_keys = max_keys
+        self.mapping = pd.Series(dtype=object) # Key -> first value seen, while exact
+        self.conflicts = pd.Index([])          # Keys seen with more than one value
+        self.keys = HyperLogLog(p)
+        self.pairs = HyperLogLog(p)
+
+    @property
+    def exact(self):
+        return self.mapping is not None
+
+    def update(self, keys, values):
+        keep = ~_null_mask(keys)
+        keys = keys[keep].astype(str)
+        values = values[keep].astype(str).fillna(NULL_SENTINEL)
+        if not len(keys):
+            return
+        self.keys.update(keys)
+        self.pairs.update(keys + '\x1f' + values)
+        if not self.exact:
+            return
+        grouped = values.groupby(keys.to_numpy(), sort=False)
+        first = grouped.first()
+        counts = grouped.nunique(dropna=False)
+        known = self.mapping.reindex(first.index)
+        differs = known.notna() & (known != first)
+        self.conflicts = self.conflicts.union(counts.index[counts > 1]).union(first.index[differs.to_numpy()])
+        self.mapping = self.mapping.combine_first(first)
+        if len(self.mapping) > self.max_keys:
+            self.mapping = None # Too many keys to keep: fall back to the estimates
+
+    def merge(self, other):
+        self.keys.merge(other.keys)
+        self.pairs.merge(other.pairs)
+        if self.exact and other.exact:
+            known = self.mapping.reindex(other.mapping.index)
+            differs = known.notna() & (known != other.mapping)
+            self.conflicts = self.conflicts.union(other.conflicts).union(other.mapping.index[differs.to_numpy()])
+            self.mapping = self.mapping.combine_first(other.mapping)
+            if len(self.mapping) > self.max_keys:
+                self.mapping = None
+        else:
+            self.mapping = None
+
+    def to_dict(self):
+        if self.exact:
+            return {'holds': len(self.conflicts) == 0, 'exact': True,
+                    'distinct_keys': len(self.mapping), 'violating_keys': len(self.conflicts)}
+        keys, pairs = self.keys.estimate(), self.pairs.estimate()
+        # Holds when there are about as many distinct (A, B) pairs as distinct A values
+        margin = 2 * self.keys.relative_error
+        return {'holds': pairs <= keys * (1 + margin), 'exact': False,
+                'distinct_keys': round(keys), 'violating_keys': None, 'distinct_pairs': round(pairs)}
+
+
+class _ColumnProfile:
+    def __init__(self, name, p, top_k, is_date):
+        self.name = name
+        self.rows = 0
+        self.nulls = 0
+        self.non_numeric = 0
+        self.leading_zeros = 0
+        self.moments = _Moments()
+        self.distinct = HyperLogLog(p)
+        self.top = SpaceSaving(top_k)
+        self.dates = {'unparseable': 0, 'min': None, 'max': None} if is_date else None
+
+    def update(self, series):
+        null = _null_mask(series)
+        values = series[~null]
+        self.rows += len(series)
+        self.nulls += int(null.sum())
+        if not len(values):
+            return
+        # Everything below works on the distinct values of the chunk, weighted by their counts
+        codes, uniques = pd.factorize(values)
+        counts = np.bincount(codes, minlength=len(uniques))
+        text = pd.Series(pd.Index(uniques).astype(str)).str.strip()
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            self.moments.update(values.to_numpy(dtype='float64', na_value=np.nan))
+        elif not pd.api.types.is_datetime64_any_dtype(values):
+            numbers = _parse_numbers(text)
+            parsed = ~np.isnan(numbers)
+            self.non_numeric += int(counts[~parsed].sum())
+            self.moments.update(numbers[codes])
+            self.leading_zeros += int(counts[parsed & text.str.match(r'^-?0\d').to_numpy(dtype=bool)].sum())
+        if self.dates is not None:
+            self._update_dates(uniques, counts)
+        items = text.to_numpy(dtype=object)
+        self.distinct.update(items)
+        self.top.update(items, counts)
+
+    def _update_dates(self, uniques, counts):
+        dates = pd.DatetimeIndex(uniques) if pd.api.types.is_datetime64_any_dtype(uniques) else pd.to_datetime(pd.Index(uniques), errors='coerce')
+        self.dates['unparseable'] += int(counts[dates.isna()].sum())
+        parsed = dates.dropna()
+        if len(parsed):
+            low, high = parsed.min(), parsed.max()
+            self.dates['min'] = low if self.dates['min'] is None else min(self.dates['min'], low)
+            self.dates['max'] = high if self.dates['max'] is None else max(self.dates['max'], high)
+
+    def merge(self, other):
+        self.rows += other.rows
+        self.nulls += other.nulls
+        self.non_numeric += other.non_numeric
+        self.leading_zeros += other.leading_zeros
+        self.moments.merge(other.moments)
+        self.distinct.merge(other.distinct)
+        self.top.merge(other.top)
+        if self.dates is not None and other.dates is not None:
+            self.dates['unparseable'] += other.dates['unparseable']
+            for key, pick in (('min', min), ('max', max)):
+                known = [d for d in (self.dates[key], other.dates[key]) if d is not None]
+                self.dates[key] = pick(known) if known else None
+
+    def to_dict(self, n_top):
+        non_null = self.rows - self.nulls
+        numeric = self.moments.to_dict()
+        if numeric is not None:
+            numeric['leading_zeros'] = self.leading_zeros
+        top = self.top.top(n_top)
+        profile = {
+            'name': self.name,
+            'rows': self.rows,
+            'nulls': self.nulls,
+            'null_ratio': round(self.nulls / self.rows, 6) if self.rows else 0.0,
+            'approx_unique': round(self.distinct.estimate()) if non_null else 0,
+            'unique_error': round(self.distinct.relative_error, 4),
+            # Every non-null value parses as a number
+            'all_numeric': numeric is not None and self.non_numeric == 0,
+            'non_numeric': self.non_numeric,
+            'numeric': numeric,
+            'top_values': [{'value': str(value), 'count': int(row['estimate']), 'error': int(row['error'])}
+                           for value, row in top.iterrows()],
+        }
+        if self.dates is not None:
+            profile['dates'] = {
+                'unparseable': self.dates['unparseable'],
+                'min': None if self.dates['min'] is None else self.dates['min'].isoformat(),
+                'max': None if self.dates['max'] is None else self.dates['max'].isoformat(),
+            }
+        return profile
+
+
+class DataProfile:
+    """
+    Column statistics and duplicate-column checks, built chunk by chunk.
+
+    Args:
+        date_columns (list): Columns whose values are parsed as dates.
+        pairs (list): (A, B) column pairs to compare (equal rows, A -> B and B -> A).
+        p (int): HyperLogLog precision of the distinct counts (2**p bytes per column).
+        top_k (int): Space-Saving counters per column for the top values.
+        n_top (int): Top values reported per column.
+        max_keys (int): Distinct keys up to which the dependencies are checked exactly.
+    """
+
+    def __init__(self, date_columns=(), pairs=(), p=12, top_k=50, n_top=5, max_keys=200_000):
+        self.date_columns = set(date_columns)
+        self.pairs = [tuple(pair) for pair in pairs]
+        self.p = p
+        self.top_k = top_k
+        self.n_top = n_top
+        self.max_keys = max_keys
+        self.columns = {}
+        self.equal_rows = {pair: 0 for pair in self.pairs}
+        self.compared_rows = {pair: 0 for pair in self.pairs}
+        self.dependencies = {}
+        for a, b in self.pairs:
+            self.dependencies[(a, b)] = _Dependency(max_keys, p)
+            self.dependencies[(b, a)] = _Dependency(max_keys, p)
+        self.rows = 0
+
+    def update(self, chunk):
+        """
+        Folds a chunk of rows into the profile.
+
+        Returns:
+            DataProfile: self, so calls can be chained.
+        """
+        for col in chunk.columns:
+            if col not in self.columns:
+                self.columns[col] = _ColumnProfile(col, self.p, self.top_k, col in self.date_columns)
+            self.columns[col].update(chunk[col])
+        for a, b in self.pairs:
+            if a not in chunk.columns or b not in chunk.columns:
+                continue
+            left, right = chunk[a], chunk[b]
+            left_null, right_null = _null_mask(left), _null_mask(right)
+            same = (left.astype(str).str.strip() == right.astype(str).str.strip()).to_numpy(dtype=bool, na_value=False)
+            self.equal_rows[(a, b)] += int(((same & ~left_null & ~right_null) | (left_null & right_null)).sum())
+            self.compared_rows[(a, b)] += len(chunk)
+            self.dependencies[(a, b)].update(left, right)
+            self.dependencies[(b, a)].update(right, left)
+        self.rows += len(chunk)
+        return self
+
+    def merge(self, other):
+        """Folds in the profile of other data (another file or partition) with the same settings."""
+        for name, column in other.columns.items():
+            if name in self.columns:
+                self.columns[name].merge(column)
+            else:
+                self.columns[name] = column
+        for pair in self.pairs:
+            if pair in other.equal_rows:
+                self.equal_rows[pair] += other.equal_rows[pair]
+                self.compared_rows[pair] += other.compared_rows[pair]
+                for key in (pair, pair[::-1]):
+                    self.dependencies[key].merge(other.dependencies[key])
+        self.rows += other.rows
+        return self
+
+    def relationships(self):
+        """Equality and functional dependency results per column pair."""
+        results = []
+        for a, b in self.pairs:
+            compared = self.compared_rows[(a, b)]
+            if not compared:
+                continue
+            equal = self.equal_rows[(a, b)]
+            results.append({
+                'columns': [a, b],
+                'rows_compared': compared,
+                'equal_rows': equal,
+                'equal_ratio': round(equal / compared, 6),
+                'identical': equal == compared,
+                'a_determines_b': self.dependencies[(a, b)].to_dict(),
+                'b_determines_a': self.dependencies[(b, a)].to_dict(),
+            })
+        return results
+
+    def to_dict(self):
+        """The profile as plain Python values, ready for json.dump."""
+        return {
+            'rows': self.rows,
+            'columns': [column.to_dict(self.n_top) for column in self.columns.values()],
+            'relationships': self.relationships(),
+        }
+
+
+def profile_chunks(chunks, profile=None, **settings):
+    """
+    Profiles an iterable of DataFrame chunks.
+
+    Args:
+        chunks (iterable): pandas.DataFrame chunks.
+        profile (DataProfile): Existing profile to add to. A new one is created (with settings) when None.
+        **settings: DataProfile arguments.
+
+    Returns:
+        DataProfile: The updated profile.
+    """
+    profile = profile or DataProfile(**settings)
+    for chunk in chunks:
+        profile.update(chunk)
+    return profile
+
+
+def profile_csv(file_path, chunk_size=100_000, encoding=None, **settings):
+    """
+    Profiles a CSV in one chunked pass. Every column is read as text, so the numeric,
+    leading-zero and blank checks see the values exactly as they are in the file.
+
+    Args:
+        file_path (str): The CSV file.
+        chunk_size (int): Rows read per chunk.
+        encoding (str): The file encoding.
+        **settings: DataProfile arguments (date_columns, pairs, ...).
+
+    Returns:
+        DataProfile: The profile.
+    """
+    reader = pd.read_csv(file_path, chunksize=chunk_size, dtype=str, encoding=encoding)
+    return profile_chunks(reader, **settings)
+
+
+def write_profile(profile, path, **metadata):
+    """
+    Saves a profile (DataProfile or its to_dict()) as JSON, with extra top-level fields.
+
+    Returns:
+        dict: The profile that was saved.
+    """
+    profile = dict(metadata, **(profile.to_dict() if isinstance(profile, DataProfile) else profile))
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(profile, f, indent=2, default=float)
+    return profile
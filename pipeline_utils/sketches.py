@@ -0,0 +1,301 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+# =============================================
+# MERGEABLE STREAMING SKETCHES
+# =============================================
+# Fixed-size summaries for statistics whose exact state grows with the data. Each sketch
+# is updated chunk by chunk with vectorized NumPy code, and two sketches of the same
+# configuration merge into the sketch of the combined data (partitions, days, workers):
+#
+#   HyperLogLog         distinct count; 2**p one-byte registers,
+#                       relative standard error 1.04 / sqrt(2**p)
+#   GroupedHyperLogLog  a HyperLogLog per key (e.g. distinct invoices per customer)
+#   SpaceSaving         heaviest items by count or weight; k counters, each estimate
+#                       overstates the true total by at most its recorded error
+#   TDigest             quantiles; about `compression` centroids, most accurate in the tails
+#
+# All sketches pickle, so they can be saved and merged across runs.
+
+_HASH_KEY = '0123456789abcdef' # Fixed key, so the same value hashes the same way in every run
+
+
+def _hash64(values):
+    """
+    64-bit hash of each value. Numeric arrays are hashed as numbers; anything else by the
+    string form of each distinct value. Feed a sketch the same dtype in every run, or the
+    same value (536365 vs '536365') would count as two.
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in 'iub':
+        return pd.util.hash_array(values.astype(np.int64), hash_key=_HASH_KEY)
+    if values.dtype.kind == 'f':
+        return pd.util.hash_array(values, hash_key=_HASH_KEY)
+    codes, distinct = pd.factorize(values, use_na_sentinel=False)
+    hashes = pd.util.hash_array(pd.Index(distinct).astype(str).to_numpy(dtype=object), hash_key=_HASH_KEY)
+    return hashes[codes]
+
+
+def _bit_length(x):
+    # Number of significant bits of each uint64, by binary search over the shift
+    x = x.copy()
+    length = np.zeros(x.shape, dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = x >= (np.uint64(1) << np.uint64(shift))
+        length[high] += shift
+        x[high] >>= np.uint64(shift)
+    return length + (x > 0)
+
+
+def _register_updates(hashes, p):
+    """Register index and rank (position of the first 1-bit) of each hash."""
+    index = (hashes >> np.uint64(64 - p)).astype(np.int64)
+    rest = hashes & np.uint64((1 << (64 - p)) - 1)
+    rank = (64 - p) - _bit_length(rest) + 1
+    return index, rank.astype(np.uint8)
+
+
+def _hll_estimate(registers):
+    """HyperLogLog estimate per row of a (groups x m) register array, with the small-range correction."""
+    m = registers.shape[-1]
+    alpha = 0.7213 / (1 + 1.079 / m) if m >= 128 else {16: 0.673, 32: 0.697, 64: 0.709}[m]
+    raw = alpha * m * m / np.sum(np.exp2(-registers.astype(np.float64)), axis=-1)
+    zeros = np.count_nonzero(registers == 0, axis=-1)
+    with np.errstate(divide='ignore'):
+        linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+
+
+class HyperLogLog:
+    """
+    Approximate distinct count.
+
+    Args:
+        p (int): Precision; 2**p registers (4..16). p=14 uses 16 KB with ~0.8% standard error.
+    """
+
+    def __init__(self, p=14):
+        if not 4 <= p <= 16:
+            raise ValueError("p must be between 4 and 16.")
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    def update(self, values):
+        """Adds a chunk of values."""
+        if len(values):
+            index, rank = _register_updates(_hash64(values), self.p)
+            np.maximum.at(self.registers, index, rank)
+        return self
+
+    def merge(self, other):
+        """Folds in another HyperLogLog with the same precision."""
+        if other.p != self.p:
+            raise ValueError("Only HyperLogLogs with the same precision can be merged.")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        """Estimated number of distinct values."""
+        return float(_hll_estimate(self.registers))
+
+    @property
+    def relative_error(self):
+        """Relative standard error; about 95% of estimates fall within twice this."""
+        return 1.04 / math.sqrt(len(self.registers))
+
+
+class GroupedHyperLogLog:
+    """
+    One HyperLogLog per key, e.g. distinct invoices per customer. Memory is 2**p bytes per key,
+    so keep p small (p=8: 256 bytes per key, ~6.5% standard error; small counts are near exact).
+
+    Args:
+        p (int): Precision of every key's HyperLogLog.
+    """
+
+    def __init__(self, p=8):
+        if not 4 <= p <= 16:
+            raise ValueError("p must be between 4 and 16.")
+        self.p = p
+        self.keys = pd.Index([])
+        self.registers = np.zeros((0, 1 << p), dtype=np.uint8)
+
+    def _rows_for(self, keys):
+        distinct = pd.unique(np.asarray(keys))
+        new_keys = distinct[self.keys.get_indexer(distinct) < 0]
+        if len(new_keys):
+            self.keys = self.keys.append(pd.Index(new_keys))
+            self.registers = np.vstack([self.registers, np.zeros((len(new_keys), 1 << self.p), dtype=np.uint8)])
+        return self.keys.get_indexer(keys)
+
+    def update(self, keys, values):
+        """Adds a chunk of (key, value) pairs."""
+        if len(keys):
+            rows = self._rows_for(keys)
+            index, rank = _register_updates(_hash64(values), self.p)
+            np.maximum.at(self.registers.reshape(-1), rows * (1 << self.p) + index, rank)
+        return self
+
+    def merge(self, other):
+        """Folds in another GroupedHyperLogLog with the same precision."""
+        if other.p != self.p:
+            raise ValueError("Only sketches with the same precision can be merged.")
+        rows = self._rows_for(other.keys)
+        self.registers[rows] = np.maximum(self.registers[rows], other.registers)
+        return self
+
+    def estimates(self):
+        """Estimated distinct count per key."""
+        return pd.Series(_hll_estimate(self.registers), index=self.keys)
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(1 << self.p)
+
+
+class SpaceSaving:
+    """
+    Heavy hitters (top-K by count or by summed weight), mergeable Space-Saving summary.
+
+    Each counter holds an estimate and an error: the true total of the item lies in
+    [estimate - error, estimate]. Any item whose true total exceeds the smallest
+    counter is guaranteed to be in the summary.
+
+    Args:
+        k (int): Number of counters kept. Use a few times the number of items you want to rank.
+    """
+
+    def __init__(self, k=100):
+        self.k = k
+        self.counters = pd.DataFrame({'estimate': pd.Series(dtype=float), 'error': pd.Series(dtype=float)})
+        self.total_weight = 0.0
+
+    def _floor(self):
+        # Items without a counter may have had up to the smallest counter's weight
+        return float(self.counters['estimate'].min()) if len(self.counters) >= self.k else 0.0
+
+    def _combine(self, counters, floor):
+        union = self.counters.index.union(counters.index)
+        own_floor = self._floor()
+        mine = self.counters.reindex(union)
+        theirs = counters.reindex(union)
+        combined = pd.DataFrame({
+            'estimate': mine['estimate'].fillna(own_floor) + theirs['estimate'].fillna(floor),
+            'error': mine['error'].fillna(own_floor) + theirs['error'].fillna(floor),
+        })
+        self.counters = combined.nlargest(self.k, 'estimate')
+
+    def update(self, items, weights=None):
+        """Adds a chunk of items (weights default to 1, i.e. counting)."""
+        if len(items):
+            weights = np.ones(len(items)) if weights is None else np.asarray(weights, dtype=float)
+            # The chunk's exact totals are a summary with zero error. It is trimmed to its k
+            # heaviest items so the merge stays small; an item left out had at most the
+            # heaviest dropped total in this chunk, which becomes the floor (error) for it
+            chunk = pd.Series(weights).groupby(np.asarray(items), sort=False).sum()
+            floor = 0.0
+            if len(chunk) > self.k:
+                chunk = chunk.nlargest(self.k + 1)
+                floor = float(chunk.iloc[-1])
+                chunk = chunk.iloc[:-1]
+            self._combine(pd.DataFrame({'estimate': chunk, 'error': 0.0}), floor)
+            self.total_weight += float(weights.sum())
+        return self
+
+    def merge(self, other):
+        """Folds in another SpaceSaving summary; errors add up as in the Space-Saving merge."""
+        self._combine(other.counters, other._floor())
+        self.total_weight += other.total_weight
+        return self
+
+    def top(self, n=10):
+        """
+        The n heaviest items.
+
+        Returns:
+            pandas.DataFrame: estimate, error, lower_bound (= estimate - error) and
+                              guaranteed (the item is certainly in the true top n).
+        """
+        ranked = self.counters.sort_values('estimate', ascending=False)
+        top = ranked.head(n).copy()
+        top['lower_bound'] = top['estimate'] - top['error']
+        # Nothing outside the top n can exceed the (n+1)th estimate (or the floor for unseen items)
+        threshold = max(ranked['estimate'].iloc[n] if len(ranked) > n else 0.0, self._floor())
+        top['guaranteed'] = top['lower_bound'] >= threshold
+        return top
+
+    @property
+    def max_error(self):
+        """Upper bound on the overestimate of any item: total weight / k."""
+        return self.total_weight / self.k
+
+
+class TDigest:
+    """
+    Streaming quantiles (merging t-digest with the arcsine scale function).
+
+    Args:
+        compression (float): Accuracy/size trade-off; the digest keeps about this many centroids.
+    """
+
+    def __init__(self, compression=200):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = np.inf  # Exact extremes, so quantiles 0 and 1 are exact
+        self.max = -np.inf
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def _compress(self, means, weights):
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        cumulative = np.cumsum(weights)
+        q = (cumulative - weights / 2) / total
+        # Centroids whose midpoints fall in the same unit of the scale function are merged;
+        # units are narrow at the tails, so extreme quantiles keep small centroids
+        scale = self.compression / (2 * np.pi) * np.arcsin(2 * np.clip(q, 0, 1) - 1)
+        bins = np.floor(scale).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, np.diff(bins) != 0])
+        merged_weights = np.add.reduceat(weights, starts)
+        merged_means = np.add.reduceat(means * weights, starts) / merged_weights
+        self.means, self.weights = merged_means, merged_weights
+
+    def update(self, values):
+        """Adds a chunk of values (NaNs are ignored)."""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.min = min(self.min, values.min())
+            self.max = max(self.max, values.max())
+            self._compress(np.r_[self.means, values], np.r_[self.weights, np.ones(len(values))])
+        return self
+
+    def merge(self, other):
+        """Folds in another t-digest."""
+        if len(other.means):
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self._compress(np.r_[self.means, other.means], np.r_[self.weights, other.weights])
+        return self
+
+    def quantile(self, q):
+        """Estimated value at quantile(s) q, interpolating between centroid midpoints and the extremes."""
+        if not len(self.means):
+            return np.nan
+        cumulative = np.cumsum(self.weights)
+        midpoints = (cumulative - self.weights / 2) / cumulative[-1]
+        return np.interp(q, np.r_[0.0, midpoints, 1.0], np.r_[self.min, self.means, self.max])
+
+    def rank_error(self, q):
+        """Bound on the rank error at quantile(s) q: the weight share of the centroid covering q."""
+        if not len(self.means):
+            return np.nan
+        cumulative = np.cumsum(self.weights) / self.weights.sum()
+        covering = np.minimum(np.searchsorted(cumulative, q), len(self.weights) - 1)
+        return self.weights[covering] / self.weights.sum()